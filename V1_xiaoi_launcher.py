@@ -11,18 +11,109 @@ import sys
 import threading
 import time
 import argparse
+import json
+import array
+import math
+import statistics
+import concurrent.futures
+from collections import deque
+import logging
+import queue
+import atexit
+from logging.handlers import QueueHandler, QueueListener
 from pystray import Icon, Menu, MenuItem
 from PIL import Image, ImageDraw
 import speech_recognition as sr
 from difflib import SequenceMatcher
 import pyautogui  # For auto-clicking voice button
 
-f5_press_time = None
-f5_hold_triggered = False
+F5_HOLD_SECONDS = 1.0
 voice_listener_active = True
 voice_wake_enabled = True  # Toggle for voice wake feature
 icon_instance = None  # Global icon reference for menu updates
 
+# Logging: leveled, rate-limited, written to the console by a background thread
+LOG_QUEUE_SIZE = 2000         # when the queue is full records are dropped and counted, callers never wait
+LOG_RATE_INTERVAL = 5.0       # at most LOG_RATE_BURST records per call site every 5 seconds
+LOG_RATE_BURST = 5
+
+log = logging.getLogger("xiaoi")
+log_listener = None
+log_handler = None
+
+class RateLimitFilter(logging.Filter):
+    """Rate-limit per call site (file + line); the skipped count is appended to the next record that gets through"""
+
+    def __init__(self, interval=LOG_RATE_INTERVAL, burst=LOG_RATE_BURST):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        with self.lock:
+            start, count, skipped = self.windows.get(key, (record.created, 0, 0))
+            if record.created - start >= self.interval:
+                start, count = record.created, 0
+            if count >= self.burst:
+                self.windows[key] = (start, count, skipped + 1)
+                return False
+            self.windows[key] = (start, count + 1, 0)
+        if skipped:
+            record.msg = f"{record.getMessage()} ({skipped} similar messages skipped)"
+            record.args = None
+        return True
+
+class DroppingQueueHandler(QueueHandler):
+    """Drop and count records when put_nowait fails, so a slow console never blocks the caller"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def setup_logging(debug=False):
+    """Route the "xiaoi" logger through a bounded queue to a console writer thread"""
+    global log_listener, log_handler
+    log.setLevel(logging.DEBUG if debug else logging.INFO)
+    if log_listener is not None:
+        return
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s", "%H:%M:%S"))
+    log_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    log_handler.addFilter(RateLimitFilter())
+    log.addHandler(log_handler)
+    log.propagate = False
+    log_listener = QueueListener(log_handler.queue, console)
+    log_listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    """Flush whatever is still queued before exiting"""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        if log_handler.dropped:
+            # The queue is stopped, so hand the record to the console writer directly
+            log_listener.handle(log.makeRecord(log.name, logging.WARNING, __file__, 0,
+                                               "Logging queue was full, dropped %d records",
+                                               (log_handler.dropped,), None))
+        log_listener = None
+
+def toggle_debug_logging(icon=None, item=None):
+    """Switch debug messages on/off at runtime (tray menu)"""
+    enabled = not log.isEnabledFor(logging.DEBUG)
+    log.setLevel(logging.DEBUG if enabled else logging.INFO)
+    log.info("Debug messages: %s", "ON" if enabled else "OFF")
+    update_tray_menu()
+
+setup_logging()
+
 # Voice Wake Words Configuration
 WAKE_WORDS = {
     'en': ['xiao ai', 'xiaoai'],  # English
@@ -30,14 +121,633 @@ WAKE_WORDS = {
     'yue': ['小愛同學', '小愛']  # Cantonese
 }
 
+class WakeMatcher:
+    """Wake word matcher compiled once, with the same decisions as the per-word SequenceMatcher loop.
+
+    - Wake words are lowercased and deduplicated
+    - Substring hits: one pass of an Aho-Corasick automaton over the text
+    - Fuzzy hits: a length bound and a bit-parallel LCS (bounded edit distance)
+      discard words that cannot reach the threshold before SequenceMatcher runs
+    """
+
+    def __init__(self, words, threshold, inclusive=False):
+        self.threshold = threshold
+        self.inclusive = inclusive  # True: ratio >= threshold, False: ratio > threshold
+        self.words = []
+        seen = set()
+        for w in words:
+            w = w.lower()
+            if w not in seen:
+                seen.add(w)
+                self.words.append(w)
+        self._build_automaton()
+        self._build_lcs_masks()
+
+    def _build_automaton(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [None]   # Lowest wake word index ending at this state
+        for idx, w in enumerate(self.words):
+            if not w:
+                continue
+            state = 0
+            for ch in w:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(None)
+                    self._goto[state][ch] = nxt
+                state = nxt
+            if self._out[state] is None:
+                self._out[state] = idx
+
+        queue = list(self._goto[0].values())
+        while queue:
+            state = queue.pop(0)
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                inherited = self._out[self._fail[nxt]]
+                if inherited is not None and (self._out[nxt] is None or inherited < self._out[nxt]):
+                    self._out[nxt] = inherited
+
+    def _build_lcs_masks(self):
+        self._masks = []
+        for w in self.words:
+            masks = {}
+            for i, ch in enumerate(w):
+                masks[ch] = masks.get(ch, 0) | (1 << i)
+            self._masks.append(masks)
+
+    def _substring_hit(self, text):
+        if "" in self.words:
+            return self.words.index("")
+        best = None
+        state = 0
+        for ch in text:
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            hit = self._out[state]
+            if hit is not None and (best is None or hit < best):
+                best = hit
+                if best == 0:
+                    break
+        return best
+
+    def _lcs_length(self, text, idx):
+        # Hyyrö bit-parallel LCS: a few integer ops per character
+        m = len(self.words[idx])
+        full = (1 << m) - 1
+        masks = self._masks[idx]
+        v = full
+        for ch in text:
+            u = v & masks.get(ch, 0)
+            v = ((v + u) | (v - u)) & full
+        return m - bin(v).count("1")
+
+    def _passes(self, ratio):
+        return ratio >= self.threshold if self.inclusive else ratio > self.threshold
+
+    def match(self, text):
+        """Return (wake_word, ratio), or None when nothing matches"""
+        text = text.lower().strip()
+        hit = self._substring_hit(text)
+        if hit is not None:
+            word = self.words[hit]
+            return word, SequenceMatcher(None, text, word).ratio()
+
+        la = len(text)
+        for idx, word in enumerate(self.words):
+            total = la + len(word)
+            if total == 0:
+                continue
+            # SequenceMatcher matches <= LCS <= shorter length, so both bound the ratio
+            if not self._passes(2.0 * min(la, len(word)) / total):
+                continue
+            if not self._passes(2.0 * self._lcs_length(text, idx) / total):
+                continue
+            ratio = SequenceMatcher(None, text, word).ratio()
+            if self._passes(ratio):
+                return word, ratio
+        return None
+
+
+# Cloud recognition: every language is sent at once on one shared pool
+RECOGNITION_WORKERS = 4       # recognition threads shared by all languages
+RECOGNITION_TIMEOUT = 6.0     # give up on a language that has not answered by then
+LATENCY_WINDOW = 30           # recent response times kept per language to rank them
+
+recognition_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=RECOGNITION_WORKERS, thread_name_prefix="recognize")
+
+def http_recognizer(endpoint, key=None):
+    """
+    Same wire protocol as recognize_google (FLAC upload, line-delimited JSON reply) but with a
+    configurable URL, e.g. a local stand-in server: --recognizer-endpoint http://127.0.0.1:8080/recognize
+    """
+    import urllib.error
+    import urllib.parse
+    import urllib.request
+
+    def recognize(audio, language):
+        query = {"client": "chromium", "lang": language, "pFilter": 0}
+        if key:
+            query["key"] = key
+        url = endpoint + ("&" if "?" in endpoint else "?") + urllib.parse.urlencode(query)
+        rate = max(audio.sample_rate, 8000)
+        request = urllib.request.Request(
+            url,
+            data=audio.get_flac_data(convert_rate=rate, convert_width=2),
+            headers={"Content-Type": f"audio/x-flac; rate={rate}"})
+        try:
+            with urllib.request.urlopen(request, timeout=RECOGNITION_TIMEOUT) as response:
+                body = response.read().decode("utf-8")
+        except (urllib.error.URLError, OSError) as e:
+            raise sr.RequestError(f"recognition request failed: {e}")
+        for line in body.split("\n"):
+            if not line.strip():
+                continue
+            result = json.loads(line).get("result") or []
+            alternatives = result[0].get("alternative", []) if result else []
+            if alternatives and alternatives[0].get("transcript"):
+                return alternatives[0]["transcript"]
+        raise sr.UnknownValueError()
+
+    return recognize
+
+class RecognitionDispatcher:
+    """
+    Send one phrase to every language at once and take the first result that matches a wake word;
+    requests that have not started are cancelled, late answers are ignored.
+    Recent response times per language decide the submission order (and which result is read
+    first when several finish together). recognize(audio, language=...) is injectable and
+    defaults to Recognizer.recognize_google.
+    """
+
+    def __init__(self, recognize, languages, matcher, pool=None):
+        self.recognize = recognize
+        self.languages = list(languages)
+        self.matcher = matcher
+        self.pool = pool or recognition_pool
+        self.lock = threading.Lock()
+        self.latency = {lang: deque(maxlen=LATENCY_WINDOW) for lang in self.languages}
+        self.stats = {"phrases": 0, "requests": 0, "cancelled": 0, "failed": 0}
+
+    def configure(self, recognize=None, languages=None):
+        if recognize is not None:
+            self.recognize = recognize
+        if languages:
+            with self.lock:
+                self.languages = list(languages)
+                for lang in self.languages:
+                    self.latency.setdefault(lang, deque(maxlen=LATENCY_WINDOW))
+
+    def priority(self):
+        """Order by median recent latency; languages without samples keep their configured order, first"""
+        with self.lock:
+            medians = {lang: statistics.median(self.latency[lang]) if self.latency[lang] else 0.0
+                       for lang in self.languages}
+        return sorted(self.languages, key=lambda lang: medians[lang])
+
+    def _timed(self, language, audio):
+        t0 = time.perf_counter()
+        try:
+            return self.recognize(audio, language=language)
+        finally:
+            with self.lock:
+                self.latency[language].append(time.perf_counter() - t0)
+
+    def dispatch(self, audio):
+        """Return (language, text), None when no language heard a wake word; raise sr.RequestError if every request failed"""
+        order = self.priority()
+        futures = {self.pool.submit(self._timed, lang, audio): lang for lang in order}
+        self.stats["phrases"] += 1
+        self.stats["requests"] += len(futures)
+        pending = set(futures)
+        errors = []
+        deadline = time.monotonic() + RECOGNITION_TIMEOUT
+        try:
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=max(0.0, deadline - time.monotonic()),
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                if not done:
+                    log.debug("🎤 Recognition timed out: %s", ", ".join(futures[f] for f in pending))
+                    break
+                for future in sorted(done, key=lambda f: order.index(futures[f])):
+                    lang = futures[future]
+                    try:
+                        text = future.result()
+                    except sr.UnknownValueError:
+                        continue
+                    except sr.RequestError as e:
+                        errors.append(e)
+                        continue
+                    log.debug("🎤 %s: %s", lang, text)
+                    if self.matcher.match(text) is not None:
+                        return lang, text
+        finally:
+            for future in pending:
+                if future.cancel():
+                    self.stats["cancelled"] += 1
+        if errors and len(errors) == len(futures):
+            self.stats["failed"] += 1
+            raise errors[0]
+        return None
+
+    def status_text(self, item=None):
+        with self.lock:
+            parts = [f"{lang} {statistics.median(v) * 1000:.0f}ms" for lang, v in self.latency.items() if v]
+        return "⏱️ Recognition: " + (", ".join(parts) if parts else "no data yet")
+
+# Continuous capture: the stream stays open, phrases are cut by energy into a bounded queue
+PHRASE_QUEUE_SIZE = 4         # phrases waiting for recognition; the oldest is dropped when recognition falls behind
+PHRASE_PAUSE_SECONDS = 0.5    # this much quiet ends a phrase
+PHRASE_LIMIT_SECONDS = 3.0    # longest phrase (wake words are short, longer speech is cut)
+PHRASE_MIN_SECONDS = 0.2      # shorter sounds (a knock, a cough) are not sent for recognition
+PHRASE_PREROLL_SECONDS = 0.3  # audio kept from before the threshold was crossed so the first syllable survives
+NOISE_WINDOW_SECONDS = 3.0    # the noise floor is the quietest chunk in this window (speech always has gaps)
+NOISE_ADAPT_SECONDS = 2.0     # smoothing time constant for the noise floor
+NOISE_RATIO = 2.5             # threshold = noise floor x this ratio
+ENERGY_MIN = 120              # threshold limits: too low turns hum into phrases, too high misses quiet speech
+ENERGY_MAX = 4000
+ENERGY_DEADBAND = 0.15        # keep the current threshold unless the new one differs by more than 15%
+RELEASE_RATIO = 0.75          # inside a phrase, quiet means below threshold x this ratio (hysteresis)
+PCM_TYPECODES = {1: "b", 2: "h", 4: "i"}   # sample width -> array typecode (little-endian on Windows / x86)
+
+def pcm_rms(fragment, width):
+    """RMS of signed PCM, same result as audioop.rms (audioop was removed in Python 3.13)"""
+    samples = array.array(PCM_TYPECODES[width])
+    samples.frombytes(fragment[:len(fragment) - len(fragment) % width])
+    if not samples:
+        return 0
+    return int(math.sqrt(sum(s * s for s in samples) / len(samples)))
+
+class PhraseCapture:
+    """
+    Capture thread that opens the microphone stream once and segments phrases itself into a bounded queue.
+    Cloud recognition takes phrases from the queue on another thread, so capture keeps going while a slow
+    request is in flight and words spoken meanwhile are not lost; when the queue is full the oldest phrase
+    is dropped and counted. While active() is False the stream is closed and the queue emptied.
+    """
+
+    def __init__(self, microphone, recognizer, active=lambda: True, queue_size=PHRASE_QUEUE_SIZE,
+                 phrase_limit=PHRASE_LIMIT_SECONDS, calibrate_seconds=1.0):
+        self.microphone = microphone
+        self.recognizer = recognizer
+        self.active = active
+        self.phrase_limit = phrase_limit
+        self.calibrate_seconds = calibrate_seconds
+        self.phrases = queue.Queue(maxsize=queue_size)
+        self.running = False
+        self.thread = None
+        self.stats = {"phrases": 0, "dropped": 0, "short": 0, "max_depth": 0,
+                      "retunes": 0, "noise_avoided": 0}
+        self.base_threshold = None
+        self.noise = None
+        self.levels = deque()
+        self.shadow_voiced = self.shadow_silent = 0
+        self.reset_segment()
+
+    def reset_segment(self):
+        self.preroll = deque()
+        self.frames = []
+        self.voiced = 0
+        self.silent = 0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="phrase-capture", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        while self.running:
+            if not self.active():
+                time.sleep(0.2)
+                continue
+            try:
+                with self.microphone as source:
+                    # Calibrate the noise threshold once each time the stream is opened
+                    self.recognizer.adjust_for_ambient_noise(source, duration=self.calibrate_seconds)
+                    self.configure(source.SAMPLE_RATE, source.SAMPLE_WIDTH, source.CHUNK)
+                    while self.running and self.active():
+                        audio = self.segment(source.stream.read(source.CHUNK))
+                        if audio is not None:
+                            self.push(audio)
+                self.reset_segment()
+                self.clear()
+            except Exception as e:
+                log.warning("⚠️ Capture error: %s", e)
+                time.sleep(1.0)
+
+    def configure(self, sample_rate, sample_width, chunk):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        chunk_seconds = chunk / sample_rate
+        self.preroll_chunks = max(1, int(PHRASE_PREROLL_SECONDS / chunk_seconds))
+        self.pause_chunks = max(1, int(PHRASE_PAUSE_SECONDS / chunk_seconds))
+        self.limit_chunks = max(1, int(self.phrase_limit / chunk_seconds))
+        self.min_chunks = max(1, int(PHRASE_MIN_SECONDS / chunk_seconds))
+        self.levels = deque(maxlen=max(1, int(NOISE_WINDOW_SECONDS / chunk_seconds)))
+        self.alpha = min(1.0, chunk_seconds / NOISE_ADAPT_SECONDS)
+        threshold = min(max(self.recognizer.energy_threshold, ENERGY_MIN), ENERGY_MAX)
+        self.recognizer.energy_threshold = threshold
+        self.base_threshold = threshold
+        self.noise = threshold / NOISE_RATIO
+        self.shadow_voiced = self.shadow_silent = 0
+        self.reset_segment()
+
+    def adapt(self, energy):
+        """
+        Minimum statistics: the noise floor follows the quietest chunk of the last NOISE_WINDOW_SECONDS,
+        smoothed, and the threshold is that floor times NOISE_RATIO. A steady HVAC hum pushes it up, a quiet
+        room brings it back down; small changes are ignored and the result stays within the limits.
+        """
+        self.levels.append(energy)
+        if len(self.levels) < self.levels.maxlen:
+            return
+        self.noise += self.alpha * (min(self.levels) - self.noise)
+        target = min(max(self.noise * NOISE_RATIO, ENERGY_MIN), ENERGY_MAX)
+        current = self.recognizer.energy_threshold
+        if abs(target - current) > current * ENERGY_DEADBAND:
+            self.recognizer.energy_threshold = target
+            self.stats["retunes"] += 1
+            log.debug("🎤 Energy threshold %.0f -> %.0f (noise floor %.0f)", current, target, self.noise)
+
+    def shadow(self, energy):
+        """
+        Shadow segmenter: the startup threshold with the same pause / length / minimum-voiced rules.
+        Only a phrase it would have cut and sent to the cloud, but the retuned threshold rejected, counts as noise_avoided.
+        """
+        base = self.base_threshold
+        if not self.shadow_voiced:
+            if energy > base:
+                self.shadow_voiced, self.shadow_silent = 1, 0
+            return
+        if energy > base * RELEASE_RATIO:
+            self.shadow_voiced += 1
+            self.shadow_silent = 0
+        else:
+            self.shadow_silent += 1
+        if self.shadow_silent >= self.pause_chunks or \
+                self.preroll_chunks + self.shadow_voiced + self.shadow_silent >= self.limit_chunks:
+            if self.shadow_voiced >= self.min_chunks:
+                self.stats["noise_avoided"] += 1
+            self.shadow_voiced = self.shadow_silent = 0
+
+    def segment(self, chunk):
+        """Feed one chunk; returns sr.AudioData when a phrase ends, otherwise None"""
+        energy = pcm_rms(chunk, self.sample_width)
+        self.adapt(energy)
+        threshold = self.recognizer.energy_threshold
+        if not self.frames:
+            self.preroll.append(chunk)
+            if len(self.preroll) > self.preroll_chunks:
+                self.preroll.popleft()
+            if energy <= threshold:
+                self.shadow(energy)
+                return None
+            self.shadow_voiced = self.shadow_silent = 0
+            self.frames = list(self.preroll)
+            self.preroll.clear()
+            self.voiced, self.silent = 1, 0
+            return None
+
+        self.frames.append(chunk)
+        if energy > threshold * RELEASE_RATIO:
+            self.voiced += 1
+            self.silent = 0
+        else:
+            self.silent += 1
+        if self.silent < self.pause_chunks and len(self.frames) < self.limit_chunks:
+            return None
+
+        frames, voiced_chunks = self.frames, self.voiced
+        self.reset_segment()
+        if voiced_chunks < self.min_chunks:
+            self.stats["short"] += 1
+            return None
+        return sr.AudioData(b"".join(frames), self.sample_rate, self.sample_width)
+
+    def push(self, audio):
+        self.stats["phrases"] += 1
+        while True:
+            try:
+                self.phrases.put_nowait(audio)
+                break
+            except queue.Full:
+                try:
+                    self.phrases.get_nowait()
+                    self.stats["dropped"] += 1
+                    log.debug("🎤 Recognition is behind, dropped the oldest phrase")
+                except queue.Empty:
+                    pass
+        self.stats["max_depth"] = max(self.stats["max_depth"], self.phrases.qsize())
+
+    def get(self, timeout=0.5):
+        try:
+            return self.phrases.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def clear(self):
+        while True:
+            try:
+                self.phrases.get_nowait()
+            except queue.Empty:
+                return
+
+    def status_text(self, item=None):
+        return (f"📥 Phrase queue: {self.phrases.qsize()}/{self.phrases.maxsize}"
+                f" (peak {self.stats['max_depth']}, dropped {self.stats['dropped']})")
+
+def is_cjk(ch):
+    return "\u3400" <= ch <= "\u9fff" or "\uf900" <= ch <= "\ufaff"
+
+def build_wake_grammar(words):
+    """
+    Turn wake words into a Vosk grammar list ending with "[unk]" to absorb other speech.
+    The Chinese model's vocabulary often lacks the whole phrase, so CJK words also get a per-character variant.
+    """
+    grammar = []
+    for w in words:
+        w = w.strip()
+        if not w:
+            continue
+        variants = [w]
+        if any(is_cjk(ch) for ch in w):
+            variants.append(" ".join(ch for ch in w if not ch.isspace()))
+        for v in variants:
+            if v not in grammar:
+                grammar.append(v)
+    grammar.append("[unk]")
+    return grammar
+
+class KeywordPrefilter:
+    """
+    On-device pre-filter: decide locally whether a phrase could be a wake word before it goes to the cloud,
+    and drop the clearly irrelevant ones. It errs on the side of letting phrases through; cloud recognition
+    still confirms. Subclasses implement score(audio) -> bool.
+    """
+
+    name = "pre-filter"
+
+    def __init__(self):
+        self.stats = {"checked": 0, "passed": 0}
+
+    def check(self, audio):
+        self.stats["checked"] += 1
+        passed = self.score(audio)
+        if passed:
+            self.stats["passed"] += 1
+        return passed
+
+    def score(self, audio):
+        raise NotImplementedError
+
+    def status_text(self, item=None):
+        checked, passed = self.stats["checked"], self.stats["passed"]
+        ratio = f"{passed / checked:.0%}" if checked else "-"
+        return f"🔎 Local {self.name}: passed {passed}/{checked} ({ratio})"
+
+class AcousticKeywordFilter(KeywordPrefilter):
+    """
+    Model-free acoustic check on 20 ms frames: is there enough voiced speech (span and syllables, i.e.
+    energy peaks) to hold a wake word? Clicks, coughs and taps are shorter than 0.25 s / one syllable.
+    There is no upper bound: the cloud check is a substring match, so "小爱同学 打开音乐" must still pass.
+    """
+
+    name = "acoustic pre-filter"
+
+    def __init__(self, min_seconds=0.25, min_syllables=1):
+        super().__init__()
+        self.min_seconds = min_seconds
+        self.min_syllables = min_syllables
+
+    def score(self, audio):
+        frame = int(audio.sample_rate * 0.02) * audio.sample_width
+        data = audio.frame_data
+        levels = [pcm_rms(data[i:i + frame], audio.sample_width)
+                  for i in range(0, len(data) - frame + 1, frame)]
+        if not levels:
+            return False
+        floor = sorted(levels)[len(levels) // 10]
+        peak = max(levels)
+        gate = floor + (peak - floor) * 0.25
+        voiced = [level > gate for level in levels]
+        if not any(voiced):
+            return False
+        first = voiced.index(True)
+        last = len(voiced) - 1 - voiced[::-1].index(True)
+        seconds = (last - first + 1) * 0.02
+
+        # A syllable starts each time the energy rises through the gate after at least 40 ms of quiet
+        syllables, quiet_run = 0, 5
+        for is_voiced in voiced[first:last + 1]:
+            if is_voiced:
+                if quiet_run >= 2 or syllables == 0:
+                    syllables += 1
+                quiet_run = 0
+            else:
+                quiet_run += 1
+        passed = seconds >= self.min_seconds and syllables >= self.min_syllables
+        log.debug("🔎 Acoustic pre-filter: %.2f s voiced, %d syllables -> %s", seconds, syllables,
+                  "pass" if passed else "skip")
+        return passed
+
+class VoskKeywordFilter(KeywordPrefilter):
+    """
+    Listen once locally with a Vosk wake-word grammar; only matches go to the cloud (needs vosk and a model folder).
+    The Chinese model's vocabulary rarely has a whole wake phrase, so the grammar also lists per-character
+    variants; if no grammar entry is in the vocabulary at all, every phrase passes (fail open) instead of
+    silently rejecting real wake words.
+    """
+
+    name = "Vosk pre-filter"
+
+    def __init__(self, model_path, matcher, words):
+        super().__init__()
+        from vosk import Model, KaldiRecognizer, SetLogLevel
+        SetLogLevel(-1)
+        self.matcher = matcher
+        self.model = Model(str(model_path))
+        grammar, missing = self.usable_grammar(build_wake_grammar(words))
+        if missing:
+            log.warning("⚠️ Vosk pre-filter: not in the model vocabulary, skipped: %s", ", ".join(missing))
+        self.fail_open = not grammar
+        if self.fail_open:
+            log.warning("⚠️ Vosk pre-filter: no wake word is in the model vocabulary, every phrase goes to the cloud")
+            self.recognizer = None
+            return
+        self.recognizer = KaldiRecognizer(self.model, 16000, json.dumps(grammar + ["[unk]"], ensure_ascii=False))
+
+    def usable_grammar(self, grammar):
+        """Keep entries whose every token is in the model vocabulary; older vosk without find_word() keeps all"""
+        find_word = getattr(self.model, "find_word", None)
+        usable, missing = [], []
+        for entry in grammar:
+            if entry == "[unk]":
+                continue
+            if find_word is None or all(find_word(token) >= 0 for token in entry.split()):
+                usable.append(entry)
+            else:
+                missing.append(entry)
+        return usable, missing
+
+    def score(self, audio):
+        if self.fail_open:
+            return True
+        self.recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=16000, convert_width=2))
+        text = json.loads(self.recognizer.FinalResult()).get("text", "")
+        text = text.replace("[unk]", "").replace(" ", "").strip()
+        passed = bool(text) and self.matcher.match(text) is not None
+        log.debug("🔎 Vosk pre-filter: %s -> %s", text or "(nothing)", "pass" if passed else "skip")
+        return passed
+
+def build_prefilter(kind, matcher, model_path="vosk-model-cn"):
+    """kind is off / acoustic / vosk; falls back to the acoustic filter when Vosk is unavailable"""
+    if kind == "acoustic":
+        return AcousticKeywordFilter()
+    if kind == "vosk":
+        try:
+            return VoskKeywordFilter(model_path, matcher, [w for words in WAKE_WORDS.values() for w in words])
+        except Exception as e:
+            log.warning("⚠️ Vosk pre-filter unavailable (%s), using the acoustic pre-filter", e)
+            return AcousticKeywordFilter()
+    return None
+
 class VoiceWakeListener:
     """Listen for voice wake words in multiple languages"""
-    def __init__(self):
+    def __init__(self, recognize=None, languages=("en-US", "zh-CN")):
         self.recognizer = sr.Recognizer()
+        self.recognizer.operation_timeout = RECOGNITION_TIMEOUT  # a stuck request must not hold a pool thread
         self.microphone = sr.Microphone()
         self.is_listening = True
         self.confidence_threshold = 0.7  # Minimum confidence for wake detection
         self.stop_event = threading.Event()  # Event to stop listening immediately
+        self.matcher = WakeMatcher(
+            [w for words in WAKE_WORDS.values() for w in words],
+            self.confidence_threshold,
+            inclusive=True
+        )
+        self.dispatcher = RecognitionDispatcher(recognize or self.recognizer.recognize_google,
+                                                languages, self.matcher)
+        self.prefilter = None  # optional on-device KeywordPrefilter; None sends every phrase to the cloud
+        self.capture = PhraseCapture(self.microphone, self.recognizer,
+                                     active=lambda: self.is_listening and not self.stop_event.is_set(),
+                                     calibrate_seconds=1.0)
         
     def similarity(self, a, b):
         """Calculate string similarity ratio (0-1)"""
@@ -48,67 +758,35 @@ class VoiceWakeListener:
         if not recognized_text:
             return False
         
-        recognized_text = recognized_text.lower().strip()
-        
-        for language, words in WAKE_WORDS.items():
-            for wake_word in words:
-                wake_word_lower = wake_word.lower()
-                
-                # Exact match
-                if wake_word_lower in recognized_text:
-                    return True
-                
-                # Fuzzy match (for handling slight speech recognition errors)
-                similarity = self.similarity(recognized_text, wake_word_lower)
-                if similarity >= self.confidence_threshold:
-                    return True
-        
-        return False
+        # Exact and fuzzy matching (for handling slight speech recognition errors)
+        return self.matcher.match(recognized_text) is not None
     
     def listen_for_wake_word(self):
         """Continuous listening for wake words"""
-        print("🎤 Voice Wake Listener started...")
+        log.info("🎤 Voice Wake Listener started...")
         
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=1)
-            print("🎤 Listening for wake words: 'Xiao Ai', '小爱同学', '小愛同學'...")
+        # The capture thread is started once and keeps the stream open; this loop only recognizes queued phrases
+        self.capture.start()
+        log.info("🎤 Listening for wake words: 'Xiao Ai', '小爱同学', '小愛同學'...")
         
         while self.is_listening and not self.stop_event.is_set():
             try:
-                with self.microphone as source:
-                    # Listen for audio with timeout of 5 seconds
-                    audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=3)
-                
-                # Check if stop was requested while listening
-                if self.stop_event.is_set():
-                    return False
-                    
-                try:
-                    # Try English first
-                    text_en = self.recognizer.recognize_google(audio, language='en-US')
-                    print(f"🎤 English: {text_en}")
-                    
-                    if self.check_wake_word(text_en):
-                        print("✅ English wake word detected!")
-                        return True
-                        
-                except sr.UnknownValueError:
-                    pass
-                
-                try:
-                    # Try Chinese (Simplified and Cantonese)
-                    text_zh = self.recognizer.recognize_google(audio, language='zh-CN')
-                    print(f"🎤 Chinese: {text_zh}")
+                audio = self.capture.get(timeout=0.5)
+                if audio is None or self.stop_event.is_set():
+                    continue
+                if self.prefilter is not None and not self.prefilter.check(audio):
+                    continue
                     
-                    if self.check_wake_word(text_zh):
-                        print("✅ Chinese wake word detected!")
-                        return True
-                        
-                except sr.UnknownValueError:
-                    pass
+                # All languages at once; the first wake-word match wins without waiting for the rest
+                hit = self.dispatcher.dispatch(audio)
+                if hit:
+                    log.info("✅ Wake word detected! (%s)", hit[0])
+                    # Phrases queued before the wake are stale, and what is said during the click is meant for 小愛
+                    self.capture.clear()
+                    return True
                 
             except sr.RequestError as e:
-                print(f"⚠️ API Error: {e}")
+                log.warning("⚠️ API Error: %s", e)
                 time.sleep(2)
             except sr.UnknownValueError:
                 pass
@@ -118,33 +796,136 @@ class VoiceWakeListener:
         
         return False
     
+    def noise_text(self, item=None):
+        """Current energy threshold and the cloud requests it saved (skipped segments x languages)"""
+        capture = self.capture
+        if capture.base_threshold is None:
+            return "🔈 Noise threshold: not calibrated"
+        skipped = capture.stats["noise_avoided"]
+        if self.prefilter is not None:
+            skipped += self.prefilter.stats["checked"] - self.prefilter.stats["passed"]
+        return (f"🔈 Noise threshold: {capture.recognizer.energy_threshold:.0f} (floor {capture.noise:.0f}),"
+                f" {skipped * len(self.dispatcher.languages)} cloud requests saved")
+    
+    def prefilter_text(self, item=None):
+        return self.prefilter.status_text() if self.prefilter is not None else "🔎 Local pre-filter: off"
+    
     def stop(self):
         """Stop the voice listener"""
         self.is_listening = False
-        print("🎤 Voice Wake Listener stopped")
+        self.capture.stop()
+        log.info("🎤 Voice Wake Listener stopped")
 
 # Initialize voice listener
 voice_listener = VoiceWakeListener()
 
 
-def open_xiaoai():
-    try:
-        # Use the correct AppID found on the system
-        app_id = "8497DDF3.639A2791C9AB_kf545nqv09rxe!App"
-        subprocess.Popen(f'explorer.exe shell:appsFolder\\{app_id}', shell=True)
-        print("🚀 Launched 小愛同學")
-        
-        # Auto-click voice button after app opens (if enabled)
-        if AUTO_CLICK_ENABLED:
-            auto_click_thread = threading.Thread(target=auto_click_voice_button, daemon=True)
-            auto_click_thread.start()
-    except Exception as e:
-        print("Error:", e)
+class LaunchCoordinator:
+    """
+    Every trigger (F5, voice) goes through here so at most one launch -> click sequence runs at a time:
+    - a trigger while a sequence is in flight is coalesced, not stacked into another Popen and click
+    - a trigger within `cooldown` seconds after a sequence finished is dropped
+    trigger() never blocks; the sequence runs on the single worker thread.
+    """
+    def __init__(self, run, cooldown=0.5):
+        self.run = run
+        self.cooldown = cooldown
+        self.state = "idle"        # idle / running
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.running = True
+        self.last_finished = 0.0
+        self.stats = {"launched": 0, "coalesced": 0, "dropped": 0}
+        threading.Thread(target=self._worker, name="launcher", daemon=True).start()
+
+    def trigger(self, source="manual"):
+        """Returns True when a launch was queued"""
+        with self.lock:
+            if not self.running or time.monotonic() - self.last_finished < self.cooldown:
+                self.stats["dropped"] += 1
+                return False
+            if self.state != "idle":
+                self.stats["coalesced"] += 1
+                log.debug("🚀 Launch in progress, coalesced trigger from %s", source)
+                return False
+            self.state = "running"
+        self.requests.put(source)
+        return True
+
+    def stop(self):
+        with self.lock:
+            self.running = False
+        self.requests.put(None)
+
+    def _worker(self):
+        while True:
+            source = self.requests.get()
+            if source is None:
+                return
+            try:
+                self.stats["launched"] += 1
+                self.run(source)
+            except Exception as e:
+                log.error("Error: %s", e)
+            finally:
+                with self.lock:
+                    self.state = "idle"
+                    self.last_finished = time.monotonic()
+
+    def status_text(self, item=None):
+        s = self.stats
+        return f"🚀 Launched {s['launched']} | coalesced {s['coalesced']} | dropped {s['dropped']}"
 
-def auto_click_voice_button():
-    """Automatically click the voice input button after app opens"""
+def launch_xiaoai(source):
+    started = time.perf_counter()
+    # Use the correct AppID found on the system
+    app_id = "8497DDF3.639A2791C9AB_kf545nqv09rxe!App"
+    subprocess.Popen(f'explorer.exe shell:appsFolder\\{app_id}', shell=True)
+    log.info("🚀 Launched 小愛同學 (%s)", source)
+    
+    # Auto-click on the same worker thread, so triggers during the click are coalesced too
+    if AUTO_CLICK_ENABLED:
+        auto_click_voice_button(started)
+
+launcher = LaunchCoordinator(launch_xiaoai)
+
+def open_xiaoai(source="manual"):
+    return launcher.trigger(source)
+
+WINDOW_TIMEOUT = 6.0          # wait at most this long for the 小愛同學 window to appear and settle
+READY_POLL_INTERVAL = 0.1     # one window enumeration per poll
+
+def find_xiaoai_window():
+    """Returns the 小愛同學 window, or None while it has not been created yet"""
+    import pygetwindow as gw
+    for win in gw.getAllWindows():
+        title = (win.title or "").lower()
+        if any(t in title for t in ("小爱", "小愛", "xiaoai", "xiaoi")):
+            return win
+    return None
+
+def wait_for_xiaoai_window(timeout=WINDOW_TIMEOUT):
+    """Instead of a flat sleep: poll until the window exists and its rect is the same twice in a row"""
+    deadline = time.monotonic() + timeout
+    last_rect = None
+    while time.monotonic() < deadline:
+        try:
+            win = find_xiaoai_window()
+            rect = (win.left, win.top, win.width, win.height) if win else None
+        except Exception:
+            win, rect = None, None
+        if rect is not None and rect == last_rect and rect[2] > 0 and rect[3] > 0:
+            return win
+        last_rect = rect
+        time.sleep(READY_POLL_INTERVAL)
+    return None
+
+def auto_click_voice_button(started=None):
+    """Click the voice input button as soon as the app window is ready (started: perf_counter at launch)"""
+    started = time.perf_counter() if started is None else started
     try:
-        time.sleep(2.5)  # Wait for app to fully load
+        if wait_for_xiaoai_window() is None:
+            log.warning("⚠️ 小愛同學 window not ready after %gs, clicking anyway", WINDOW_TIMEOUT)
         
         # Get screen size for responsive positioning
         screen_width, screen_height = pyautogui.size()
@@ -154,54 +935,219 @@ def auto_click_voice_button():
         voice_x = int(screen_width * 0.225)  # ~43% of screen width
         voice_y = int(screen_height * 0.388)  # ~38% of screen height
         
-        print(f"🎤 Auto-clicking voice button at ({voice_x}, {voice_y})")
+        log.info("🎤 Auto-clicking voice button at (%s, %s)", voice_x, voice_y)
         pyautogui.click(x=voice_x, y=voice_y)
-        print("✅ Voice input button clicked")
+        log.info("✅ Voice input button clicked (%.0f ms after launch)", (time.perf_counter() - started) * 1000)
     except ImportError:
-        print("⚠️ PyAutoGUI not installed. Install with: pip install pyautogui")
+        log.warning("⚠️ PyAutoGUI not installed. Install with: pip install pyautogui")
     except Exception as e:
-        print(f"⚠️ Auto-click failed: {e}")
-
-def on_f5_press():
-    """Called when F5 is pressed down"""
-    global f5_press_time, f5_hold_triggered
-    f5_press_time = time.time()
-    f5_hold_triggered = False
-    print("⏳ Hold F5 for 1 second to open 小愛同學...")
-    
-    # Start monitoring in background thread
-    def monitor_f5_hold():
-        global f5_hold_triggered
-        start_time = f5_press_time
-        hold_duration = 1.0
-        
-        # Monitor for exactly 1 second
-        while time.time() - start_time < hold_duration:
-            if not keyboard.is_pressed('F5'):
-                # Key was released before 1 second - do nothing
+        log.warning("⚠️ Auto-click failed: %s", e)
+
+def key_state_probe():
+    """On Windows, read the real key state with GetAsyncKeyState; elsewhere return None (no resync)"""
+    if sys.platform != "win32":
+        return None
+    import ctypes
+    user32 = ctypes.windll.user32
+
+    def probe(scan_code):
+        vk = user32.MapVirtualKeyW(scan_code, 1)   # MAPVK_VSC_TO_VK; unmapped codes count as pressed
+        return not vk or bool(user32.GetAsyncKeyState(vk) & 0x8000)
+
+    return probe
+
+class HoldGestureEngine:
+    """Hold and chord gestures driven by keyboard key-down/key-up events and one reusable timer.
+
+    - bind("f5", callback, hold=1.0): fires once the chord has been held for `hold` seconds;
+      hold=0 fires as soon as every key of the chord is down
+    - Fires exactly once per press: OS auto-repeat key-downs are ignored and a binding
+      re-arms only after one of its keys is released
+    - A single timer thread sleeps until the nearest deadline; nothing polls while idle.
+      Callbacks run on that thread (or the keyboard hook thread for hold=0), keep them short
+    """
+    MODIFIER_KEYS = ("ctrl", "shift", "alt", "windows")
+
+    def __init__(self, resolve=None, probe=None):
+        self.resolve = resolve          # key name -> scan codes, keyboard.key_to_scan_codes by default
+        self.lock = threading.Lock()
+        self.wake = threading.Condition()
+        self.bindings = {}
+        self.next_id = 0
+        self.down = set()
+        self.hook = None
+        self.timer = None
+        self.running = False
+        self.armed = None               # deadline the timer thread is waiting for (monotonic)
+        if probe is None and resolve is None:
+            probe = key_state_probe()
+        self.probe = probe              # scan code -> is it really pressed, used to drop keys whose key-up was missed
+        self.modifiers = None
+        self.stats = {"fired": 0, "repeats_ignored": 0, "stuck_cleared": 0}
+
+    def parse(self, chord):
+        resolve = self.resolve or keyboard.key_to_scan_codes
+        names = [k.strip().lower() for k in chord.split("+")]
+        if not all(names):
+            raise ValueError(f"Cannot parse hotkey: {chord}")
+        return [frozenset(resolve(name)) for name in names]
+
+    def bind(self, chord, callback, hold=0.0):
+        keys = self.parse(chord)
+        with self.lock:
+            self.next_id += 1
+            self.bindings[self.next_id] = {"keys": keys, "callback": callback, "hold": float(hold),
+                                           "deadline": None, "fired": False}
+        if self.hook is None and self.resolve is None:
+            self.hook = keyboard.hook(self._on_event)
+        return self.next_id
+
+    def unbind(self, binding_id):
+        with self.lock:
+            self.bindings.pop(binding_id, None)
+            deadline = self._next_deadline()
+        self._schedule(deadline)
+
+    def stop(self):
+        with self.lock:
+            self.bindings.clear()
+            self.down.clear()
+        with self.wake:
+            self.running = False
+            self.wake.notify()
+        if self.hook is not None:
+            try:
+                keyboard.unhook(self.hook)
+            except Exception:
+                pass
+            self.hook = None
+
+    def _on_event(self, event):
+        self.feed(event.scan_code, event.event_type == keyboard.KEY_DOWN)
+
+    def _modifier_codes(self):
+        if self.modifiers is None:
+            resolve = self.resolve or keyboard.key_to_scan_codes
+            codes = set()
+            for name in self.MODIFIER_KEYS:
+                try:
+                    codes.update(resolve(name))
+                except (ValueError, KeyError):
+                    pass
+            self.modifiers = frozenset(codes)
+        return self.modifiers
+
+    def _held(self, b):
+        # Modifiers must match exactly: holding ctrl+shift+1 does not fire ctrl+1
+        if not all(codes & self.down for codes in b["keys"]):
+            return False
+        chord = frozenset().union(*b["keys"])
+        return not (self.down & self._modifier_codes()) - chord
+
+    def _resync(self, scan_code):
+        """A missed key-up (lock screen, UAC prompt, desktop switch) leaves a key in `down` forever: resync with the OS on every new event"""
+        if self.probe is None:
+            return
+        for code in list(self.down):
+            if code != scan_code and not self.probe(code):
+                self.down.discard(code)
+                self.stats["stuck_cleared"] += 1
+
+    def _next_deadline(self):
+        return min((b["deadline"] for b in self.bindings.values() if b["deadline"] is not None), default=None)
+
+    def feed(self, scan_code, pressed, now=None):
+        now = time.monotonic() if now is None else now
+        due = []
+        with self.lock:
+            self._resync(scan_code)
+            if pressed:
+                if scan_code in self.down:
+                    self.stats["repeats_ignored"] += 1
+                    return
+                self.down.add(scan_code)
+                for b in self.bindings.values():
+                    if not self._held(b):
+                        b["deadline"] = None    # an extra modifier went down: cancel the hold timer
+                        if not any(codes & self.down for codes in b["keys"]):
+                            b["fired"] = False
+                        continue
+                    if b["fired"] or b["deadline"] is not None:
+                        continue
+                    if b["hold"] <= 0:
+                        b["fired"] = True
+                        due.append(b["callback"])
+                    else:
+                        b["deadline"] = now + b["hold"]
+            else:
+                self.down.discard(scan_code)
+                for b in self.bindings.values():
+                    if not self._held(b):
+                        b["deadline"] = None
+                        b["fired"] = False
+            deadline = self._next_deadline()
+        self._schedule(deadline)
+        self._fire(due)
+
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        due = []
+        with self.lock:
+            for b in self.bindings.values():
+                if b["deadline"] is not None and b["deadline"] <= now:
+                    b["deadline"] = None
+                    if self._held(b):
+                        b["fired"] = True
+                        due.append(b["callback"])
+            deadline = self._next_deadline()
+        self._schedule(deadline)
+        self._fire(due)
+
+    def _fire(self, callbacks):
+        for callback in callbacks:
+            self.stats["fired"] += 1
+            try:
+                callback()
+            except Exception as e:
+                log.warning("⚠️ Hotkey action failed: %s", e)
+
+    def _schedule(self, deadline):
+        with self.wake:
+            if deadline == self.armed:
                 return
-            time.sleep(0.05)
-        
-        # F5 was held for 1 second - launch ONCE
-        if keyboard.is_pressed('F5') and not f5_hold_triggered:
-            f5_hold_triggered = True
-            open_xiaoai()
-            print("✅ F5 held for 1 second - Launching 小愛同學")
-    
-    monitor_thread = threading.Thread(target=monitor_f5_hold, daemon=True)
-    monitor_thread.start()
+            self.armed = deadline
+            self.wake.notify()
+            if deadline is not None and self.timer is None:
+                self.running = True
+                self.timer = threading.Thread(target=self._timer_loop, daemon=True)
+                self.timer.start()
+
+    def _timer_loop(self):
+        """Single reusable timer: wait on the condition until the armed deadline, no polling"""
+        while True:
+            with self.wake:
+                while self.running and (self.armed is None or self.armed > time.monotonic()):
+                    self.wake.wait(None if self.armed is None else self.armed - time.monotonic())
+                if not self.running:
+                    self.timer = None
+                    return
+                self.armed = None
+            self.expire()
+
+
+hold_gestures = HoldGestureEngine()
 
-def on_f5_release():
-    """Called when F5 is released"""
-    global f5_press_time, f5_hold_triggered
-    f5_press_time = None
+def on_f5_hold():
+    """Called once when F5 has been held for F5_HOLD_SECONDS"""
+    log.info("✅ F5 held for %g second(s) - Launching 小愛同學", F5_HOLD_SECONDS)
+    open_xiaoai("F5")
 
 def toggle_voice_wake(icon=None, item=None):
     """Toggle voice wake feature on/off"""
     global voice_wake_enabled
     voice_wake_enabled = not voice_wake_enabled
     status = "✅ ENABLED" if voice_wake_enabled else "❌ DISABLED"
-    print(f"🎤 Voice Wake {status}")
+    log.info("🎤 Voice Wake %s", status)
     
     # Reset the stop event when enabling, set it when disabling
     if voice_wake_enabled:
@@ -218,21 +1164,29 @@ def update_tray_menu():
         voice_status = "✅ Voice Wake: ON" if voice_wake_enabled else "❌ Voice Wake: OFF"
         menu = Menu(
             MenuItem('🚀 小愛同學 Launcher', lambda: None, enabled=False),
-            MenuItem('📌 Hold F5 for 1 second', lambda: None, enabled=False),
+            MenuItem(f'📌 Hold F5 for {F5_HOLD_SECONDS:g} second(s)', lambda: None, enabled=False),
+            MenuItem(launcher.status_text, lambda: None, enabled=False),
             MenuItem(voice_status, toggle_voice_wake),
+            MenuItem(voice_listener.dispatcher.status_text, lambda: None, enabled=False),
+            MenuItem(voice_listener.capture.status_text, lambda: None, enabled=False),
+            MenuItem(voice_listener.noise_text, lambda: None, enabled=False),
+            MenuItem(voice_listener.prefilter_text, lambda: None, enabled=False),
+            MenuItem('🐞 Debug messages', toggle_debug_logging, checked=lambda item: log.isEnabledFor(logging.DEBUG)),
             MenuItem('Stop launcher', stop_program),
         )
         icon_instance.menu = menu
 
 def stop_program(icon=None, item=None):
     global voice_listener, voice_listener_active
-    print("\n⛔ Stopping the launcher...")
+    log.info("⛔ Stopping the launcher...")
     
     # Stop voice listener thread
     voice_listener_active = False
     voice_listener.stop()
+    launcher.stop()
     
     # Unregister keyboard listener
+    hold_gestures.stop()
     try:
         keyboard.unhook_all()
     except:
@@ -244,7 +1198,8 @@ def stop_program(icon=None, item=None):
     except:
         pass
     
-    print("✅ Launcher closed completely")
+    log.info("✅ Launcher closed completely")
+    stop_logging()  # os._exit skips atexit, flush the log queue first
     import os
     os._exit(0)  # Force exit to ensure complete shutdown
 
@@ -261,7 +1216,20 @@ import argparse
 parser = argparse.ArgumentParser(description='小愛同學 Launcher with Voice Wake')
 parser.add_argument('--no-voice', action='store_true', help='Disable voice wake feature on startup')
 parser.add_argument('--no-auto-click', action='store_true', help='Disable auto-click voice button on app launch')
+parser.add_argument('--hold-seconds', type=float, default=F5_HOLD_SECONDS, help='How long F5 must be held to launch (default: 1.0)')
+parser.add_argument('--debug', action='store_true', help='Show debug messages (can also be toggled from the tray menu)')
+parser.add_argument('--languages', default='en-US,zh-CN', help='Comma-separated languages recognized in parallel')
+parser.add_argument('--recognizer-endpoint', metavar='URL', help='Use a Google-compatible recognition service instead (e.g. a local test server)')
+parser.add_argument('--prefilter', choices=['off', 'acoustic', 'vosk'], default='off',
+                    help='Drop phrases that clearly are not a wake word on-device before cloud recognition')
+parser.add_argument('--vosk-model', default='vosk-model-cn', help='Model folder for --prefilter vosk')
 args = parser.parse_args()
+setup_logging(args.debug)
+F5_HOLD_SECONDS = args.hold_seconds
+voice_listener.dispatcher.configure(
+    recognize=http_recognizer(args.recognizer_endpoint) if args.recognizer_endpoint else None,
+    languages=[lang.strip() for lang in args.languages.split(',') if lang.strip()])
+voice_listener.prefilter = build_prefilter(args.prefilter, voice_listener.matcher, args.vosk_model)
 
 # Global flag for auto-click
 AUTO_CLICK_ENABLED = not args.no_auto_click
@@ -269,18 +1237,23 @@ AUTO_CLICK_ENABLED = not args.no_auto_click
 if args.no_voice:
     voice_wake_enabled = False
     voice_listener.stop_event.set()
-    print("⚠️ Voice Wake Feature DISABLED (use --no-voice flag to disable)")
+    log.warning("⚠️ Voice Wake Feature DISABLED (use --no-voice flag to disable)")
 
-# Register F5 key events
-keyboard.on_press_key('f5', lambda _: on_f5_press())
-keyboard.on_release_key('f5', lambda _: on_f5_release())
+# Register the F5 hold gesture (key-down/key-up events, one shared timer)
+hold_gestures.bind('f5', on_f5_hold, hold=F5_HOLD_SECONDS)
 
 # Create tray menu
 voice_status = "✅ Voice Wake: ON" if voice_wake_enabled else "❌ Voice Wake: OFF"
 menu = Menu(
     MenuItem('🚀 小愛同學 Launcher', lambda: None, enabled=False),
-    MenuItem('📌 Hold F5 for 1 second', lambda: None, enabled=False),
+    MenuItem(f'📌 Hold F5 for {F5_HOLD_SECONDS:g} second(s)', lambda: None, enabled=False),
+    MenuItem(launcher.status_text, lambda: None, enabled=False),
     MenuItem(voice_status, toggle_voice_wake),
+    MenuItem(voice_listener.dispatcher.status_text, lambda: None, enabled=False),
+    MenuItem(voice_listener.capture.status_text, lambda: None, enabled=False),
+    MenuItem(voice_listener.noise_text, lambda: None, enabled=False),
+    MenuItem(voice_listener.prefilter_text, lambda: None, enabled=False),
+    MenuItem('🐞 Debug messages', toggle_debug_logging, checked=lambda item: log.isEnabledFor(logging.DEBUG)),
     MenuItem('Stop launcher', stop_program),
 )
 
@@ -288,23 +1261,22 @@ menu = Menu(
 icon = Icon("XiaoiLauncher", create_icon(), menu=menu)
 icon_instance = icon
 
-print("=" * 50)
-print("✅ 小愛同學 Launcher is running!")
-print("=" * 50)
-print("📌 HOLD F5 key for 1 second to launch 小愛同學")
+log.info("=" * 50)
+log.info("✅ 小愛同學 Launcher is running!")
+log.info("=" * 50)
+log.info("📌 HOLD F5 key for %g second(s) to launch 小愛同學", F5_HOLD_SECONDS)
 if voice_wake_enabled:
-    print("🎤 Voice Wake: ENABLED")
-    print("   Say: \"Xiao Ai\" / \"小爱同学\" / \"小愛同學\"")
+    log.info("🎤 Voice Wake: ENABLED")
+    log.info("   Say: \"Xiao Ai\" / \"小爱同学\" / \"小愛同學\"")
 else:
-    print("🎤 Voice Wake: DISABLED")
-    print("   (Right-click tray menu to enable)")
-print("📌 Right-click tray icon (bottom right) for menu")
+    log.info("🎤 Voice Wake: DISABLED")
+    log.info("   (Right-click tray menu to enable)")
+log.info("📌 Right-click tray icon (bottom right) for menu")
 if AUTO_CLICK_ENABLED:
-    print("🖱️  Auto-Click: ENABLED (voice button auto-clicks)")
+    log.info("🖱️  Auto-Click: ENABLED (voice button auto-clicks)")
 else:
-    print("🖱️  Auto-Click: DISABLED")
-print("=" * 50)
-print()
+    log.info("🖱️  Auto-Click: DISABLED")
+log.info("=" * 50)
 
 # Start voice wake listener in separate thread
 def voice_wake_thread():
@@ -314,12 +1286,12 @@ def voice_wake_thread():
             # Only listen if voice wake is enabled
             if voice_wake_enabled:
                 if voice_listener.listen_for_wake_word():
-                    open_xiaoai()
+                    open_xiaoai("voice")
             else:
                 # Sleep briefly when disabled to reduce CPU usage
                 time.sleep(0.5)
         except Exception as e:
-            print(f"⚠️ Voice listener error: {e}")
+            log.warning("⚠️ Voice listener error: %s", e)
             time.sleep(2)
 
 voice_thread = threading.Thread(target=voice_wake_thread, daemon=True)
@@ -329,11 +1301,11 @@ voice_thread.start()
 tray_thread = threading.Thread(target=icon.run, daemon=True)
 tray_thread.start()
 
-print("\n💡 TIP: Right-click the tray icon to toggle Voice Wake ON/OFF")
-print("    Or start with:")
-print("    • python xiaoi_launcher.py --no-voice")
-print("    • python xiaoi_launcher.py --no-auto-click")
-print("    • python xiaoi_launcher.py --no-voice --no-auto-click")
+log.info("💡 TIP: Right-click the tray icon to toggle Voice Wake ON/OFF")
+log.info("    Or start with:")
+log.info("    • python xiaoi_launcher.py --no-voice")
+log.info("    • python xiaoi_launcher.py --no-auto-click")
+log.info("    • python xiaoi_launcher.py --no-voice --no-auto-click")
 
 # Keep the script alive
 try:
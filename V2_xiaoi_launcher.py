@@ -11,6 +11,15 @@ import sys
 import threading
 import time
 import json
+import array
+import math
+import statistics
+import concurrent.futures
+from collections import deque
+import logging
+import queue
+import atexit
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 import argparse
 from pystray import Icon, Menu, MenuItem
@@ -27,8 +36,7 @@ from pynput.mouse import Controller as MouseController
 
 CACHE_FILE = Path("button_locations.json")
 
-f5_press_time = None
-f5_hold_triggered = False
+F5_HOLD_SECONDS = 1.0
 voice_listener_active = True
 voice_wake_enabled = True
 icon_instance = None
@@ -44,8 +52,97 @@ VOICE_BUTTON_POS = None     # (x, y)
 
 # 鎖鼠相關
 mouse_controller = MouseController()
-lock_active = False
-lock_thread = None
+cursor_lock = None
+
+# ───────────────────────────────────────────────
+#  日誌：分級、限流，由背景執行緒寫到 console
+# ───────────────────────────────────────────────
+
+LOG_QUEUE_SIZE = 2000         # 佇列滿了就丟棄並計數，不讓錄音執行緒等 console
+LOG_RATE_INTERVAL = 5.0       # 同一行程式碼的訊息，每 5 秒最多輸出 LOG_RATE_BURST 則
+LOG_RATE_BURST = 5
+
+log = logging.getLogger("xiaoi")
+log_listener = None
+log_handler = None
+
+
+class RateLimitFilter(logging.Filter):
+    """以呼叫位置（檔案 + 行號）限流，被略過的則數附在該位置下一則輸出的訊息後面"""
+
+    def __init__(self, interval=LOG_RATE_INTERVAL, burst=LOG_RATE_BURST):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        with self.lock:
+            start, count, skipped = self.windows.get(key, (record.created, 0, 0))
+            if record.created - start >= self.interval:
+                start, count = record.created, 0
+            if count >= self.burst:
+                self.windows[key] = (start, count, skipped + 1)
+                return False
+            self.windows[key] = (start, count + 1, 0)
+        if skipped:
+            record.msg = f"{record.getMessage()}（另有 {skipped} 則同位置的訊息被略過）"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """put_nowait 失敗就丟棄並計數，呼叫端絕不會被寫出速度拖慢"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(debug=False):
+    global log_listener, log_handler
+    log.setLevel(logging.DEBUG if debug else logging.INFO)
+    if log_listener is not None:
+        return
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s", "%H:%M:%S"))
+    log_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    log_handler.addFilter(RateLimitFilter())
+    log.addHandler(log_handler)
+    log.propagate = False
+    log_listener = QueueListener(log_handler.queue, console)
+    log_listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    # 結束前把佇列裡剩下的訊息寫完
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        if log_handler.dropped:
+            # 佇列已停止，直接交給 console 寫出
+            log_listener.handle(log.makeRecord(log.name, logging.WARNING, __file__, 0,
+                                               "日誌佇列滿載，共丟棄 %d 則訊息", (log_handler.dropped,), None))
+        log_listener = None
+
+
+def set_debug_logging(enabled):
+    log.setLevel(logging.DEBUG if enabled else logging.INFO)
+    log.info("除錯訊息：%s", "開啟" if enabled else "關閉")
+
+
+def toggle_debug_logging(icon=None, item=None):
+    set_debug_logging(not log.isEnabledFor(logging.DEBUG))
+
+
+setup_logging()
 
 # ───────────────────────────────────────────────
 #  位置快取管理（不變）
@@ -60,10 +157,10 @@ def load_cached_position():
             data = json.load(f)
         if "voice_button" in data and "coords" in data["voice_button"]:
             VOICE_BUTTON_POS = tuple(data["voice_button"]["coords"])
-            print(f"已載入快取位置：{VOICE_BUTTON_POS}")
+            log.info("已載入快取位置：%s", VOICE_BUTTON_POS)
             return True
     except Exception as e:
-        print(f"讀取快取失敗：{e}")
+        log.warning("讀取快取失敗：%s", e)
     return False
 
 
@@ -78,22 +175,22 @@ def save_position(coords):
         }
         with open(CACHE_FILE, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"位置已儲存至 {CACHE_FILE}")
+        log.info("位置已儲存至 %s", CACHE_FILE)
     except Exception as e:
-        print(f"儲存位置失敗：{e}")
+        log.warning("儲存位置失敗：%s", e)
 
 
 def calibrate_voice_button():
     global VOICE_BUTTON_POS
 
-    print("\n" + "="*70)
-    print("🎯  小愛同學 語音按鈕位置校準")
-    print("請先開啟小愛同學 App，並確保視窗顯示正常")
-    print("="*70)
-    print("1. 將滑鼠游標移動到 語音輸入按鈕（左側彩色圓圈）的正中央")
-    print("2. 按下 'c' 鍵 確認位置")
-    print("3. 按下 'q' 鍵 取消/跳過")
-    print("="*70 + "\n")
+    log.info("="*70)
+    log.info("🎯  小愛同學 語音按鈕位置校準")
+    log.info("請先開啟小愛同學 App，並確保視窗顯示正常")
+    log.info("="*70)
+    log.info("1. 將滑鼠游標移動到 語音輸入按鈕（左側彩色圓圈）的正中央")
+    log.info("2. 按下 'c' 鍵 確認位置")
+    log.info("3. 按下 'q' 鍵 取消/跳過")
+    log.info("="*70)
 
     from pynput import keyboard as kb_listener
     recorded = [None]
@@ -102,15 +199,15 @@ def calibrate_voice_button():
         try:
             if key.char == 'c':
                 recorded[0] = pyautogui.position()
-                print(f"\n確認位置：{recorded[0]}")
+                log.info("確認位置：%s", recorded[0])
                 return False
             if key.char == 'q':
-                print("\n已取消校準")
+                log.info("已取消校準")
                 return False
         except AttributeError:
             pass
 
-    print("正在監聽鍵盤... (c = 確認, q = 取消)")
+    log.info("正在監聽鍵盤... (c = 確認, q = 取消)")
     with kb_listener.Listener(on_press=on_press) as listener:
         while listener.is_alive():
             time.sleep(0.1)
@@ -123,73 +220,425 @@ def calibrate_voice_button():
 
 
 # ───────────────────────────────────────────────
-#  強制激活小愛同學視窗
+#  強制激活小愛同學視窗：等視窗事件（SetWinEventHook），不輪詢標題
 # ───────────────────────────────────────────────
 
-def activate_xiaoai_window(max_tries=5, wait_per_try=0.6):
-    for attempt in range(1, max_tries + 1):
-        try:
-            windows = gw.getWindowsWithTitle("小爱") or \
-                      gw.getWindowsWithTitle("XiaoAi") or \
-                      gw.getWindowsWithTitle("小愛同學") or \
-                      gw.getWindowsWithTitle("xiaoi")
+XIAOAI_TITLES = ["小爱", "XiaoAi", "小愛同學", "xiaoi", "小愛"]   # 依序比對，先找到的優先
+WINDOW_TIMEOUT = 6.0          # 等待視窗出現並成為前景的上限（秒）
+CLICK_READY_TIMEOUT = 2.5     # 等視窗大小穩定的上限，逾時仍照常點擊
+READY_POLL_INTERVAL = 0.04    # 只讀視窗矩形（GetWindowRect），不列舉視窗
 
-            if not windows:
-                time.sleep(wait_per_try)
-                continue
 
-            win = windows[0]
-            if win.isMinimized:
-                win.restore()
-            win.activate()
-            time.sleep(0.3)
+class WindowBackend:
+    """
+    視窗監看後端介面：
+    - start(on_event)：視窗出現、改名、成為前景時呼叫 on_event()（可在任意執行緒）
+    - find_window()：回傳小愛同學視窗的 handle，找不到回傳 None
+    - is_foreground(handle) / activate(handle)
+    poll_interval 為 None 代表事件驅動；否則監看器會以該間隔重新檢查。
+    """
+    poll_interval = None
+
+    def start(self, on_event):
+        self.on_event = on_event
+
+    def stop(self):
+        pass
 
-            if is_xiaoai_window_active():
-                print(f"成功激活小愛同學視窗")
-                return True
+    def find_window(self):
+        raise NotImplementedError
 
-            time.sleep(wait_per_try)
+    def is_foreground(self, handle):
+        raise NotImplementedError
 
-        except:
-            pass
+    def activate(self, handle):
+        raise NotImplementedError
+
+    def window_rect(self, handle):
+        """回傳 (left, top, right, bottom)"""
+        raise NotImplementedError
+
+    def client_rect(self, handle):
+        """工作區（不含標題列與邊框）的螢幕座標；預設與視窗矩形相同"""
+        return self.window_rect(handle)
+
+
+class Win32EventBackend(WindowBackend):
+    """用 SetWinEventHook 接收前景切換與視窗顯示事件（正式環境）"""
+
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    EVENT_SYSTEM_MINIMIZEEND = 0x0017
+    EVENT_OBJECT_SHOW = 0x8002
+    EVENT_OBJECT_NAMECHANGE = 0x800C
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    WM_QUIT = 0x0012
+    SW_RESTORE = 9
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.wintypes = wintypes
+        self.user32 = ctypes.WinDLL("user32", use_last_error=True)
+        self.kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        self.WinEventProc = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD
+        )
+        self.EnumWindowsProc = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+        self.user32.SetWinEventHook.restype = wintypes.HANDLE
+        self.user32.SetWinEventHook.argtypes = [
+            wintypes.UINT, wintypes.UINT, wintypes.HMODULE, self.WinEventProc,
+            wintypes.DWORD, wintypes.DWORD, wintypes.UINT
+        ]
+        self.user32.GetForegroundWindow.restype = wintypes.HWND
+        self.thread_id = None
+        self.ready = threading.Event()
+        self.hooks = []
+
+    def start(self, on_event):
+        self.on_event = on_event
+        threading.Thread(target=self._run, daemon=True).start()
+        if not self.ready.wait(1.0) or not self.hooks:
+            raise RuntimeError("SetWinEventHook 安裝失敗")
+
+    def _run(self):
+        self.thread_id = self.kernel32.GetCurrentThreadId()
+        self._proc = self.WinEventProc(self._callback)   # 保留參考，避免被回收
+        for event in (self.EVENT_SYSTEM_FOREGROUND, self.EVENT_SYSTEM_MINIMIZEEND,
+                      self.EVENT_OBJECT_SHOW, self.EVENT_OBJECT_NAMECHANGE):
+            hook = self.user32.SetWinEventHook(event, event, None, self._proc, 0, 0, self.WINEVENT_OUTOFCONTEXT)
+            if hook:
+                self.hooks.append(hook)
+        self.ready.set()
+
+        msg = self.wintypes.MSG()
+        while self.user32.GetMessageW(self.ctypes.byref(msg), None, 0, 0) > 0:
+            self.user32.TranslateMessage(self.ctypes.byref(msg))
+            self.user32.DispatchMessageW(self.ctypes.byref(msg))
+
+        for hook in self.hooks:
+            self.user32.UnhookWinEvent(hook)
+        self.hooks = []
+
+    def _callback(self, hook, event, hwnd, id_object, id_child, thread, time_ms):
+        if id_object != 0 or not hwnd:   # 只關心 OBJID_WINDOW
+            return
+        if event == self.EVENT_SYSTEM_FOREGROUND or is_xiaoai_title(self._title(hwnd)):
+            self.on_event()
+
+    def _title(self, hwnd):
+        length = self.user32.GetWindowTextLengthW(hwnd)
+        if length <= 0:
+            return ""
+        buf = self.ctypes.create_unicode_buffer(length + 1)
+        self.user32.GetWindowTextW(hwnd, buf, length + 1)
+        return buf.value
+
+    def stop(self):
+        if self.thread_id:
+            self.user32.PostThreadMessageW(self.thread_id, self.WM_QUIT, 0, 0)
+
+    def find_window(self):
+        windows = []
+
+        def collect(hwnd, lparam):
+            if self.user32.IsWindowVisible(hwnd):
+                title = self._title(hwnd)
+                if title:
+                    windows.append((hwnd, title))
+            return True
+
+        self.user32.EnumWindows(self.EnumWindowsProc(collect), 0)
+        for wanted in XIAOAI_TITLES:
+            for hwnd, title in windows:
+                if wanted.lower() in title.lower():
+                    return hwnd
+        return None
+
+    def is_foreground(self, handle):
+        return self.user32.GetForegroundWindow() == handle
+
+    def activate(self, handle):
+        if self.user32.IsIconic(handle):
+            self.user32.ShowWindow(handle, self.SW_RESTORE)
+        self.user32.SetForegroundWindow(handle)
+
+    def window_rect(self, handle):
+        rect = self.wintypes.RECT()
+        if not self.user32.GetWindowRect(handle, self.ctypes.byref(rect)):
+            return None
+        return rect.left, rect.top, rect.right, rect.bottom
+
+    def client_rect(self, handle):
+        rect = self.wintypes.RECT()
+        if not self.user32.GetClientRect(handle, self.ctypes.byref(rect)):
+            return None
+        origin = self.wintypes.POINT(0, 0)
+        self.user32.ClientToScreen(handle, self.ctypes.byref(origin))
+        return origin.x, origin.y, origin.x + rect.right, origin.y + rect.bottom
+
+
+class PollingWindowBackend(WindowBackend):
+    """無法安裝事件 hook 時的備援：用 pygetwindow 定時檢查，每次只列舉一次視窗"""
+    poll_interval = 0.1
+
+    def find_window(self):
+        windows = [w for w in gw.getAllWindows() if w.title]
+        for wanted in XIAOAI_TITLES:
+            for win in windows:
+                if wanted.lower() in win.title.lower():
+                    return win
+        return None
+
+    def is_foreground(self, handle):
+        return is_xiaoai_title(gw.getActiveWindowTitle() or "")
+
+    def activate(self, handle):
+        if handle.isMinimized:
+            handle.restore()
+        handle.activate()
+
+    def window_rect(self, handle):
+        return handle.left, handle.top, handle.right, handle.bottom
+
+
+def is_xiaoai_title(title):
+    title = title.lower()
+    return any(t in title for t in ["小爱", "小愛", "xiaoai", "xiaoi"])
+
+
+class WindowWatcher:
+    """等待小愛同學視窗出現／成為前景，事件一到就喚醒等待中的點擊流程"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.cond = threading.Condition()
+        self.backend.start(self._on_event)
+
+    def _on_event(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def wait_for(self, predicate, timeout):
+        """predicate() 為真就回傳其值；逾時回傳 None。事件驅動時每 0.25 秒仍會保底重查一次"""
+        deadline = time.monotonic() + timeout
+        recheck = self.backend.poll_interval or 0.25
+        with self.cond:
+            while True:
+                result = predicate()
+                if result:
+                    return result
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.cond.wait(min(remaining, recheck))
+
+    def activate(self, timeout=WINDOW_TIMEOUT, on_found=None):
+        """成功時回傳視窗 handle，失敗回傳 None；找到視窗（尚未激活）時呼叫 on_found()"""
+        start = time.monotonic()
+        handle = self.wait_for(self.backend.find_window, timeout)
+        if handle is None:
+            return None
+        if on_found:
+            on_found()
+        if self.backend.is_foreground(handle):
+            return handle
+
+        for _ in range(2):
+            self.backend.activate(handle)
+            remaining = timeout - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            if self.wait_for(lambda: self.backend.is_foreground(handle), min(remaining, timeout / 2)):
+                return handle
+        return None
+
+
+window_watcher = None
+
+
+def get_window_watcher():
+    global window_watcher
+    if window_watcher is None:
+        if sys.platform == "win32":
+            try:
+                window_watcher = WindowWatcher(Win32EventBackend())
+                return window_watcher
+            except Exception as e:
+                log.debug("視窗事件 hook 無法使用，改用輪詢：%s", e)
+        window_watcher = WindowWatcher(PollingWindowBackend())
+    return window_watcher
+
+
+def activate_xiaoai_window(timeout=WINDOW_TIMEOUT):
+    """視窗一出現就激活，成為前景後回傳視窗 handle；逾時回傳 None"""
+    start = time.perf_counter()
+    try:
+        handle = get_window_watcher().activate(timeout)
+        if handle:
+            log.info("成功激活小愛同學視窗（%.0f ms）", (time.perf_counter() - start) * 1000)
+            return handle
+    except Exception as e:
+        log.warning("激活小愛同學視窗失敗：%s", e)
+
+    log.warning("無法自動激活小愛視窗，請手動點擊")
+    return None
 
-    print("無法自動激活小愛視窗，請手動點擊")
+
+def wait_until_clickable(handle, timeout=CLICK_READY_TIMEOUT):
+    """視窗位置大小連續兩次相同才算畫面就緒，回傳是否在時限內就緒"""
+    backend = get_window_watcher().backend
+    deadline = time.monotonic() + timeout
+    last_rect = None
+    while time.monotonic() < deadline:
+        try:
+            rect = backend.window_rect(handle)
+        except Exception:
+            rect = None
+        if rect is not None and rect == last_rect and rect[2] > rect[0] and rect[3] > rect[1]:
+            return True
+        last_rect = rect
+        time.sleep(READY_POLL_INTERVAL)
     return False
 
 
 # ───────────────────────────────────────────────
-#  單次點擊 + 短暫鎖鼠
+#  單次點擊 + 短暫鎖鼠：在輸入 hook 直接擋掉使用者的移動事件
 # ───────────────────────────────────────────────
 
-def lock_mouse_at(x, y):
-    global lock_active
-    while lock_active:
-        try:
-            cx, cy = mouse_controller.position
-            if abs(cx - x) > 8 or abs(cy - y) > 8:
-                mouse_controller.position = (x, y)
-            time.sleep(0.005)
-        except:
-            time.sleep(0.02)
+class MouseLockBackend:
+    """
+    滑鼠鎖定後端介面：start(x, y, on_move) 開始攔截，on_move(x, y, injected)
+    回傳 True 代表這個移動事件要被擋掉；stop() 結束攔截。
+    """
+
+    def start(self, x, y, on_move):
+        raise NotImplementedError
 
+    def stop(self):
+        pass
+
+
+class PynputHookBackend(MouseLockBackend):
+    """Windows 低階滑鼠 hook（pynput win32_event_filter），在事件送達游標前就擋掉"""
+
+    WM_MOUSEMOVE = 0x0200
+    LLMHF_INJECTED = 0x01
+
+    def __init__(self):
+        self.listener = None
+
+    def start(self, x, y, on_move):
+        from pynput import mouse
+
+        def win32_filter(msg, data):
+            if msg == self.WM_MOUSEMOVE:
+                injected = bool(data.flags & self.LLMHF_INJECTED)
+                if on_move(data.pt.x, data.pt.y, injected):
+                    self.listener.suppress_event()
+            return False   # 不需要 pynput 再呼叫 Python 回呼
+
+        self.listener = mouse.Listener(win32_event_filter=win32_filter)
+        self.listener.start()
+        self.listener.wait()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
 
-def auto_click_voice_button(lock_seconds=1.0):
-    global VOICE_BUTTON_POS, lock_active, lock_thread
+
+class PollingMouseBackend(MouseLockBackend):
+    """非 Windows 的備援：沿用舊的輪詢方式把游標拉回來"""
+
+    def __init__(self, interval=0.008, tolerance=8):
+        self.interval = interval
+        self.tolerance = tolerance
+        self.active = False
+
+    def start(self, x, y, on_move):
+        self.active = True
+
+        def loop():
+            while self.active:
+                try:
+                    cx, cy = mouse_controller.position
+                    if (abs(cx - x) > self.tolerance or abs(cy - y) > self.tolerance) and on_move(cx, cy, False):
+                        mouse_controller.position = (x, y)
+                    time.sleep(self.interval)
+                except Exception:
+                    time.sleep(0.02)
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def stop(self):
+        self.active = False
+
+
+class CursorLock:
+    """
+    點擊期間鎖住游標。只在鎖定期間掛 hook，程式自己送出的（injected）移動照常通過，
+    使用者的移動則直接被擋掉；release() 回傳本次擋掉的事件數。
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.active = False
+        self.suppressed = 0
+        self.lock = threading.Lock()
+
+    def _on_move(self, x, y, injected):
+        if not self.active or injected:
+            return False
+        self.suppressed += 1
+        return True
+
+    def engage(self, x, y):
+        with self.lock:
+            if self.active:
+                return
+            self.suppressed = 0
+            self.active = True
+            self.backend.start(x, y, self._on_move)
+
+    def release(self):
+        with self.lock:
+            if not self.active:
+                return 0
+            self.active = False
+            self.backend.stop()
+            return self.suppressed
+
+
+def get_cursor_lock():
+    global cursor_lock
+    if cursor_lock is None:
+        backend = PynputHookBackend() if sys.platform == "win32" else PollingMouseBackend()
+        cursor_lock = CursorLock(backend)
+    return cursor_lock
+
+
+def auto_click_voice_button(lock_seconds=1.0, started=None):
+    """started：啟動 App 的 perf_counter 時間，用來記錄「啟動 → 點擊」的延遲"""
+    global VOICE_BUTTON_POS
+    started = time.perf_counter() if started is None else started
 
     if not AUTO_CLICK_ENABLED:
         return
 
     try:
-        print("\n[單次點擊] 開始...")
-
-        time.sleep(0.6)  # 稍微縮短等待時間
+        log.info("[單次點擊] 開始...")
 
-        activate_xiaoai_window()
+        win = activate_xiaoai_window()
 
-        if not is_xiaoai_window_active():
-            print("⚠️ 目前最前視窗不是小愛同學，跳過點擊")
+        if win is None:
+            log.warning("⚠️ 目前最前視窗不是小愛同學，跳過點擊")
             return
 
+        if not wait_until_clickable(win):
+            log.warning("等待小愛同學就緒逾時（%s 秒），仍嘗試點擊", CLICK_READY_TIMEOUT)
+
         if VOICE_BUTTON_POS is None:
             w, h = pyautogui.size()
             x = int(w * 0.225)
@@ -197,64 +646,735 @@ def auto_click_voice_button(lock_seconds=1.0):
         else:
             x, y = VOICE_BUTTON_POS
 
-        lock_active = True
-        lock_thread = threading.Thread(target=lock_mouse_at, args=(x, y), daemon=True)
-        lock_thread.start()
-
-        pyautogui.moveTo(x, y, duration=0.0)
-        pyautogui.click()
-        print("已單次點擊語音按鈕")
-
-        time.sleep(lock_seconds)
-        lock_active = False
-        if lock_thread and lock_thread.is_alive():
-            lock_thread.join(timeout=0.3)
+        lock = get_cursor_lock()
+        try:
+            # pyautogui 的移動與點擊是 injected 事件，不會被 hook 擋掉
+            pyautogui.moveTo(x, y, duration=0.0)
+            lock.engage(x, y)
+            pyautogui.click()
+            log.info("已單次點擊語音按鈕（啟動後 %.0f ms）", (time.perf_counter() - started) * 1000)
+            time.sleep(lock_seconds)
+        finally:
+            suppressed = lock.release()
 
-        print("滑鼠控制已恢復，進入持續監聽模式（取決於 App）")
+        log.info("滑鼠控制已恢復（擋掉 %s 次移動），進入持續監聽模式（取決於 App）", suppressed)
 
     except Exception as e:
-        print(f"自動點擊失敗：{e}")
-        lock_active = False
-
+        log.warning("自動點擊失敗：%s", e)
+
+
+class LaunchCoordinator:
+    """
+    所有觸發（F5、語音）都交給它，同時最多只有一個「啟動 → 激活視窗 → 點擊 → 鎖鼠」流程：
+    - 流程進行中再來的觸發會被合併（coalesced），不會疊加新的 Popen 與點擊
+    - 流程結束後 cooldown 秒內的觸發直接丟棄（dropped）
+    trigger() 不會阻塞，流程在唯一的工作執行緒上跑。
+    """
+
+    def __init__(self, run, cooldown=0.5):
+        self.run = run
+        self.cooldown = cooldown
+        self.state = "idle"        # idle / running
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.running = True
+        self.last_finished = 0.0
+        self.stats = {"launched": 0, "coalesced": 0, "dropped": 0}
+        threading.Thread(target=self._worker, name="launcher", daemon=True).start()
+
+    def trigger(self, source="手動"):
+        """回傳 True 代表已排入啟動流程"""
+        with self.lock:
+            if not self.running or time.monotonic() - self.last_finished < self.cooldown:
+                self.stats["dropped"] += 1
+                return False
+            if self.state != "idle":
+                self.stats["coalesced"] += 1
+                log.debug("啟動流程進行中，合併來自「%s」的觸發", source)
+                return False
+            self.state = "running"
+        self.requests.put(source)
+        return True
 
-def is_xiaoai_window_active():
-    try:
-        active = gw.getActiveWindow()
-        if not active:
-            return False
-        title = (active.title or "").lower()
-        return any(x in title for x in ["小爱", "xiaoai", "xiaoi", "小愛同學"])
-    except:
-        return False
+    def stop(self):
+        with self.lock:
+            self.running = False
+        self.requests.put(None)
+
+    def _worker(self):
+        while True:
+            source = self.requests.get()
+            if source is None:
+                return
+            try:
+                self.stats["launched"] += 1
+                self.run(source)
+            except Exception as e:
+                log.warning("啟動失敗：%s", e)
+            finally:
+                with self.lock:
+                    self.state = "idle"
+                    self.last_finished = time.monotonic()
+
+    def status_text(self, item=None):
+        s = self.stats
+        return f"啟動 {s['launched']} 次｜合併 {s['coalesced']}｜丟棄 {s['dropped']}"
+
+
+def launch_xiaoai(source):
+    started = time.perf_counter()
+    app_id = "8497DDF3.639A2791C9AB_kf545nqv09rxe!App"
+    subprocess.Popen(f'explorer.exe shell:appsFolder\\{app_id}', shell=True)
+    log.info("已嘗試啟動 小愛同學（%s）", source)
 
+    if AUTO_CLICK_ENABLED:
+        # 等視窗出現、激活、畫面穩定都在裡面輪詢完成；
+        # 在同一個工作執行緒上點擊，點擊與鎖鼠結束前的觸發都會被合併
+        auto_click_voice_button(1.0, started)
 
-def open_xiaoai():
-    try:
-        app_id = "8497DDF3.639A2791C9AB_kf545nqv09rxe!App"
-        subprocess.Popen(f'explorer.exe shell:appsFolder\\{app_id}', shell=True)
-        print("已嘗試啟動 小愛同學")
 
-        time.sleep(1.0)
+launcher = LaunchCoordinator(launch_xiaoai)
 
-        if AUTO_CLICK_ENABLED:
-            activate_xiaoai_window()
-            threading.Thread(target=auto_click_voice_button, args=(1.0,), daemon=True).start()
 
-    except Exception as e:
-        print(f"啟動失敗：{e}")
+def open_xiaoai(source="手動"):
+    return launcher.trigger(source)
 
 
 # ───────────────────────────────────────────────
 #  語音喚醒 - 優化為更快、更靈敏
 # ───────────────────────────────────────────────
 
-class VoiceWakeListener:
+class WakeMatcher:
+    """
+    預先編譯的喚醒詞比對器，判斷結果與逐詞 SequenceMatcher 迴圈完全相同：
+    - 喚醒詞轉小寫後去除重複
+    - 子字串命中：Aho-Corasick 多模式自動機，一次掃描整句
+    - 模糊命中：先用長度上界與位元平行 LCS（有界編輯距離）排除，
+      只有可能超過門檻的詞才真正計算 SequenceMatcher 相似度
+    """
+
+    def __init__(self, words, threshold, inclusive=False):
+        self.threshold = threshold
+        self.inclusive = inclusive  # True: ratio >= 門檻（V1/V2 行為）；False: ratio > 門檻
+        self.words = []
+        seen = set()
+        for w in words:
+            w = w.lower()
+            if w not in seen:
+                seen.add(w)
+                self.words.append(w)
+        self._build_automaton()
+        self._build_lcs_masks()
+
+    def _build_automaton(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [None]   # 該狀態結尾可命中的喚醒詞索引（取最小者）
+        for idx, w in enumerate(self.words):
+            if not w:
+                continue
+            state = 0
+            for ch in w:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(None)
+                    self._goto[state][ch] = nxt
+                state = nxt
+            if self._out[state] is None:
+                self._out[state] = idx
+
+        queue = list(self._goto[0].values())
+        while queue:
+            state = queue.pop(0)
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                inherited = self._out[self._fail[nxt]]
+                if inherited is not None and (self._out[nxt] is None or inherited < self._out[nxt]):
+                    self._out[nxt] = inherited
+
+    def _build_lcs_masks(self):
+        self._masks = []
+        for w in self.words:
+            masks = {}
+            for i, ch in enumerate(w):
+                masks[ch] = masks.get(ch, 0) | (1 << i)
+            self._masks.append(masks)
+
+    def _substring_hit(self, text):
+        if "" in self.words:
+            return self.words.index("")
+        best = None
+        state = 0
+        for ch in text:
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            hit = self._out[state]
+            if hit is not None and (best is None or hit < best):
+                best = hit
+                if best == 0:
+                    break
+        return best
+
+    def _lcs_length(self, text, idx):
+        # Hyyrö 位元平行 LCS：每個字元只做幾次整數運算
+        m = len(self.words[idx])
+        full = (1 << m) - 1
+        masks = self._masks[idx]
+        v = full
+        for ch in text:
+            u = v & masks.get(ch, 0)
+            v = ((v + u) | (v - u)) & full
+        return m - bin(v).count("1")
+
+    def _passes(self, ratio):
+        return ratio >= self.threshold if self.inclusive else ratio > self.threshold
+
+    def match(self, text):
+        """回傳 (喚醒詞, 相似度)；沒有命中時回傳 None"""
+        text = text.lower().strip()
+        hit = self._substring_hit(text)
+        if hit is not None:
+            word = self.words[hit]
+            return word, SequenceMatcher(None, text, word).ratio()
+
+        la = len(text)
+        for idx, word in enumerate(self.words):
+            total = la + len(word)
+            if total == 0:
+                continue
+            # SequenceMatcher 的匹配字元數 ≤ LCS ≤ 較短字串長度，兩者都是相似度上界
+            if not self._passes(2.0 * min(la, len(word)) / total):
+                continue
+            if not self._passes(2.0 * self._lcs_length(text, idx) / total):
+                continue
+            ratio = SequenceMatcher(None, text, word).ratio()
+            if self._passes(ratio):
+                return word, ratio
+        return None
+
+
+
+RECOGNITION_WORKERS = 4       # 所有語言共用的雲端辨識執行緒數
+RECOGNITION_TIMEOUT = 6.0     # 一段語音最多等這麼久，逾時的語言直接放棄
+LATENCY_WINDOW = 30           # 每個語言保留最近幾次回應時間，用來決定優先順序
+
+recognition_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=RECOGNITION_WORKERS, thread_name_prefix="recognize")
+
+
+def http_recognizer(endpoint, key=None):
+    """
+    與 recognize_google 相同協定（上傳 FLAC、逐行 JSON 回應）的辨識函式，但網址可以指定，
+    例如本機的測試用替身伺服器：--recognizer-endpoint http://127.0.0.1:8080/recognize
+    """
+    import urllib.error
+    import urllib.parse
+    import urllib.request
+
+    def recognize(audio, language):
+        query = {"client": "chromium", "lang": language, "pFilter": 0}
+        if key:
+            query["key"] = key
+        url = endpoint + ("&" if "?" in endpoint else "?") + urllib.parse.urlencode(query)
+        rate = max(audio.sample_rate, 8000)
+        request = urllib.request.Request(
+            url,
+            data=audio.get_flac_data(convert_rate=rate, convert_width=2),
+            headers={"Content-Type": f"audio/x-flac; rate={rate}"})
+        try:
+            with urllib.request.urlopen(request, timeout=RECOGNITION_TIMEOUT) as response:
+                body = response.read().decode("utf-8")
+        except (urllib.error.URLError, OSError) as e:
+            raise sr.RequestError(f"辨識服務連線失敗：{e}")
+        for line in body.split("\n"):
+            if not line.strip():
+                continue
+            result = json.loads(line).get("result") or []
+            alternatives = result[0].get("alternative", []) if result else []
+            if alternatives and alternatives[0].get("transcript"):
+                return alternatives[0]["transcript"]
+        raise sr.UnknownValueError()
+
+    return recognize
+
+
+class RecognitionDispatcher:
+    """
+    同一段語音同時送給所有語言辨識，第一個比對到喚醒詞的結果就採用，
+    還沒開始的請求取消，已送出的結果直接忽略。
+    每個語言記錄最近的回應時間：較快的先送出，同時完成時也先看它的結果。
+    recognize(audio, language=...) 可以替換，預設是 Recognizer.recognize_google。
+    """
+
+    def __init__(self, recognize, languages, matcher, pool=None):
+        self.recognize = recognize
+        self.languages = list(languages)
+        self.matcher = matcher
+        self.pool = pool or recognition_pool
+        self.lock = threading.Lock()
+        self.latency = {lang: deque(maxlen=LATENCY_WINDOW) for lang in self.languages}
+        self.stats = {"phrases": 0, "requests": 0, "cancelled": 0, "failed": 0}
+
+    def configure(self, recognize=None, languages=None):
+        if recognize is not None:
+            self.recognize = recognize
+        if languages:
+            with self.lock:
+                self.languages = list(languages)
+                for lang in self.languages:
+                    self.latency.setdefault(lang, deque(maxlen=LATENCY_WINDOW))
+
+    def priority(self):
+        """依最近回應時間的中位數排序；還沒有紀錄的語言維持設定順序排在最前面"""
+        with self.lock:
+            medians = {lang: statistics.median(self.latency[lang]) if self.latency[lang] else 0.0
+                       for lang in self.languages}
+        return sorted(self.languages, key=lambda lang: medians[lang])
+
+    def _timed(self, language, audio):
+        t0 = time.perf_counter()
+        try:
+            return self.recognize(audio, language=language)
+        finally:
+            with self.lock:
+                self.latency[language].append(time.perf_counter() - t0)
+
+    def dispatch(self, audio):
+        """回傳 (語言, 文字)；沒有語言聽到喚醒詞時回傳 None，所有語言都連線失敗時丟出 sr.RequestError"""
+        order = self.priority()
+        futures = {self.pool.submit(self._timed, lang, audio): lang for lang in order}
+        self.stats["phrases"] += 1
+        self.stats["requests"] += len(futures)
+        pending = set(futures)
+        errors = []
+        deadline = time.monotonic() + RECOGNITION_TIMEOUT
+        try:
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=max(0.0, deadline - time.monotonic()),
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                if not done:
+                    log.debug("辨識逾時：%s", "、".join(futures[f] for f in pending))
+                    break
+                for future in sorted(done, key=lambda f: order.index(futures[f])):
+                    lang = futures[future]
+                    try:
+                        text = future.result()
+                    except sr.UnknownValueError:
+                        continue
+                    except sr.RequestError as e:
+                        errors.append(e)
+                        continue
+                    log.debug("[%s] 聽到：%s", lang, text)
+                    if self.matcher.match(text) is not None:
+                        return lang, text
+        finally:
+            for future in pending:
+                if future.cancel():
+                    self.stats["cancelled"] += 1
+        if errors and len(errors) == len(futures):
+            self.stats["failed"] += 1
+            raise errors[0]
+        return None
+
+    def status_text(self, item=None):
+        with self.lock:
+            parts = [f"{lang} {statistics.median(v) * 1000:.0f}ms" for lang, v in self.latency.items() if v]
+        return "辨識延遲：" + ("、".join(parts) if parts else "尚無資料")
+
+
+PHRASE_QUEUE_SIZE = 4         # 等待辨識的語句上限；辨識跟不上時丟棄最舊的
+PHRASE_PAUSE_SECONDS = 0.5    # 安靜這麼久就視為一句結束
+PHRASE_LIMIT_SECONDS = 2.5    # 一句最長長度（喚醒詞很短，太長的句子直接切開）
+PHRASE_MIN_SECONDS = 0.2      # 比這短的聲音（敲桌子、咳嗽）不送辨識
+PHRASE_PREROLL_SECONDS = 0.3  # 超過門檻前保留的音訊，避免吃掉字頭
+NOISE_WINDOW_SECONDS = 3.0    # 噪音底線取這段時間內最安靜的區塊（說話一定有停頓，不會被拉高）
+NOISE_ADAPT_SECONDS = 2.0     # 噪音底線的平滑時間常數
+NOISE_RATIO = 2.5             # 門檻 = 噪音底線 × 這個倍數
+ENERGY_MIN = 120              # 門檻上下限：太低會把電流聲當成語句，太高會漏掉小聲說話
+ENERGY_MAX = 4000
+ENERGY_DEADBAND = 0.15        # 新門檻與目前相差不到 15% 就不改，避免來回跳動
+RELEASE_RATIO = 0.75          # 語句中低於門檻 × 這個倍數才算安靜（進出門檻不同，遲滯）
+PCM_TYPECODES = {1: "b", 2: "h", 4: "i"}   # 取樣寬度 → array 型別（Windows / x86 皆為小端序）
+
+
+def pcm_rms(fragment, width):
+    """有號 PCM 的均方根，結果與 audioop.rms 相同（audioop 在 Python 3.13 已移除）"""
+    samples = array.array(PCM_TYPECODES[width])
+    samples.frombytes(fragment[:len(fragment) - len(fragment) % width])
+    if not samples:
+        return 0
+    return int(math.sqrt(sum(s * s for s in samples) / len(samples)))
+
+
+class PhraseCapture:
+    """
+    連續錄音執行緒：麥克風串流只開一次，以能量門檻自行切出語句，放進有界佇列。
+    雲端辨識在另一個執行緒從佇列取語句，辨識慢的時候錄音照常進行，不會漏掉中間說的話；
+    佇列滿了就丟棄最舊的一句並計數。active() 回傳 False 時關閉串流並清空佇列。
+    """
+
+    def __init__(self, microphone, recognizer, active=lambda: True, queue_size=PHRASE_QUEUE_SIZE,
+                 phrase_limit=PHRASE_LIMIT_SECONDS, calibrate_seconds=0.6):
+        self.microphone = microphone
+        self.recognizer = recognizer
+        self.active = active
+        self.phrase_limit = phrase_limit
+        self.calibrate_seconds = calibrate_seconds
+        self.phrases = queue.Queue(maxsize=queue_size)
+        self.running = False
+        self.thread = None
+        self.stats = {"phrases": 0, "dropped": 0, "short": 0, "max_depth": 0,
+                      "retunes": 0, "noise_avoided": 0}
+        self.base_threshold = None
+        self.noise = None
+        self.levels = deque()
+        self.shadow_voiced = self.shadow_silent = 0
+        self.reset_segment()
+
+    def reset_segment(self):
+        self.preroll = deque()
+        self.frames = []
+        self.voiced = 0
+        self.silent = 0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="phrase-capture", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        while self.running:
+            if not self.active():
+                time.sleep(0.2)
+                continue
+            try:
+                with self.microphone as source:
+                    # 串流開啟時校正一次噪音門檻
+                    self.recognizer.adjust_for_ambient_noise(source, duration=self.calibrate_seconds)
+                    self.configure(source.SAMPLE_RATE, source.SAMPLE_WIDTH, source.CHUNK)
+                    while self.running and self.active():
+                        audio = self.segment(source.stream.read(source.CHUNK))
+                        if audio is not None:
+                            self.push(audio)
+                self.reset_segment()
+                self.clear()
+            except Exception as e:
+                log.warning("錄音錯誤：%s", e)
+                time.sleep(1.0)
+
+    def configure(self, sample_rate, sample_width, chunk):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        chunk_seconds = chunk / sample_rate
+        self.preroll_chunks = max(1, int(PHRASE_PREROLL_SECONDS / chunk_seconds))
+        self.pause_chunks = max(1, int(PHRASE_PAUSE_SECONDS / chunk_seconds))
+        self.limit_chunks = max(1, int(self.phrase_limit / chunk_seconds))
+        self.min_chunks = max(1, int(PHRASE_MIN_SECONDS / chunk_seconds))
+        self.levels = deque(maxlen=max(1, int(NOISE_WINDOW_SECONDS / chunk_seconds)))
+        self.alpha = min(1.0, chunk_seconds / NOISE_ADAPT_SECONDS)
+        threshold = min(max(self.recognizer.energy_threshold, ENERGY_MIN), ENERGY_MAX)
+        self.recognizer.energy_threshold = threshold
+        self.base_threshold = threshold
+        self.noise = threshold / NOISE_RATIO
+        self.shadow_voiced = self.shadow_silent = 0
+        self.reset_segment()
+
+    def adapt(self, energy):
+        """
+        最小值統計：噪音底線追蹤最近 NOISE_WINDOW_SECONDS 內最安靜的區塊，再平滑後乘上倍數當門檻。
+        持續的冷氣聲會把底線慢慢推高，房間安靜下來時也會降回去；變動太小不改，並限制在上下限內。
+        """
+        self.levels.append(energy)
+        if len(self.levels) < self.levels.maxlen:
+            return
+        self.noise += self.alpha * (min(self.levels) - self.noise)
+        target = min(max(self.noise * NOISE_RATIO, ENERGY_MIN), ENERGY_MAX)
+        current = self.recognizer.energy_threshold
+        if abs(target - current) > current * ENERGY_DEADBAND:
+            self.recognizer.energy_threshold = target
+            self.stats["retunes"] += 1
+            log.debug("噪音門檻調整：%.0f → %.0f（底噪 %.0f）", current, target, self.noise)
+
+    def shadow(self, energy):
+        """
+        影子切句：用啟動時的固定門檻、同樣的停頓 / 長度 / 最少有聲區塊規則再切一次。
+        只有它會切出並送去雲端、而調高後的門檻擋下的語句，才算進 noise_avoided。
+        """
+        base = self.base_threshold
+        if not self.shadow_voiced:
+            if energy > base:
+                self.shadow_voiced, self.shadow_silent = 1, 0
+            return
+        if energy > base * RELEASE_RATIO:
+            self.shadow_voiced += 1
+            self.shadow_silent = 0
+        else:
+            self.shadow_silent += 1
+        if self.shadow_silent >= self.pause_chunks or \
+                self.preroll_chunks + self.shadow_voiced + self.shadow_silent >= self.limit_chunks:
+            if self.shadow_voiced >= self.min_chunks:
+                self.stats["noise_avoided"] += 1
+            self.shadow_voiced = self.shadow_silent = 0
+
+    def segment(self, chunk):
+        """送入一個區塊；一句結束時回傳 sr.AudioData，否則回傳 None"""
+        energy = pcm_rms(chunk, self.sample_width)
+        self.adapt(energy)
+        threshold = self.recognizer.energy_threshold
+        if not self.frames:
+            self.preroll.append(chunk)
+            if len(self.preroll) > self.preroll_chunks:
+                self.preroll.popleft()
+            if energy <= threshold:
+                self.shadow(energy)
+                return None
+            self.shadow_voiced = self.shadow_silent = 0
+            self.frames = list(self.preroll)
+            self.preroll.clear()
+            self.voiced, self.silent = 1, 0
+            return None
+
+        self.frames.append(chunk)
+        if energy > threshold * RELEASE_RATIO:
+            self.voiced += 1
+            self.silent = 0
+        else:
+            self.silent += 1
+        if self.silent < self.pause_chunks and len(self.frames) < self.limit_chunks:
+            return None
+
+        frames, voiced_chunks = self.frames, self.voiced
+        self.reset_segment()
+        if voiced_chunks < self.min_chunks:
+            self.stats["short"] += 1
+            return None
+        return sr.AudioData(b"".join(frames), self.sample_rate, self.sample_width)
+
+    def push(self, audio):
+        self.stats["phrases"] += 1
+        while True:
+            try:
+                self.phrases.put_nowait(audio)
+                break
+            except queue.Full:
+                try:
+                    self.phrases.get_nowait()
+                    self.stats["dropped"] += 1
+                    log.debug("辨識跟不上，丟棄最舊的語句")
+                except queue.Empty:
+                    pass
+        self.stats["max_depth"] = max(self.stats["max_depth"], self.phrases.qsize())
+
+    def get(self, timeout=0.5):
+        try:
+            return self.phrases.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def clear(self):
+        while True:
+            try:
+                self.phrases.get_nowait()
+            except queue.Empty:
+                return
+
+    def status_text(self, item=None):
+        return (f"錄音佇列：{self.phrases.qsize()} / {self.phrases.maxsize}"
+                f"（最多 {self.stats['max_depth']}，丟棄 {self.stats['dropped']}）")
+
+
+def is_cjk(ch):
+    return "\u3400" <= ch <= "\u9fff" or "\uf900" <= ch <= "\ufaff"
+
+
+def build_wake_grammar(words):
+    """
+    把喚醒詞轉成 Vosk 語法清單，最後加上 "[unk]" 吸收其他語音。
+    中文模型的詞庫常沒有整個喚醒詞，所以中文詞同時提供逐字分開的版本。
+    """
+    grammar = []
+    for w in words:
+        w = w.strip()
+        if not w:
+            continue
+        variants = [w]
+        if any(is_cjk(ch) for ch in w):
+            variants.append(" ".join(ch for ch in w if not ch.isspace()))
+        for v in variants:
+            if v not in grammar:
+                grammar.append(v)
+    grammar.append("[unk]")
+    return grammar
+
+
+class KeywordPrefilter:
+    """
+    本機預篩：語句送去雲端前先在本機判斷「聽起來可能是喚醒詞」，明顯無關的直接丟掉。
+    寧可多放行也不要誤擋，雲端辨識仍是最後確認。子類別實作 score(audio) -> bool。
+    """
+
+    name = "預篩"
+
     def __init__(self):
+        self.stats = {"checked": 0, "passed": 0}
+
+    def check(self, audio):
+        self.stats["checked"] += 1
+        passed = self.score(audio)
+        if passed:
+            self.stats["passed"] += 1
+        return passed
+
+    def score(self, audio):
+        raise NotImplementedError
+
+    def status_text(self, item=None):
+        checked, passed = self.stats["checked"], self.stats["passed"]
+        ratio = f"{passed / checked:.0%}" if checked else "-"
+        return f"本機{self.name}：放行 {passed} / {checked}（{ratio}）"
+
+
+class AcousticKeywordFilter(KeywordPrefilter):
+    """
+    不需要模型的聲學篩選：以 20ms 小框算能量，看有聲部分的長度與音節數（能量峰值）是否足以容納喚醒詞。
+    敲桌子、咳嗽都短於 0.25 秒或不到一個音節。不設上限：雲端是子字串比對，「小愛同學 打開音樂」也要放行。
+    """
+
+    name = "聲學預篩"
+
+    def __init__(self, min_seconds=0.25, min_syllables=1):
+        super().__init__()
+        self.min_seconds = min_seconds
+        self.min_syllables = min_syllables
+
+    def score(self, audio):
+        frame = int(audio.sample_rate * 0.02) * audio.sample_width
+        data = audio.frame_data
+        levels = [pcm_rms(data[i:i + frame], audio.sample_width)
+                  for i in range(0, len(data) - frame + 1, frame)]
+        if not levels:
+            return False
+        floor = sorted(levels)[len(levels) // 10]
+        peak = max(levels)
+        gate = floor + (peak - floor) * 0.25
+        voiced = [level > gate for level in levels]
+        if not any(voiced):
+            return False
+        first = voiced.index(True)
+        last = len(voiced) - 1 - voiced[::-1].index(True)
+        seconds = (last - first + 1) * 0.02
+
+        # 音節：中間至少安靜 40ms 後能量再跨過 gate，才算新的一個
+        syllables, quiet_run = 0, 5
+        for is_voiced in voiced[first:last + 1]:
+            if is_voiced:
+                if quiet_run >= 2 or syllables == 0:
+                    syllables += 1
+                quiet_run = 0
+            else:
+                quiet_run += 1
+        passed = seconds >= self.min_seconds and syllables >= self.min_syllables
+        log.debug("聲學預篩：有聲 %.2f 秒、%d 個音節 → %s", seconds, syllables, "放行" if passed else "略過")
+        return passed
+
+
+class VoskKeywordFilter(KeywordPrefilter):
+    """
+    用 Vosk 的喚醒詞語法辨識器在本機先聽一次，比對到喚醒詞才送雲端確認（需要 vosk 與模型資料夾）。
+    中文模型的詞庫常沒有整個喚醒詞，語法同時提供逐字分開的版本；詞庫裡完全沒有可用的語法項時
+    一律放行（fail open），不讓預篩默默擋掉所有喚醒詞。
+    """
+
+    name = "Vosk 預篩"
+
+    def __init__(self, model_path, matcher, words):
+        super().__init__()
+        from vosk import Model, KaldiRecognizer, SetLogLevel
+        SetLogLevel(-1)
+        self.matcher = matcher
+        self.model = Model(str(model_path))
+        grammar, missing = self.usable_grammar(build_wake_grammar(words))
+        if missing:
+            log.warning("Vosk 預篩：模型詞庫沒有這些語法項，已略過：%s", "、".join(missing))
+        self.fail_open = not grammar
+        if self.fail_open:
+            log.warning("Vosk 預篩：沒有任何喚醒詞在模型詞庫中，所有語句都直接送雲端辨識")
+            self.recognizer = None
+            return
+        self.recognizer = KaldiRecognizer(self.model, 16000, json.dumps(grammar + ["[unk]"], ensure_ascii=False))
+
+    def usable_grammar(self, grammar):
+        """只留下每個字詞都在模型詞庫裡的語法項；舊版 vosk 沒有 find_word() 時無法檢查，全部保留"""
+        find_word = getattr(self.model, "find_word", None)
+        usable, missing = [], []
+        for entry in grammar:
+            if entry == "[unk]":
+                continue
+            if find_word is None or all(find_word(token) >= 0 for token in entry.split()):
+                usable.append(entry)
+            else:
+                missing.append(entry)
+        return usable, missing
+
+    def score(self, audio):
+        if self.fail_open:
+            return True
+        self.recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=16000, convert_width=2))
+        text = json.loads(self.recognizer.FinalResult()).get("text", "")
+        text = text.replace("[unk]", "").replace(" ", "").strip()
+        passed = bool(text) and self.matcher.match(text) is not None
+        log.debug("Vosk 預篩：%s → %s", text or "（無）", "放行" if passed else "略過")
+        return passed
+
+
+def build_prefilter(kind, matcher, model_path="vosk-model-cn"):
+    """kind 為 off / acoustic / vosk；Vosk 無法使用時改用聲學預篩"""
+    if kind == "acoustic":
+        return AcousticKeywordFilter()
+    if kind == "vosk":
+        try:
+            return VoskKeywordFilter(model_path, matcher, [w for words in WAKE_WORDS.values() for w in words])
+        except Exception as e:
+            log.warning("Vosk 預篩無法使用（%s），改用聲學預篩", e)
+            return AcousticKeywordFilter()
+    return None
+
+
+class VoiceWakeListener:
+    def __init__(self, recognize=None, languages=("zh-CN", "en-US")):
         self.recognizer = sr.Recognizer()
+        self.recognizer.operation_timeout = RECOGNITION_TIMEOUT   # 逾時的請求不會一直佔著執行緒
         self.microphone = sr.Microphone()
         self.is_listening = True
         self.confidence_threshold = 0.65          # 降低門檻，更容易觸發
         self.stop_event = threading.Event()
+        self.matcher = WakeMatcher(
+            [w for words in WAKE_WORDS.values() for w in words],
+            self.confidence_threshold,
+            inclusive=True
+        )
+        self.dispatcher = RecognitionDispatcher(recognize or self.recognizer.recognize_google,
+                                                languages, self.matcher)
+        # 縮短噪音校正時間，讓啟動更快
+        self.prefilter = None          # 選用的本機預篩（KeywordPrefilter），None 表示全部送雲端
+        self.capture = PhraseCapture(self.microphone, self.recognizer,
+                                     active=lambda: self.is_listening and not self.stop_event.is_set(),
+                                     calibrate_seconds=0.6)
 
     def similarity(self, a, b):
         return SequenceMatcher(None, a.lower(), b.lower()).ratio()
@@ -262,46 +1382,52 @@ class VoiceWakeListener:
     def check_wake_word(self, text):
         if not text:
             return False
-        text = text.lower().strip()
-        for words in WAKE_WORDS.values():
-            for w in words:
-                if w.lower() in text or self.similarity(text, w.lower()) >= self.confidence_threshold:
-                    return True
-        return False
+        return self.matcher.match(text) is not None
 
     def listen_for_wake_word(self):
-        print("語音喚醒監聽已啟動（已優化速度與靈敏度）...")
-        with self.microphone as source:
-            # 縮短噪音校正時間，讓啟動更快
-            self.recognizer.adjust_for_ambient_noise(source, duration=0.6)
+        log.info("語音喚醒監聽已啟動（已優化速度與靈敏度）...")
+        # 錄音執行緒只啟動一次，串流一直開著；這裡只負責從佇列取語句辨識
+        self.capture.start()
 
         while self.is_listening and not self.stop_event.is_set():
             try:
-                with self.microphone as source:
-                    # 縮短 timeout 和 phrase_time_limit，讓反應更快
-                    audio = self.recognizer.listen(source, timeout=4.0, phrase_time_limit=2.5)
-
-                if self.stop_event.is_set():
-                    return False
-
-                for lang in ['zh-CN', 'en-US']:  # 先試中文，通常更快
-                    try:
-                        text = self.recognizer.recognize_google(audio, language=lang)
-                        print(f"[{lang}] 聽到：{text}")
-                        if self.check_wake_word(text):
-                            print(f"偵測到喚醒詞！ ({lang}) → 即將點擊語音按鈕")
-                            return True
-                    except sr.UnknownValueError:
-                        pass
-                    except sr.RequestError:
-                        time.sleep(0.5)
+                audio = self.capture.get(timeout=0.5)
+                if audio is None or self.stop_event.is_set():
+                    continue
+                if self.prefilter is not None and not self.prefilter.check(audio):
+                    continue
+
+                # 所有語言同時送出，第一個比對到的就觸發，不必等較慢的語言
+                hit = self.dispatcher.dispatch(audio)
+                if hit:
+                    log.info("偵測到喚醒詞！ (%s) → 即將點擊語音按鈕", hit[0])
+                    # 喚醒前排隊的語句已經過時，點擊期間說的話是給小愛的，不再拿來比對
+                    self.capture.clear()
+                    return True
+            except sr.RequestError as e:
+                log.warning("辨識服務錯誤：%s", e)
+                time.sleep(0.5)
             except Exception:
                 if self.is_listening:
                     time.sleep(0.4)  # 錯誤時短暫等待，避免 CPU 過載
         return False
 
+    def noise_text(self, item=None):
+        capture = self.capture
+        if capture.base_threshold is None:
+            return "噪音門檻：尚未校正"
+        skipped = capture.stats["noise_avoided"]
+        if self.prefilter is not None:
+            skipped += self.prefilter.stats["checked"] - self.prefilter.stats["passed"]
+        return (f"噪音門檻：{capture.recognizer.energy_threshold:.0f}（底噪 {capture.noise:.0f}），"
+                f"已省下 {skipped * len(self.dispatcher.languages)} 次雲端辨識")
+
+    def prefilter_text(self, item=None):
+        return self.prefilter.status_text() if self.prefilter is not None else "本機預篩：未啟用"
+
     def stop(self):
         self.is_listening = False
+        self.capture.stop()
 
 
 voice_listener = VoiceWakeListener()
@@ -311,36 +1437,210 @@ voice_listener = VoiceWakeListener()
 #  鍵盤 & 托盤功能（保持原樣）
 # ───────────────────────────────────────────────
 
-def on_f5_press():
-    global f5_press_time, f5_hold_triggered
-    f5_press_time = time.time()
-    f5_hold_triggered = False
+def key_state_probe():
+    """Windows 上以 GetAsyncKeyState 讀取實際按鍵狀態；其他平台回傳 None（不校正）"""
+    if sys.platform != "win32":
+        return None
+    import ctypes
+    user32 = ctypes.windll.user32
+
+    def probe(scan_code):
+        vk = user32.MapVirtualKeyW(scan_code, 1)   # MAPVK_VSC_TO_VK；對不到的掃描碼當作按下，不去動它
+        return not vk or bool(user32.GetAsyncKeyState(vk) & 0x8000)
+
+    return probe
+
+
+class HoldGestureEngine:
+    """
+    組合鍵 / 按住手勢：只靠 keyboard 的按下、放開事件，加上一個可重複使用的計時器。
+    - bind("f5", callback, hold=1.0)：按住 hold 秒後觸發；hold=0 時組合鍵全部按下就觸發
+    - 每次按下只觸發一次：系統自動重複的按下事件直接忽略，任一鍵放開後才重新計算
+    - 只有一個計時器執行緒，等到最近的到期時間才醒來，閒置時不輪詢
+    """
+    MODIFIER_KEYS = ("ctrl", "shift", "alt", "windows")
+
+    def __init__(self, resolve=None, probe=None):
+        self.resolve = resolve          # 鍵名 → 掃描碼，預設用 keyboard.key_to_scan_codes
+        self.lock = threading.Lock()
+        self.wake = threading.Condition()
+        self.bindings = {}
+        self.next_id = 0
+        self.down = set()
+        self.hook = None
+        self.timer = None
+        self.running = False
+        self.armed = None               # 計時器執行緒正在等的到期時間（monotonic）
+        if probe is None and resolve is None:
+            probe = key_state_probe()
+        self.probe = probe              # 掃描碼 → 系統上是否真的按著，用來清掉漏接放開事件的鍵
+        self.modifiers = None
+        self.stats = {"fired": 0, "repeats_ignored": 0, "stuck_cleared": 0}
+
+    def parse(self, chord):
+        resolve = self.resolve or keyboard.key_to_scan_codes
+        names = [k.strip().lower() for k in chord.split("+")]
+        if not all(names):
+            raise ValueError(f"無法解析熱鍵：{chord}")
+        return [frozenset(resolve(name)) for name in names]
+
+    def bind(self, chord, callback, hold=0.0):
+        keys = self.parse(chord)
+        with self.lock:
+            self.next_id += 1
+            self.bindings[self.next_id] = {"keys": keys, "callback": callback, "hold": float(hold),
+                                           "deadline": None, "fired": False}
+        if self.hook is None and self.resolve is None:
+            self.hook = keyboard.hook(self._on_event)
+        return self.next_id
+
+    def unbind(self, binding_id):
+        with self.lock:
+            self.bindings.pop(binding_id, None)
+            deadline = self._next_deadline()
+        self._schedule(deadline)
 
-    def monitor():
-        global f5_hold_triggered
-        start = f5_press_time
-        while time.time() - start < 1.0:
-            if not keyboard.is_pressed('f5'):
+    def stop(self):
+        with self.lock:
+            self.bindings.clear()
+            self.down.clear()
+        with self.wake:
+            self.running = False
+            self.wake.notify()
+        if self.hook is not None:
+            try:
+                keyboard.unhook(self.hook)
+            except Exception:
+                pass
+            self.hook = None
+
+    def _on_event(self, event):
+        self.feed(event.scan_code, event.event_type == keyboard.KEY_DOWN)
+
+    def _modifier_codes(self):
+        if self.modifiers is None:
+            resolve = self.resolve or keyboard.key_to_scan_codes
+            codes = set()
+            for name in self.MODIFIER_KEYS:
+                try:
+                    codes.update(resolve(name))
+                except (ValueError, KeyError):
+                    pass
+            self.modifiers = frozenset(codes)
+        return self.modifiers
+
+    def _held(self, b):
+        # 修飾鍵要完全相符：按著 ctrl+shift+1 不會觸發 ctrl+1
+        if not all(codes & self.down for codes in b["keys"]):
+            return False
+        chord = frozenset().union(*b["keys"])
+        return not (self.down & self._modifier_codes()) - chord
+
+    def _resync(self, scan_code):
+        """漏接放開事件（鎖定畫面、UAC、切換桌面）會讓鍵永遠留在 down 裡：有新事件時以系統狀態校正"""
+        if self.probe is None:
+            return
+        for code in list(self.down):
+            if code != scan_code and not self.probe(code):
+                self.down.discard(code)
+                self.stats["stuck_cleared"] += 1
+
+    def _next_deadline(self):
+        return min((b["deadline"] for b in self.bindings.values() if b["deadline"] is not None), default=None)
+
+    def feed(self, scan_code, pressed, now=None):
+        now = time.monotonic() if now is None else now
+        due = []
+        with self.lock:
+            self._resync(scan_code)
+            if pressed:
+                if scan_code in self.down:
+                    self.stats["repeats_ignored"] += 1
+                    return
+                self.down.add(scan_code)
+                for b in self.bindings.values():
+                    if not self._held(b):
+                        b["deadline"] = None    # 多按了修飾鍵：取消計時
+                        if not any(codes & self.down for codes in b["keys"]):
+                            b["fired"] = False
+                        continue
+                    if b["fired"] or b["deadline"] is not None:
+                        continue
+                    if b["hold"] <= 0:
+                        b["fired"] = True
+                        due.append(b["callback"])
+                    else:
+                        b["deadline"] = now + b["hold"]
+            else:
+                self.down.discard(scan_code)
+                for b in self.bindings.values():
+                    if not self._held(b):
+                        b["deadline"] = None
+                        b["fired"] = False
+            deadline = self._next_deadline()
+        self._schedule(deadline)
+        self._fire(due)
+
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        due = []
+        with self.lock:
+            for b in self.bindings.values():
+                if b["deadline"] is not None and b["deadline"] <= now:
+                    b["deadline"] = None
+                    if self._held(b):
+                        b["fired"] = True
+                        due.append(b["callback"])
+            deadline = self._next_deadline()
+        self._schedule(deadline)
+        self._fire(due)
+
+    def _fire(self, callbacks):
+        for callback in callbacks:
+            self.stats["fired"] += 1
+            try:
+                callback()
+            except Exception as e:
+                log.warning("熱鍵動作失敗：%s", e)
+
+    def _schedule(self, deadline):
+        with self.wake:
+            if deadline == self.armed:
                 return
-            time.sleep(0.05)
-        if keyboard.is_pressed('f5') and not f5_hold_triggered:
-            f5_hold_triggered = True
-            open_xiaoai()
+            self.armed = deadline
+            self.wake.notify()
+            if deadline is not None and self.timer is None:
+                self.running = True
+                self.timer = threading.Thread(target=self._timer_loop, daemon=True)
+                self.timer.start()
+
+    def _timer_loop(self):
+        # 唯一的計時器：在 condition 上等到期時間，不輪詢
+        while True:
+            with self.wake:
+                while self.running and (self.armed is None or self.armed > time.monotonic()):
+                    self.wake.wait(None if self.armed is None else self.armed - time.monotonic())
+                if not self.running:
+                    self.timer = None
+                    return
+                self.armed = None
+            self.expire()
+
 
-    threading.Thread(target=monitor, daemon=True).start()
+hold_gestures = HoldGestureEngine()
 
 
-def on_f5_release():
-    global f5_press_time
-    f5_press_time = None
+def on_f5_hold():
+    log.info("按住 F5 %g 秒 → 開啟小愛", F5_HOLD_SECONDS)
+    open_xiaoai("F5")
 
 
 def force_recalibrate(icon=None, item=None):
-    print("\n使用者要求重新校準...")
+    log.info("使用者要求重新校準...")
     if calibrate_voice_button():
-        print("校準完成，已更新位置")
+        log.info("校準完成，已更新位置")
     else:
-        print("校準取消，保留舊位置（如果有的話）")
+        log.info("校準取消，保留舊位置（如果有的話）")
     update_tray_menu()
 
 
@@ -348,7 +1648,7 @@ def toggle_voice_wake(icon=None, item=None):
     global voice_wake_enabled
     voice_wake_enabled = not voice_wake_enabled
     status = "啟用" if voice_wake_enabled else "停用"
-    print(f"語音喚醒：{status}")
+    log.info("語音喚醒：%s", status)
     if voice_wake_enabled:
         voice_listener.stop_event.clear()
     else:
@@ -362,8 +1662,14 @@ def update_tray_menu():
         vw_status = "語音喚醒：啟用" if voice_wake_enabled else "語音喚醒：停用"
         menu = Menu(
             MenuItem('小愛同學啟動器', lambda: None, enabled=False),
-            MenuItem('按住 F5 1秒 開啟', lambda: None, enabled=False),
+            MenuItem(f'按住 F5 {F5_HOLD_SECONDS:g}秒 開啟', lambda: None, enabled=False),
+            MenuItem(launcher.status_text, lambda: None, enabled=False),
             MenuItem(vw_status, toggle_voice_wake),
+            MenuItem(voice_listener.dispatcher.status_text, lambda: None, enabled=False),
+            MenuItem(voice_listener.capture.status_text, lambda: None, enabled=False),
+            MenuItem(voice_listener.noise_text, lambda: None, enabled=False),
+            MenuItem(voice_listener.prefilter_text, lambda: None, enabled=False),
+            MenuItem('顯示除錯訊息', toggle_debug_logging, checked=lambda item: log.isEnabledFor(logging.DEBUG)),
             MenuItem('重新校準語音按鈕位置', force_recalibrate),
             MenuItem('結束程式', stop_program),
         )
@@ -372,9 +1678,13 @@ def update_tray_menu():
 
 def stop_program(icon=None, item=None):
     global voice_listener_active
-    print("\n正在關閉...")
+    log.info("正在關閉...")
     voice_listener_active = False
     voice_listener.stop()
+    launcher.stop()
+    hold_gestures.stop()
+    if window_watcher is not None:
+        window_watcher.backend.stop()
     try:
         keyboard.unhook_all()
     except:
@@ -383,7 +1693,7 @@ def stop_program(icon=None, item=None):
         icon.stop()
     except:
         pass
-    print("已關閉")
+    log.info("已關閉")
     sys.exit(0)
 
 
@@ -403,7 +1713,20 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--no-voice', action='store_true')
     parser.add_argument('--no-auto-click', action='store_true')
+    parser.add_argument('--hold-seconds', type=float, default=F5_HOLD_SECONDS, help='F5 需按住幾秒才開啟')
+    parser.add_argument('--debug', action='store_true', help='顯示除錯訊息（也可從托盤切換）')
+    parser.add_argument('--languages', default='zh-CN,en-US', help='同時辨識的語言，以逗號分隔')
+    parser.add_argument('--recognizer-endpoint', metavar='URL', help='改用相容 Google 協定的辨識服務（例如本機測試伺服器）')
+    parser.add_argument('--prefilter', choices=['off', 'acoustic', 'vosk'], default='off',
+                        help='送雲端前先在本機篩掉明顯不是喚醒詞的語句')
+    parser.add_argument('--vosk-model', default='vosk-model-cn', help='--prefilter vosk 使用的模型資料夾')
     args = parser.parse_args()
+    setup_logging(args.debug)
+    F5_HOLD_SECONDS = args.hold_seconds
+    voice_listener.dispatcher.configure(
+        recognize=http_recognizer(args.recognizer_endpoint) if args.recognizer_endpoint else None,
+        languages=[lang.strip() for lang in args.languages.split(',') if lang.strip()])
+    voice_listener.prefilter = build_prefilter(args.prefilter, voice_listener.matcher, args.vosk_model)
 
     if args.no_voice:
         voice_wake_enabled = False
@@ -412,19 +1735,24 @@ if __name__ == "__main__":
     AUTO_CLICK_ENABLED = not args.no_auto_click
 
     if not load_cached_position():
-        print("未找到位置快取，開始第一次校準...")
+        log.info("未找到位置快取，開始第一次校準...")
         calibrate_voice_button()
         if VOICE_BUTTON_POS is None:
-            print("校準取消，將使用螢幕比例估計值（可能不準確）")
+            log.info("校準取消，將使用螢幕比例估計值（可能不準確）")
 
-    keyboard.on_press_key('f5', lambda _: on_f5_press())
-    keyboard.on_release_key('f5', lambda _: on_f5_release())
+    hold_gestures.bind('f5', on_f5_hold, hold=F5_HOLD_SECONDS)
 
     vw_text = "語音喚醒：啟用" if voice_wake_enabled else "語音喚醒：停用"
     menu = Menu(
         MenuItem('小愛同學啟動器', lambda: None, enabled=False),
-        MenuItem('按住 F5 1秒 開啟', lambda: None, enabled=False),
+        MenuItem(f'按住 F5 {F5_HOLD_SECONDS:g}秒 開啟', lambda: None, enabled=False),
+        MenuItem(launcher.status_text, lambda: None, enabled=False),
         MenuItem(vw_text, toggle_voice_wake),
+        MenuItem(voice_listener.dispatcher.status_text, lambda: None, enabled=False),
+        MenuItem(voice_listener.capture.status_text, lambda: None, enabled=False),
+        MenuItem(voice_listener.noise_text, lambda: None, enabled=False),
+        MenuItem(voice_listener.prefilter_text, lambda: None, enabled=False),
+        MenuItem('顯示除錯訊息', toggle_debug_logging, checked=lambda item: log.isEnabledFor(logging.DEBUG)),
         MenuItem('重新校準語音按鈕位置', force_recalibrate),
         MenuItem('結束程式', stop_program),
     )
@@ -432,28 +1760,28 @@ if __name__ == "__main__":
     icon = Icon("XiaoiLauncher", create_icon(), menu=menu)
     icon_instance = icon
 
-    print("="*70)
-    print("小愛同學啟動器 已啟動")
-    print("• 按住 F5 1秒 或 說喚醒詞 → 單次點擊語音按鈕")
-    print("• 點擊後進入持續監聽模式（實際時間取決於 App）")
-    print("• 語音喚醒已優化（更快、更靈敏）")
-    print("• 點擊期間滑鼠短暫鎖定（約1秒）")
+    log.info("="*70)
+    log.info("小愛同學啟動器 已啟動")
+    log.info("• 按住 F5 %g秒 或 說喚醒詞 → 單次點擊語音按鈕", F5_HOLD_SECONDS)
+    log.info("• 點擊後進入持續監聽模式（實際時間取決於 App）")
+    log.info("• 語音喚醒已優化（更快、更靈敏）")
+    log.info("• 點擊期間滑鼠短暫鎖定（約1秒）")
     if voice_wake_enabled:
-        print("• 語音喚醒：已啟用")
+        log.info("• 語音喚醒：已啟用")
     else:
-        print("• 語音喚醒：已關閉（可從托盤切換）")
+        log.info("• 語音喚醒：已關閉（可從托盤切換）")
     if AUTO_CLICK_ENABLED:
-        print("• 自動點擊：啟用（每次只點一次）")
+        log.info("• 自動點擊：啟用（每次只點一次）")
     else:
-        print("• 自動點擊：關閉")
-    print("• 右鍵托盤圖示 → 可重新校準位置")
-    print("="*70)
+        log.info("• 自動點擊：關閉")
+    log.info("• 右鍵托盤圖示 → 可重新校準位置")
+    log.info("="*70)
 
     def voice_thread_func():
         while voice_listener_active:
             if voice_wake_enabled:
                 if voice_listener.listen_for_wake_word():
-                    open_xiaoai()
+                    open_xiaoai("語音")
             else:
                 time.sleep(0.6)
 
@@ -1,27 +1,37 @@
 """
 小愛同學 Hotkey Launcher - 可自訂熱鍵 + 可編輯喚醒詞版本（Vosk 離線版）
 - 已整合測試成功的 Vosk 設定
-- 使用索引 1 的麥克風（你測試過可行）
+- 自動偵測並挑選麥克風，也可在設定檔指定一支或多支同時監聽
 """
 
+import time
+
+STARTUP_T0 = time.perf_counter()
+
 import keyboard
 import subprocess
 import sys
 import threading
-import time
+from collections import deque
+import asyncio
+import functools
+import importlib
 import json
+import math
+import copy
+import logging
+import queue
+import atexit
+from logging.handlers import QueueHandler, QueueListener
+import wave
+import argparse
 from pathlib import Path
-import tkinter as tk
-from tkinter import messagebox, ttk, scrolledtext
-from pystray import Icon, Menu, MenuItem
-from PIL import Image, ImageDraw
 from difflib import SequenceMatcher
-import pyautogui
-import pygetwindow as gw
-from pynput.mouse import Controller as MouseController
-import pyaudio
-import numpy as np
-from vosk import Model, KaldiRecognizer
+import xiaoi_decoder
+from xiaoi_decoder import AudioRing, decoder_worker
+
+# numpy / pyaudio / vosk / pyautogui / pygetwindow / pynput / tkinter / pystray / PIL
+# 都在第一次用到時才匯入（見各函式內的 import），讓熱鍵與托盤先就緒
 
 # ───────────────────────────────────────────────
 #  全域設定與檔案
@@ -29,16 +39,22 @@ from vosk import Model, KaldiRecognizer
 
 CONFIG_FILE = Path("xiaoi_config.json")
 CACHE_FILE = Path("button_locations.json")
+TRACE_FILE = Path("xiaoi_trace.jsonl")             # 每次觸發一行的延遲追蹤紀錄
+TEMPLATE_FILE = Path("voice_button_template.png")   # 校準時擷取的按鈕外觀，用來判斷 App 是否已就緒
 
 VOICE_BUTTON_POS = None
-mouse_controller = MouseController()
-lock_active = False
-lock_thread = None
+np = None                      # numpy：載入模型時由 load_numpy() 匯入一次，每個音訊區塊直接用
+mouse_controller = None
+cursor_lock = None
 AUTO_CLICK_ENABLED = True
 icon_instance = None
 
 current_hotkey = None
+hotkey_binding = None
 voice_listener_active = True
+voice_paused = False           # 暫停語音喚醒：串流與模型保留，只是不送進辨識器
+
+startup_marks = []
 
 DEFAULT_WAKE_WORDS = [
     "小愛同學", "小愛", "小艾", "小愛同學", "小愛姐姐",
@@ -46,28 +62,176 @@ DEFAULT_WAKE_WORDS = [
     "小愛在嗎", "小愛同學在嗎", "小愛小愛", "小爱同学", "小爱", "小爱小爱"  # 加變體，避免辨識空格問題
 ]
 
+# ───────────────────────────────────────────────
+#  日誌：分級、限流，由背景執行緒寫到 console
+# ───────────────────────────────────────────────
+
+LOG_QUEUE_SIZE = 2000         # 佇列滿了就丟棄並計數，不讓錄音執行緒等 console
+LOG_RATE_INTERVAL = 5.0       # 同一行程式碼的訊息，每 5 秒最多輸出 LOG_RATE_BURST 則
+LOG_RATE_BURST = 5
+
+log = logging.getLogger("xiaoi")
+log_listener = None
+log_handler = None
+
+
+class RateLimitFilter(logging.Filter):
+    """以呼叫位置（檔案 + 行號）限流，被略過的則數附在該位置下一則輸出的訊息後面"""
+
+    def __init__(self, interval=LOG_RATE_INTERVAL, burst=LOG_RATE_BURST):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        with self.lock:
+            start, count, skipped = self.windows.get(key, (record.created, 0, 0))
+            if record.created - start >= self.interval:
+                start, count = record.created, 0
+            if count >= self.burst:
+                self.windows[key] = (start, count, skipped + 1)
+                return False
+            self.windows[key] = (start, count + 1, 0)
+        if skipped:
+            record.msg = f"{record.getMessage()}（另有 {skipped} 則同位置的訊息被略過）"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """put_nowait 失敗就丟棄並計數，呼叫端絕不會被寫出速度拖慢"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(debug=False):
+    global log_listener, log_handler
+    log.setLevel(logging.DEBUG if debug else logging.INFO)
+    if log_listener is not None:
+        return
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s", "%H:%M:%S"))
+    log_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    log_handler.addFilter(RateLimitFilter())
+    log.addHandler(log_handler)
+    log.propagate = False
+    log_listener = QueueListener(log_handler.queue, console)
+    log_listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    # 結束前把佇列裡剩下的訊息寫完
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        if log_handler.dropped:
+            # 佇列已停止，直接交給 console 寫出
+            log_listener.handle(log.makeRecord(log.name, logging.WARNING, __file__, 0,
+                                               "日誌佇列滿載，共丟棄 %d 則訊息", (log_handler.dropped,), None))
+        log_listener = None
+
+
+def set_debug_logging(enabled):
+    log.setLevel(logging.DEBUG if enabled else logging.INFO)
+    log.info("除錯訊息：%s", "開啟" if enabled else "關閉")
+
+
+def toggle_debug_logging(icon=None, item=None):
+    set_debug_logging(not log.isEnabledFor(logging.DEBUG))
+
+
+setup_logging()
+
+# ───────────────────────────────────────────────
+#  啟動計時（--startup-profile）
+# ───────────────────────────────────────────────
+
+def mark_startup(stage):
+    startup_marks.append((stage, (time.perf_counter() - STARTUP_T0) * 1000))
+
+
+def print_startup_profile():
+    log.info("=" * 60)
+    log.info("啟動時間分析（自模組載入起算）")
+    for stage, ms in startup_marks:
+        log.info("  %8.1f ms  %s", ms, stage)
+    log.info("=" * 60)
+
+
+def preload_modules():
+    # 背景先把點擊流程會用到的模組載入，第一次觸發時就不用等匯入
+    try:
+        for name in ("pyautogui", "pygetwindow", "pynput.mouse"):
+            importlib.import_module(name)
+        mark_startup("背景預載點擊模組")
+    except Exception as e:
+        log.debug("預載模組失敗：%s", e)
+
+
+def load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def get_mouse_controller():
+    global mouse_controller
+    if mouse_controller is None:
+        from pynput.mouse import Controller as MouseController
+        mouse_controller = MouseController()
+    return mouse_controller
+
 # ───────────────────────────────────────────────
 #  設定檔讀寫（保持原樣）
 # ───────────────────────────────────────────────
 
-def load_config():
+def load_config(strict=False):
+    """strict=True 時讀取失敗直接丟出例外（熱重載用，不覆寫使用者正在編輯的檔案）"""
     default_config = {
         "hotkey": "ctrl + 1",
         "wake_words": DEFAULT_WAKE_WORDS,
-        "similarity_threshold": 0.58
+        "similarity_threshold": 0.58,
+        "recognizer_mode": "grammar",  # "grammar"：只辨識喚醒詞；"full"：完整詞彙（診斷用）
+        "vad_enabled": True,           # 靜音區塊不送進 Vosk，降低待機 CPU
+        "latency_mode": False,         # 低延遲：小區塊 + 穩定的部分結果就觸發
+        "latency_block_ms": 100,       # 低延遲模式的區塊長度（一般模式固定 500ms）
+        "partial_stable_count": 2,     # 同一喚醒詞需連續出現在幾次部分結果中
+        "wake_debounce_ms": 1500,      # 觸發後這段時間內不再重複觸發
+        "hotkey_hold_seconds": 0,      # 熱鍵需按住幾秒才觸發（0：按下就觸發）
+        "decoder_process": False,      # Vosk 解碼放到獨立子行程（重新啟動後生效）
+        "microphones": [],             # 指定麥克風名稱（可多支同時監聽）；空清單：自動挑選
+        "microphone_probe": {}         # 麥克風偵測結果與自動挑選的裝置（程式自動寫入）
     }
     if not CONFIG_FILE.exists():
+        if strict:
+            raise FileNotFoundError(CONFIG_FILE)
         save_config(default_config)
         return default_config
 
     try:
         with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
             data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("設定檔最外層必須是物件")
         for k in default_config:
             if k not in data:
                 data[k] = default_config[k]
         return data
     except:
+        if strict:
+            raise
         save_config(default_config)
         return default_config
 
@@ -77,51 +241,345 @@ def save_config(data):
         with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
     except Exception as e:
-        print(f"儲存設定失敗：{e}")
+        log.warning("儲存設定失敗：%s", e)
 
 
 config = load_config()
 
 # ───────────────────────────────────────────────
-#  位置快取相關（保持原樣）
+#  喚醒詞比對引擎（設定載入時編譯一次）
 # ───────────────────────────────────────────────
 
+class WakeMatcher:
+    """
+    預先編譯的喚醒詞比對器，判斷結果與逐詞 SequenceMatcher 迴圈完全相同：
+    - 喚醒詞轉小寫後去除重複
+    - 子字串命中：Aho-Corasick 多模式自動機，一次掃描整句
+    - 模糊命中：先用長度上界與位元平行 LCS（有界編輯距離）排除，
+      只有可能超過門檻的詞才真正計算 SequenceMatcher 相似度
+    - 部分結果用 match_partial()：比最短喚醒詞還短的假設不比對（「小」對「小愛」相似度 0.667）
+    """
+
+    def __init__(self, words, threshold, inclusive=False):
+        self.threshold = threshold
+        self.inclusive = inclusive  # True: ratio >= 門檻（V1/V2 行為）；False: ratio > 門檻
+        self.words = []
+        seen = set()
+        for w in words:
+            w = w.lower()
+            if w not in seen:
+                seen.add(w)
+                self.words.append(w)
+        # 辨識結果會去除空格，長度也以去除空格後計算
+        self.min_length = min((len(w.replace(" ", "")) for w in self.words if w), default=0)
+        self._build_automaton()
+        self._build_lcs_masks()
+
+    def _build_automaton(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [None]   # 該狀態結尾可命中的喚醒詞索引（取最小者）
+        for idx, w in enumerate(self.words):
+            if not w:
+                continue
+            state = 0
+            for ch in w:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(None)
+                    self._goto[state][ch] = nxt
+                state = nxt
+            if self._out[state] is None:
+                self._out[state] = idx
+
+        queue = list(self._goto[0].values())
+        while queue:
+            state = queue.pop(0)
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                inherited = self._out[self._fail[nxt]]
+                if inherited is not None and (self._out[nxt] is None or inherited < self._out[nxt]):
+                    self._out[nxt] = inherited
+
+    def _build_lcs_masks(self):
+        self._masks = []
+        for w in self.words:
+            masks = {}
+            for i, ch in enumerate(w):
+                masks[ch] = masks.get(ch, 0) | (1 << i)
+            self._masks.append(masks)
+
+    def _substring_hit(self, text):
+        if "" in self.words:
+            return self.words.index("")
+        best = None
+        state = 0
+        for ch in text:
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            hit = self._out[state]
+            if hit is not None and (best is None or hit < best):
+                best = hit
+                if best == 0:
+                    break
+        return best
+
+    def _lcs_length(self, text, idx):
+        # Hyyrö 位元平行 LCS：每個字元只做幾次整數運算
+        m = len(self.words[idx])
+        full = (1 << m) - 1
+        masks = self._masks[idx]
+        v = full
+        for ch in text:
+            u = v & masks.get(ch, 0)
+            v = ((v + u) | (v - u)) & full
+        return m - bin(v).count("1")
+
+    def _passes(self, ratio):
+        return ratio >= self.threshold if self.inclusive else ratio > self.threshold
+
+    def match(self, text):
+        """回傳 (喚醒詞, 相似度)；沒有命中時回傳 None"""
+        text = text.lower().strip()
+        hit = self._substring_hit(text)
+        if hit is not None:
+            word = self.words[hit]
+            return word, SequenceMatcher(None, text, word).ratio()
+
+        la = len(text)
+        for idx, word in enumerate(self.words):
+            total = la + len(word)
+            if total == 0:
+                continue
+            # SequenceMatcher 的匹配字元數 ≤ LCS ≤ 較短字串長度，兩者都是相似度上界
+            if not self._passes(2.0 * min(la, len(word)) / total):
+                continue
+            if not self._passes(2.0 * self._lcs_length(text, idx) / total):
+                continue
+            ratio = SequenceMatcher(None, text, word).ratio()
+            if self._passes(ratio):
+                return word, ratio
+        return None
+
+    def match_partial(self, text):
+        """部分結果的比對：長度至少等於最短喚醒詞才比對；最終結果仍用 match() 的模糊比對"""
+        if len(text.strip()) < self.min_length:
+            return None
+        return self.match(text)
+
+
+wake_matcher = None
+
+
+def rebuild_wake_matcher():
+    global wake_matcher
+    wake_matcher = WakeMatcher(
+        config.get("wake_words", []),
+        config.get("similarity_threshold", 0.58)
+    )
+
+
+rebuild_wake_matcher()
+
+
+def is_cjk(ch):
+    return "\u3400" <= ch <= "\u9fff" or "\uf900" <= ch <= "\ufaff"
+
+
+def build_wake_grammar(words):
+    """
+    把喚醒詞轉成 Vosk 語法清單，最後加上 "[unk]" 吸收其他語音。
+    中文模型的詞庫常沒有整個喚醒詞，所以中文詞同時提供逐字分開的版本。
+    """
+    grammar = []
+    for w in words:
+        w = w.strip()
+        if not w:
+            continue
+        variants = [w]
+        if any(is_cjk(ch) for ch in w):
+            variants.append(" ".join(ch for ch in w if not ch.isspace()))
+        for v in variants:
+            if v not in grammar:
+                grammar.append(v)
+    grammar.append("[unk]")
+    return grammar
+
+# ───────────────────────────────────────────────
+#  位置快取：依螢幕配置 + DPI 分組，存相對於視窗工作區的位移
+# ───────────────────────────────────────────────
+
+CACHE_MAX_ENTRIES = 8          # 最多保留幾組螢幕配置
+CACHE_MAX_AGE_DAYS = 180       # 超過這麼久沒用到的配置會被淘汰
+
+position_cache = {}            # 螢幕配置 key -> {"offset": [dx, dy], "client_size": [w, h], ...}
+legacy_position = None         # 舊版單一座標檔：(coords, screen_size)，遇到相同解析度時轉成相對位置
+
+
+def describe_displays(handle=None):
+    """回傳 (螢幕矩形清單, DPI)；非 Windows 時只用主螢幕大小與 96 DPI"""
+    if sys.platform != "win32":
+        import pyautogui
+        w, h = pyautogui.size()
+        return [(0, 0, w, h)], 96
+
+    import ctypes
+    from ctypes import wintypes
+    user32 = ctypes.windll.user32
+    monitors = []
+    MonitorEnumProc = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HMONITOR, wintypes.HDC,
+                                         ctypes.POINTER(wintypes.RECT), wintypes.LPARAM)
+
+    def collect(hmon, hdc, rect, lparam):
+        r = rect.contents
+        monitors.append((r.left, r.top, r.right - r.left, r.bottom - r.top))
+        return True
+
+    user32.EnumDisplayMonitors(None, None, MonitorEnumProc(collect), 0)
+    dpi = 96
+    try:
+        if handle and hasattr(user32, "GetDpiForWindow"):
+            dpi = user32.GetDpiForWindow(handle) or 96
+        elif hasattr(user32, "GetDpiForSystem"):
+            dpi = user32.GetDpiForSystem() or 96
+    except Exception:
+        pass
+    return sorted(monitors), dpi
+
+
+def current_layout_key(handle=None):
+    monitors, dpi = describe_displays(handle)
+    layout = ";".join(f"{w}x{h}+{x}+{y}" for x, y, w, h in monitors)
+    return f"{layout}@{dpi}dpi"
+
+
 def load_cached_position():
-    global VOICE_BUTTON_POS
+    global VOICE_BUTTON_POS, position_cache, legacy_position
     if not CACHE_FILE.exists():
         return False
     try:
         with open(CACHE_FILE, 'r', encoding='utf-8') as f:
             data = json.load(f)
+        position_cache = data.get("entries", {})
+        evict_stale_positions()
         if "voice_button" in data and "coords" in data["voice_button"]:
             VOICE_BUTTON_POS = tuple(data["voice_button"]["coords"])
-            print(f"已載入快取位置：{VOICE_BUTTON_POS}")
+            if not position_cache:
+                # 舊版檔案（只有一組絕對座標）
+                legacy_position = (VOICE_BUTTON_POS, data["voice_button"].get("screen_size"))
+            log.info("已載入快取位置：%s（%s 組螢幕配置）", VOICE_BUTTON_POS, len(position_cache))
             return True
+        return bool(position_cache)
     except:
         pass
     return False
 
 
-def save_position(coords):
-    try:
-        data = {
-            "voice_button": {
-                "coords": list(coords),
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "screen_size": list(pyautogui.size())
-            }
+def write_position_cache():
+    import pyautogui
+    data = {"version": 2, "entries": position_cache}
+    if VOICE_BUTTON_POS is not None:
+        # 保留舊格式欄位，V2 也讀同一個檔案
+        data["voice_button"] = {
+            "coords": list(VOICE_BUTTON_POS),
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "screen_size": list(pyautogui.size())
         }
-        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+    with open(CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def evict_stale_positions():
+    now = time.time()
+    for key in [k for k, v in position_cache.items()
+                if now - v.get("last_used", now) > CACHE_MAX_AGE_DAYS * 86400]:
+        del position_cache[key]
+    while len(position_cache) > CACHE_MAX_ENTRIES:
+        oldest = min(position_cache, key=lambda k: position_cache[k].get("last_used", 0))
+        del position_cache[oldest]
+
+
+def remember_position(x, y, handle):
+    """把螢幕座標換算成相對於視窗工作區的位移，存到目前螢幕配置底下"""
+    client = get_window_watcher().backend.client_rect(handle)
+    if client is None:
+        return False
+    left, top, right, bottom = client
+    position_cache[current_layout_key(handle)] = {
+        "offset": [int(x) - left, int(y) - top],
+        "client_size": [right - left, bottom - top],
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "last_used": time.time()
+    }
+    evict_stale_positions()
+    return True
+
+
+def save_position(coords, handle=None):
+    try:
+        if handle:
+            remember_position(coords[0], coords[1], handle)
+        write_position_cache()
     except Exception as e:
-        print(f"儲存位置失敗：{e}")
+        log.warning("儲存位置失敗：%s", e)
+
+
+def resolve_cached_position(handle, key=None):
+    """
+    O(1) 查表：目前螢幕配置的相對位移 + 即時的視窗工作區位置 → 螢幕座標。
+    key 是呼叫端算好的螢幕配置（列舉螢幕不便宜，一次啟動算一次就好）
+    """
+    global legacy_position
+    backend = get_window_watcher().backend
+    client = backend.client_rect(handle)
+    if client is None:
+        return None
+    if key is None:
+        key = current_layout_key(handle)
+    entry = position_cache.get(key)
+
+    if entry is None and legacy_position is not None:
+        import pyautogui
+        coords, screen_size = legacy_position
+        legacy_position = None
+        if screen_size is None or list(screen_size) == list(pyautogui.size()):
+            save_position(coords, handle)
+            entry = position_cache.get(key)
+            log.info("已將舊版位置快取轉換為視窗相對位置")
+    if entry is None:
+        return None
+
+    left, top, right, bottom = client
+    dx, dy = entry["offset"]
+    cw, ch = entry.get("client_size", [right - left, bottom - top])
+    if [cw, ch] != [right - left, bottom - top] and cw and ch:
+        # 視窗大小改變時依比例換算
+        dx = dx * (right - left) / cw
+        dy = dy * (bottom - top) / ch
+    if time.time() - entry.get("last_used", 0) > 86400:
+        entry["last_used"] = time.time()
+        try:
+            write_position_cache()
+        except Exception:
+            pass
+    return int(left + dx), int(top + dy)
 
 
 def calibrate_voice_button():
+    import pyautogui
     global VOICE_BUTTON_POS
-    print("\n=== 小愛同學 語音按鈕校準 ===")
-    print("請先開啟小愛同學 App，將滑鼠移到語音按鈕中央")
-    print("按 'c' 確認，'q' 取消\n")
+    log.info("=== 小愛同學 語音按鈕校準 ===")
+    log.info("請先開啟小愛同學 App，將滑鼠移到語音按鈕中央")
+    log.info("按 'c' 確認，'q' 取消")
 
     from pynput import keyboard as kb
     recorded = [None]
@@ -130,10 +588,10 @@ def calibrate_voice_button():
         try:
             if key.char == 'c':
                 recorded[0] = pyautogui.position()
-                print(f"確認位置：{recorded[0]}")
+                log.info("確認位置：%s", recorded[0])
                 return False
             if key.char == 'q':
-                print("已取消")
+                log.info("已取消")
                 return False
         except:
             pass
@@ -141,265 +599,2572 @@ def calibrate_voice_button():
     with kb.Listener(on_press=on_press) as listener:
         listener.join()
 
-    if recorded[0]:
-        VOICE_BUTTON_POS = recorded[0]
-        save_position(VOICE_BUTTON_POS)
-        return True
-    return False
+    if recorded[0]:
+        VOICE_BUTTON_POS = tuple(recorded[0])
+        try:
+            handle = get_window_watcher().backend.find_window()
+        except Exception:
+            handle = None
+        save_position(VOICE_BUTTON_POS, handle)
+        save_button_template(*VOICE_BUTTON_POS)
+        return True
+    return False
+
+
+TEMPLATE_HALF = 24            # 按鈕樣板為 48x48
+CLICK_READY_TIMEOUT = 2.5     # 最多等這麼久，逾時仍照常點擊
+button_template = None
+
+
+def save_button_template(x, y):
+    global button_template
+    import pyautogui
+    try:
+        shot = pyautogui.screenshot(region=(int(x) - TEMPLATE_HALF, int(y) - TEMPLATE_HALF,
+                                            TEMPLATE_HALF * 2, TEMPLATE_HALF * 2))
+        shot.save(TEMPLATE_FILE)
+        button_template = None
+        log.info("按鈕外觀已儲存至 %s", TEMPLATE_FILE)
+    except Exception as e:
+        log.warning("儲存按鈕外觀失敗：%s", e)
+
+
+def load_button_template():
+    global button_template
+    if button_template is None and TEMPLATE_FILE.exists():
+        load_numpy()
+        from PIL import Image
+        try:
+            with Image.open(TEMPLATE_FILE) as img:
+                button_template = np.asarray(img.convert("L"), dtype=np.float32)
+        except Exception as e:
+            log.warning("讀取按鈕外觀失敗：%s", e)
+    return button_template
+
+
+def grab_gray(left, top, width, height):
+    load_numpy()
+    import pyautogui
+    shot = pyautogui.screenshot(region=(int(left), int(top), int(width), int(height)))
+    return np.asarray(shot.convert("L"), dtype=np.float32)
+
+# ───────────────────────────────────────────────
+#  視窗激活（事件驅動）與自動點擊
+# ───────────────────────────────────────────────
+
+XIAOAI_TITLES = ["小爱", "小愛同學", "XiaoAi", "xiaoi", "小愛"]   # 依序比對，先找到的優先
+WINDOW_TIMEOUT = 6.0   # 等待視窗出現並成為前景的上限（秒）
+
+
+class WindowBackend:
+    """
+    視窗監看後端介面：
+    - start(on_event)：視窗出現、改名、成為前景時呼叫 on_event()（可在任意執行緒）
+    - find_window()：回傳小愛同學視窗的 handle，找不到回傳 None
+    - is_foreground(handle) / activate(handle)
+    poll_interval 為 None 代表事件驅動；否則監看器會以該間隔重新檢查。
+    """
+    poll_interval = None
+
+    def start(self, on_event):
+        self.on_event = on_event
+
+    def stop(self):
+        pass
+
+    def find_window(self):
+        raise NotImplementedError
+
+    def is_foreground(self, handle):
+        raise NotImplementedError
+
+    def activate(self, handle):
+        raise NotImplementedError
+
+    def window_rect(self, handle):
+        """回傳 (left, top, right, bottom)"""
+        raise NotImplementedError
+
+    def client_rect(self, handle):
+        """工作區（不含標題列與邊框）的螢幕座標；預設與視窗矩形相同"""
+        return self.window_rect(handle)
+
+
+class Win32EventBackend(WindowBackend):
+    """用 SetWinEventHook 接收前景切換與視窗顯示事件（正式環境）"""
+
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    EVENT_SYSTEM_MINIMIZEEND = 0x0017
+    EVENT_OBJECT_SHOW = 0x8002
+    EVENT_OBJECT_NAMECHANGE = 0x800C
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    WM_QUIT = 0x0012
+    SW_RESTORE = 9
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.wintypes = wintypes
+        self.user32 = ctypes.WinDLL("user32", use_last_error=True)
+        self.kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        self.WinEventProc = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD
+        )
+        self.EnumWindowsProc = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+        self.user32.SetWinEventHook.restype = wintypes.HANDLE
+        self.user32.SetWinEventHook.argtypes = [
+            wintypes.UINT, wintypes.UINT, wintypes.HMODULE, self.WinEventProc,
+            wintypes.DWORD, wintypes.DWORD, wintypes.UINT
+        ]
+        self.user32.GetForegroundWindow.restype = wintypes.HWND
+        self.thread_id = None
+        self.ready = threading.Event()
+        self.hooks = []
+
+    def start(self, on_event):
+        self.on_event = on_event
+        threading.Thread(target=self._run, daemon=True).start()
+        if not self.ready.wait(1.0) or not self.hooks:
+            raise RuntimeError("SetWinEventHook 安裝失敗")
+
+    def _run(self):
+        self.thread_id = self.kernel32.GetCurrentThreadId()
+        self._proc = self.WinEventProc(self._callback)   # 保留參考，避免被回收
+        for event in (self.EVENT_SYSTEM_FOREGROUND, self.EVENT_SYSTEM_MINIMIZEEND,
+                      self.EVENT_OBJECT_SHOW, self.EVENT_OBJECT_NAMECHANGE):
+            hook = self.user32.SetWinEventHook(event, event, None, self._proc, 0, 0, self.WINEVENT_OUTOFCONTEXT)
+            if hook:
+                self.hooks.append(hook)
+        self.ready.set()
+
+        msg = self.wintypes.MSG()
+        while self.user32.GetMessageW(self.ctypes.byref(msg), None, 0, 0) > 0:
+            self.user32.TranslateMessage(self.ctypes.byref(msg))
+            self.user32.DispatchMessageW(self.ctypes.byref(msg))
+
+        for hook in self.hooks:
+            self.user32.UnhookWinEvent(hook)
+        self.hooks = []
+
+    def _callback(self, hook, event, hwnd, id_object, id_child, thread, time_ms):
+        if id_object != 0 or not hwnd:   # 只關心 OBJID_WINDOW
+            return
+        if event == self.EVENT_SYSTEM_FOREGROUND or is_xiaoai_title(self._title(hwnd)):
+            self.on_event()
+
+    def _title(self, hwnd):
+        length = self.user32.GetWindowTextLengthW(hwnd)
+        if length <= 0:
+            return ""
+        buf = self.ctypes.create_unicode_buffer(length + 1)
+        self.user32.GetWindowTextW(hwnd, buf, length + 1)
+        return buf.value
+
+    def stop(self):
+        if self.thread_id:
+            self.user32.PostThreadMessageW(self.thread_id, self.WM_QUIT, 0, 0)
+
+    def find_window(self):
+        windows = []
+
+        def collect(hwnd, lparam):
+            if self.user32.IsWindowVisible(hwnd):
+                title = self._title(hwnd)
+                if title:
+                    windows.append((hwnd, title))
+            return True
+
+        self.user32.EnumWindows(self.EnumWindowsProc(collect), 0)
+        for wanted in XIAOAI_TITLES:
+            for hwnd, title in windows:
+                if wanted.lower() in title.lower():
+                    return hwnd
+        return None
+
+    def is_foreground(self, handle):
+        return self.user32.GetForegroundWindow() == handle
+
+    def activate(self, handle):
+        if self.user32.IsIconic(handle):
+            self.user32.ShowWindow(handle, self.SW_RESTORE)
+        self.user32.SetForegroundWindow(handle)
+
+    def window_rect(self, handle):
+        rect = self.wintypes.RECT()
+        if not self.user32.GetWindowRect(handle, self.ctypes.byref(rect)):
+            return None
+        return rect.left, rect.top, rect.right, rect.bottom
+
+    def client_rect(self, handle):
+        rect = self.wintypes.RECT()
+        if not self.user32.GetClientRect(handle, self.ctypes.byref(rect)):
+            return None
+        origin = self.wintypes.POINT(0, 0)
+        self.user32.ClientToScreen(handle, self.ctypes.byref(origin))
+        return origin.x, origin.y, origin.x + rect.right, origin.y + rect.bottom
+
+
+class PollingWindowBackend(WindowBackend):
+    """無法安裝事件 hook 時的備援：用 pygetwindow 定時檢查"""
+    poll_interval = 0.05
+
+    def find_window(self):
+        import pygetwindow as gw
+        for title in XIAOAI_TITLES:
+            wins = gw.getWindowsWithTitle(title)
+            if wins:
+                return wins[0]
+        return None
+
+    def is_foreground(self, handle):
+        import pygetwindow as gw
+        return is_xiaoai_title(gw.getActiveWindowTitle() or "")
+
+    def activate(self, handle):
+        if handle.isMinimized:
+            handle.restore()
+        handle.activate()
+
+    def window_rect(self, handle):
+        return handle.left, handle.top, handle.right, handle.bottom
+
+
+class FakeWindowBackend(WindowBackend):
+    """
+    測試用後端（Linux 也能跑）：用 open_window() / set_foreground() 模擬視窗事件，
+    activate_delay 模擬 App 要多久才真正成為前景。
+    """
+
+    def __init__(self, activate_delay=0.0):
+        self.windows = {}
+        self.rects = {}
+        self.foreground = None
+        self.activate_delay = activate_delay
+        self.activate_calls = 0
+        self.on_event = lambda: None
+        self._next = 1
+
+    def open_window(self, title, delay=0.0):
+        handle = self._next
+        self._next += 1
+
+        def show():
+            self.windows[handle] = title
+            self.on_event()
+
+        if delay:
+            threading.Timer(delay, show).start()
+        else:
+            show()
+        return handle
+
+    def set_foreground(self, handle):
+        self.foreground = handle
+        self.on_event()
+
+    def find_window(self):
+        for wanted in XIAOAI_TITLES:
+            for handle, title in list(self.windows.items()):
+                if wanted.lower() in title.lower():
+                    return handle
+        return None
+
+    def is_foreground(self, handle):
+        return self.foreground == handle
+
+    def activate(self, handle):
+        self.activate_calls += 1
+        if self.activate_delay:
+            threading.Timer(self.activate_delay, self.set_foreground, args=(handle,)).start()
+        else:
+            self.set_foreground(handle)
+
+    def window_rect(self, handle):
+        return self.rects.get(handle, (0, 0, 800, 600))
+
+
+def is_xiaoai_title(title):
+    title = title.lower()
+    return any(t in title for t in ["小爱", "小愛", "xiaoai", "xiaoi"])
+
+
+class WindowWatcher:
+    """等待小愛同學視窗出現／成為前景，事件一到就喚醒等待中的點擊流程"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.cond = threading.Condition()
+        self.backend.start(self._on_event)
+
+    def _on_event(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def wait_for(self, predicate, timeout):
+        """predicate() 為真就回傳其值；逾時回傳 None。事件驅動時每 0.25 秒仍會保底重查一次"""
+        deadline = time.monotonic() + timeout
+        recheck = self.backend.poll_interval or 0.25
+        with self.cond:
+            while True:
+                result = predicate()
+                if result:
+                    return result
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.cond.wait(min(remaining, recheck))
+
+    def activate(self, timeout=WINDOW_TIMEOUT, on_found=None):
+        """成功時回傳視窗 handle，失敗回傳 None；找到視窗（尚未激活）時呼叫 on_found()"""
+        start = time.monotonic()
+        handle = self.wait_for(self.backend.find_window, timeout)
+        if handle is None:
+            return None
+        if on_found:
+            on_found()
+        if self.backend.is_foreground(handle):
+            return handle
+
+        for _ in range(2):
+            self.backend.activate(handle)
+            remaining = timeout - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            if self.wait_for(lambda: self.backend.is_foreground(handle), min(remaining, timeout / 2)):
+                return handle
+        return None
+
+
+window_watcher = None
+
+
+def get_window_watcher():
+    global window_watcher
+    if window_watcher is None:
+        if sys.platform == "win32":
+            try:
+                window_watcher = WindowWatcher(Win32EventBackend())
+                return window_watcher
+            except Exception as e:
+                log.debug("視窗事件 hook 無法使用，改用輪詢：%s", e)
+        window_watcher = WindowWatcher(PollingWindowBackend())
+    return window_watcher
+
+
+def activate_xiaoai_window(timeout=WINDOW_TIMEOUT, span=None):
+    """成功時回傳視窗 handle（為真值），失敗回傳 None"""
+    start = time.perf_counter()
+    try:
+        handle = get_window_watcher().activate(timeout, span and (lambda: span.mark("found")))
+        if handle:
+            log.info("成功激活小愛同學視窗（%.0f ms）", (time.perf_counter() - start) * 1000)
+            return handle
+    except Exception as e:
+        log.warning("激活小愛同學視窗失敗: %s", e)
+
+    log.warning("無法將小愛同學視窗置頂，請手動點擊")
+    return None
+
+
+# ───────────────────────────────────────────────
+#  語音按鈕定位：視窗截圖 + NCC 樣板比對（粗到細金字塔）
+# ───────────────────────────────────────────────
+
+def ncc_map(image, template):
+    """
+    正規化互相關（NCC）：回傳 template 在 image 每個左上角位置的相關係數（-1 ~ 1）。
+    分子用 FFT 一次算完，分母用積分影像算每個視窗的變異量。
+    """
+    load_numpy()
+    H, W = image.shape
+    th, tw = template.shape
+    if H < th or W < tw:
+        return None
+    t = template - template.mean()
+    t_norm = float(np.sqrt(np.sum(t * t)))
+    if t_norm == 0:
+        return None
+
+    image = image.astype(np.float64)
+    corr = np.fft.irfft2(np.fft.rfft2(image) * np.conj(np.fft.rfft2(t, s=(H, W))), s=(H, W))
+    corr = corr[:H - th + 1, :W - tw + 1]
+
+    def window_sum(a):
+        ii = np.zeros((H + 1, W + 1))
+        ii[1:, 1:] = a.cumsum(0).cumsum(1)
+        return ii[th:, tw:] - ii[:-th, tw:] - ii[th:, :-tw] + ii[:-th, :-tw]
+
+    n = th * tw
+    s = window_sum(image)
+    var = window_sum(image * image) - s * s / n
+    return corr / (np.sqrt(np.maximum(var, 1e-6)) * t_norm)
+
+
+def downsample(image):
+    h, w = image.shape[0] // 2 * 2, image.shape[1] // 2 * 2
+    a = image[:h, :w]
+    return (a[0::2, 0::2] + a[1::2, 0::2] + a[0::2, 1::2] + a[1::2, 1::2]) * 0.25
+
+
+def find_template(image, template, min_size=8, radius=2):
+    """
+    粗到細金字塔搜尋：最粗層做完整 NCC，往細層只在上一層峰值附近 ±radius 搜尋。
+    回傳 (中心 x, 中心 y, 分數)，座標相對於 image。
+    """
+    load_numpy()
+    images, templates = [image], [template]
+    while min(templates[-1].shape) // 2 >= min_size and min(images[-1].shape) // 2 >= min_size:
+        images.append(downsample(images[-1]))
+        templates.append(downsample(templates[-1]))
+
+    scores = ncc_map(images[-1], templates[-1])
+    if scores is None:
+        return None
+    y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+    score = float(scores[y, x])
+
+    for level in range(len(images) - 2, -1, -1):
+        img, tpl = images[level], templates[level]
+        th, tw = tpl.shape
+        y0 = max(0, 2 * y - radius)
+        x0 = max(0, 2 * x - radius)
+        crop = img[y0:min(img.shape[0], 2 * y + radius + th), x0:min(img.shape[1], 2 * x + radius + tw)]
+        scores = ncc_map(crop, tpl)
+        if scores is None:
+            return None
+        dy, dx = np.unravel_index(int(np.argmax(scores)), scores.shape)
+        y, x, score = y0 + dy, x0 + dx, float(scores[dy, dx])
+
+    th, tw = template.shape
+    return int(x) + tw // 2, int(y) + th // 2, score
+
+
+class ButtonLocator:
+    """
+    在小愛同學視窗範圍內找語音按鈕。結果依視窗大小快取（相對視窗左上角的位移），
+    之後的觸發只截取按鈕大小的區域比一次分數，不符才重新搜尋整個視窗。
+    """
+
+    def __init__(self, min_score=0.7, verify_score=0.8):
+        self.min_score = min_score
+        self.verify_score = verify_score
+        self.cache = {}   # (寬, 高) -> (dx, dy)
+
+    def verify(self, x, y, template):
+        load_numpy()
+        th, tw = template.shape
+        patch = grab_gray(x - tw // 2, y - th // 2, tw, th)
+        if patch.shape != template.shape:
+            return 0.0
+        a = patch - patch.mean()
+        b = template - template.mean()
+        denom = float(np.sqrt(np.sum(a * a) * np.sum(b * b)))
+        return float(np.sum(a * b)) / denom if denom else 0.0
+
+    def locate(self, rect, template):
+        """rect = (left, top, right, bottom)；回傳 (螢幕 x, 螢幕 y, 分數) 或 None"""
+        left, top, right, bottom = rect
+        key = (right - left, bottom - top)
+        cached = self.cache.get(key)
+        if cached:
+            x, y = left + cached[0], top + cached[1]
+            score = self.verify(x, y, template)
+            if score >= self.verify_score:
+                return x, y, score
+            del self.cache[key]
+
+        if key[0] <= 0 or key[1] <= 0:
+            return None
+        image = grab_gray(left, top, key[0], key[1])
+        hit = find_template(image, template)
+        if hit is None or hit[2] < self.min_score:
+            return None
+        dx, dy, score = hit
+        self.cache[key] = (dx, dy)
+        return left + dx, top + dy, score
+
+
+button_locator = ButtonLocator()
+
+
+def nearest_cached_offset(width, height):
+    """目前螢幕配置沒有快取時，取視窗大小最接近的一組配置，按比例換算位移"""
+    best = None
+    for entry in position_cache.values():
+        cw, ch = entry.get("client_size") or (0, 0)
+        if cw <= 0 or ch <= 0:
+            continue
+        distance = abs(math.log(width / cw)) + abs(math.log(height / ch))
+        if best is None or distance < best[0]:
+            best = (distance, entry["offset"], cw, ch)
+    if best is None:
+        return None
+    _, (dx, dy), cw, ch = best
+    return dx * width / cw, dy * height / ch
+
+
+def fallback_button_position(rect, cached=None):
+    """
+    依序：目前配置的快取 → 最接近配置的相對位移 → 視窗比例估計；
+    舊的絕對座標 VOICE_BUTTON_POS 只在連視窗位置都不知道時才用（視窗可能早就移動過）
+    """
+    if cached is not None:
+        return cached
+    if rect is not None:
+        left, top, right, bottom = rect
+        width, height = right - left, bottom - top
+        if width > 0 and height > 0:
+            offset = nearest_cached_offset(width, height)
+            if offset is not None:
+                return int(left + offset[0]), int(top + offset[1])
+            # 沒有校準時，以視窗（而非整個螢幕）的比例估計
+            return int(left + width * 0.225), int(top + height * 0.388)
+    if VOICE_BUTTON_POS is not None:
+        return VOICE_BUTTON_POS
+    import pyautogui
+    w, h = pyautogui.size()
+    return int(w * 0.225), int(h * 0.388)
+
+
+def wait_until_clickable(handle, timeout=CLICK_READY_TIMEOUT):
+    """
+    取代固定 sleep：等到視窗位置大小連續兩次相同，且（有校準樣板時）
+    在視窗內找到與樣板相符的按鈕才點擊。
+    回傳 (x, y, 就緒原因)；逾時時原因為 None，座標改用快取或估計值。
+    """
+    backend = get_window_watcher().backend
+    template = load_button_template()
+    deadline = time.monotonic() + timeout
+    last_rect = None
+    cached = None
+    layout_key = None               # 螢幕配置在這次啟動內不會變，只列舉一次
+
+    while True:
+        try:
+            rect = backend.window_rect(handle)
+        except Exception:
+            rect = None
+        stable = rect is not None and rect == last_rect
+        last_rect = rect
+
+        if stable:
+            try:
+                if layout_key is None:
+                    layout_key = current_layout_key(handle)
+                cached = resolve_cached_position(handle, layout_key)
+            except Exception as e:
+                log.debug("讀取位置快取失敗：%s", e)
+                cached = None
+            if template is None:
+                x, y = fallback_button_position(rect, cached)
+                return x, y, "視窗大小穩定"
+            try:
+                start = time.perf_counter()
+                if cached and button_locator.verify(cached[0], cached[1], template) >= button_locator.verify_score:
+                    return cached[0], cached[1], f"快取位置相符（{(time.perf_counter() - start) * 1000:.0f} ms）"
+                hit = button_locator.locate(rect, template)
+                if hit:
+                    x, y, score = hit
+                    if remember_position(x, y, handle):
+                        write_position_cache()
+                    return x, y, f"樣板比對 {score:.2f}（{(time.perf_counter() - start) * 1000:.0f} ms）"
+            except Exception as e:
+                log.debug("按鈕定位失敗：%s", e)
+
+        if time.monotonic() >= deadline:
+            x, y = fallback_button_position(last_rect, cached)
+            return x, y, None
+        time.sleep(0.04)
+
+
+# ───────────────────────────────────────────────
+#  點擊期間鎖定滑鼠：在輸入 hook 直接擋掉使用者的移動事件
+# ───────────────────────────────────────────────
+
+LOCK_SECONDS = 1.2
+
+
+class MouseLockBackend:
+    """
+    滑鼠鎖定後端介面：start(x, y, on_move) 開始攔截，on_move(x, y, injected)
+    回傳 True 代表這個移動事件要被擋掉；stop() 結束攔截。
+    """
+
+    def start(self, x, y, on_move):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class PynputHookBackend(MouseLockBackend):
+    """Windows 低階滑鼠 hook（pynput win32_event_filter），在事件送達游標前就擋掉"""
+
+    WM_MOUSEMOVE = 0x0200
+    LLMHF_INJECTED = 0x01
+
+    def __init__(self):
+        self.listener = None
+
+    def start(self, x, y, on_move):
+        from pynput import mouse
+
+        def win32_filter(msg, data):
+            if msg == self.WM_MOUSEMOVE:
+                injected = bool(data.flags & self.LLMHF_INJECTED)
+                if on_move(data.pt.x, data.pt.y, injected):
+                    self.listener.suppress_event()
+            return False   # 不需要 pynput 再呼叫 Python 回呼
+
+        self.listener = mouse.Listener(win32_event_filter=win32_filter)
+        self.listener.start()
+        self.listener.wait()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+class PollingMouseBackend(MouseLockBackend):
+    """非 Windows 的備援：沿用舊的輪詢方式把游標拉回來"""
+
+    def __init__(self, interval=0.008, tolerance=10):
+        self.interval = interval
+        self.tolerance = tolerance
+        self.active = False
+
+    def start(self, x, y, on_move):
+        self.active = True
+
+        def loop():
+            controller = get_mouse_controller()
+            while self.active:
+                try:
+                    cx, cy = controller.position
+                    if (abs(cx - x) > self.tolerance or abs(cy - y) > self.tolerance) and on_move(cx, cy, False):
+                        controller.position = (x, y)
+                    time.sleep(self.interval)
+                except Exception:
+                    time.sleep(0.03)
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def stop(self):
+        self.active = False
+
+
+class FakeMouseBackend(MouseLockBackend):
+    """測試用後端（Linux 也能跑）：用 emit_move() 餵假的移動事件，回傳是否被擋"""
+
+    def __init__(self):
+        self.on_move = None
+
+    def start(self, x, y, on_move):
+        self.on_move = on_move
+
+    def stop(self):
+        self.on_move = None
+
+    def emit_move(self, x, y, injected=False):
+        return bool(self.on_move and self.on_move(x, y, injected))
+
+
+class CursorLock:
+    """
+    點擊期間鎖住游標。只在鎖定期間掛 hook，程式自己送出的（injected）移動照常通過，
+    使用者的移動則直接被擋掉；release() 回傳本次擋掉的事件數。
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.active = False
+        self.suppressed = 0
+        self.total_suppressed = 0
+        self.lock = threading.Lock()
+
+    def _on_move(self, x, y, injected):
+        if not self.active or injected:
+            return False
+        self.suppressed += 1
+        return True
+
+    def engage(self, x, y):
+        with self.lock:
+            if self.active:
+                return
+            self.suppressed = 0
+            self.active = True
+            self.backend.start(x, y, self._on_move)
+
+    def release(self):
+        with self.lock:
+            if not self.active:
+                return 0
+            self.active = False
+            self.backend.stop()
+            self.total_suppressed += self.suppressed
+            return self.suppressed
+
+
+def get_cursor_lock():
+    global cursor_lock
+    if cursor_lock is None:
+        backend = PynputHookBackend() if sys.platform == "win32" else PollingMouseBackend()
+        cursor_lock = CursorLock(backend)
+    return cursor_lock
+
+
+# ───────────────────────────────────────────────
+#  asyncio 執行核心：背景工作都是可取消的 task
+# ───────────────────────────────────────────────
+
+SHUTDOWN_TIMEOUT = 2.0        # 結束時最多等背景工作這麼久
+
+
+class LauncherRuntime:
+    """
+    主執行緒跑一個 asyncio 事件迴圈，取代原本一堆 daemon 執行緒 + time.sleep：
+    - spawn() 建立可取消的 task，結束程式時統一取消並等待（有逾時）
+    - blocking() 把會阻塞的呼叫（PyAudio 讀取、視窗等待、pyautogui）丟到有上限的執行緒池
+    - bridge() 給綁定自己執行緒的函式庫（pystray、pynput 校準、Vosk 模型載入）用，結果送回迴圈
+    - call() / submit() 可以從任何執行緒呼叫（熱鍵、托盤、錄音執行緒），用 call_soon_threadsafe 轉進迴圈
+    """
+
+    def __init__(self, max_workers=3):
+        self.max_workers = max_workers
+        self.loop = None
+        self.executor = None
+        self.stop_event = None
+        self.tasks = set()
+        self.cleanup = []
+        self.started = None
+        self.wakeups = 0        # 從其他執行緒喚醒迴圈的次數
+        self.peak_threads = threading.active_count()
+
+    def run(self, main):
+        """在目前執行緒跑事件迴圈，直到 request_stop()；main(runtime) 是啟動用的 coroutine"""
+        try:
+            asyncio.run(self._main(main))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.loop = None
+        log.debug("執行核心已結束：%s", self.stats_text())
+
+    async def _main(self, main):
+        from concurrent.futures import ThreadPoolExecutor
+        self.loop = asyncio.get_running_loop()
+        self.executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="xiaoi")
+        self.loop.set_default_executor(self.executor)
+        self.stop_event = asyncio.Event()
+        self.started = time.monotonic()
+        try:
+            await main(self)
+            await self.stop_event.wait()
+        finally:
+            await self._shutdown()
+
+    async def _shutdown(self):
+        for fn in reversed(self.cleanup):
+            try:
+                fn()
+            except Exception as e:
+                log.debug("關閉時清理失敗：%s", e)
+        pending = [t for t in self.tasks if not t.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            done, still = await asyncio.wait(pending, timeout=SHUTDOWN_TIMEOUT)
+            if still:
+                log.debug("%s 個背景工作在 %s 秒內沒有結束", len(still), SHUTDOWN_TIMEOUT)
+        # 執行緒池裡只剩已被通知停止的工作（例如最後一次麥克風讀取），不在迴圈上等
+        self.executor.shutdown(wait=False)
+
+    def on_shutdown(self, fn):
+        """登記結束時要呼叫的清理函式（在迴圈執行緒上，依登記的反序呼叫）"""
+        self.cleanup.append(fn)
+
+    def spawn(self, aw, name=None):
+        """只能在迴圈執行緒呼叫；接受 coroutine 或 future"""
+        task = asyncio.ensure_future(aw)
+        self.tasks.add(task)
+        task.add_done_callback(lambda t: self._task_done(t, name))
+        return task
+
+    def _task_done(self, task, name):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("背景工作「%s」失敗：%s", name or task, task.exception())
+
+    def blocking(self, fn, *args, **kwargs):
+        return self.loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def bridge(self, fn, *args, name=None, **kwargs):
+        """在專屬 daemon 執行緒跑 fn（可能永遠不返回的呼叫，例如 icon.run），回傳迴圈上的 future"""
+        future = self.loop.create_future()
+
+        def settle(result, error):
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        def run():
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self.call(settle, None, e)
+            else:
+                self.call(settle, result, None)
+
+        threading.Thread(target=run, name=name, daemon=True).start()
+        self.peak_threads = max(self.peak_threads, threading.active_count())
+        return future
+
+    def call(self, fn, *args):
+        """任何執行緒都能呼叫；迴圈沒在跑時回傳 False"""
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return False
+        self.wakeups += 1
+        try:
+            loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            return False
+        return True
+
+    def submit(self, fn, *args, name=None, **kwargs):
+        """任何執行緒都能呼叫：在迴圈上執行 fn(...) 並把回傳的 awaitable 當成 task 追蹤"""
+        return self.call(lambda: self.spawn(fn(*args, **kwargs), name))
+
+    def request_stop(self):
+        if self.stop_event is not None:
+            self.call(self.stop_event.set)
+
+    def stats_text(self, item=None):
+        self.peak_threads = max(self.peak_threads, threading.active_count())
+        uptime = time.monotonic() - self.started if self.started else 0.0
+        dropped = log_handler.dropped if log_handler is not None else 0
+        return (f"執行緒 {threading.active_count()}（峰值 {self.peak_threads}）｜"
+                f"背景工作 {len(self.tasks)}｜迴圈喚醒 {self.wakeups}｜運行 {uptime / 60:.0f} 分"
+                + (f"｜丟棄日誌 {dropped}" if dropped else ""))
+
+
+runtime = LauncherRuntime()
+
+# ───────────────────────────────────────────────
+#  延遲追蹤：從音訊區塊到點擊語音按鈕的每個階段
+# ───────────────────────────────────────────────
+
+TRACE_WINDOW = 200            # 托盤 p50 / p95 取最近幾次觸發
+TRACE_MAX_BYTES = 5_000_000   # 紀錄檔超過這個大小就換成 .1 備份重新開始
+
+
+class TraceSpan:
+    """一次觸發的追蹤紀錄，marks 依序存 (階段, perf_counter 時間)，第一筆是起點"""
+
+    __slots__ = ("source", "marks", "outcome")
+
+    def __init__(self, source, t0=None):
+        self.source = source
+        self.marks = [("start", time.perf_counter() if t0 is None else t0)]
+        self.outcome = None
+
+    def mark(self, stage, t=None):
+        self.marks.append((stage, time.perf_counter() if t is None else t))
+
+    def to_record(self):
+        t0 = self.marks[0][1]
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "source": self.source,
+            "outcome": self.outcome,
+            "stages_ms": {stage: round((t - t0) * 1000, 2) for stage, t in self.marks},
+        }
+
+
+class LatencyTracer:
+    """
+    每次觸發一個 TraceSpan，結束時：
+    - 一行 JSON 附加到 TRACE_FILE（累積後在執行緒池批次寫入，不佔用錄音執行緒或事件迴圈）
+    - 保留最近 TRACE_WINDOW 次「起點 → 點擊」的延遲，托盤顯示 p50 / p95
+    打點只是 perf_counter() 加 list.append，可以常駐開啟。
+    """
+
+    def __init__(self, path=TRACE_FILE, window=TRACE_WINDOW):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = []
+        self.recent = deque(maxlen=window)
+
+    def start(self, source, t0=None):
+        return TraceSpan(source, t0)
+
+    def finish(self, span, outcome="done"):
+        if span is None:
+            return
+        span.outcome = outcome
+        record = span.to_record()
+        with self.lock:
+            if "click" in record["stages_ms"]:
+                self.recent.append(record["stages_ms"]["click"])
+            self.pending.append(record)
+            first = len(self.pending) == 1
+        if first and not runtime.submit(runtime.blocking, self.flush, name="寫入延遲追蹤"):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            if self.path.exists() and self.path.stat().st_size > TRACE_MAX_BYTES:
+                self.path.replace(self.path.with_suffix(".jsonl.1"))
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for record in batch:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            log.debug("延遲追蹤寫入失敗：%s", e)
+
+    def summary_text(self, item=None):
+        with self.lock:
+            values = list(self.recent)
+        if not values:
+            return "觸發到點擊：尚無紀錄"
+        return (f"觸發到點擊 p50 {percentile(values, 50):.0f} ms｜"
+                f"p95 {percentile(values, 95):.0f} ms（最近 {len(values)} 次）")
+
+
+tracer = LatencyTracer()
+
+
+class LaunchCoordinator:
+    """
+    唯一負責「啟動 → 激活視窗 → 點擊 → 鎖鼠」流程的元件，所有觸發（熱鍵、語音）都交給它：
+    - 流程是 runtime 上的一個 asyncio task，同時最多一個
+    - 流程進行中再來的觸發會被合併（coalesced），不會疊加新的 Popen 與鎖鼠
+    - 剛完成後 cooldown 秒內的觸發（例如按鍵自動重複）視為丟棄（dropped）
+    - cancel() 直接取消 task，正在等待的階段（等視窗、鎖鼠倒數）立刻中止
+    """
+
+    APP_ID = "8497DDF3.639A2791C9AB_kf545nqv09rxe!App"
+
+    def __init__(self, cooldown=0.5):
+        self.cooldown = cooldown
+        self.state = "idle"        # idle / queued / launching / activating / clicking / locked
+        self.lock = threading.Lock()
+        self.task = None
+        self.pending = None        # 執行緒池裡還在跑的步驟，取消時等它收尾再解鎖滑鼠
+        self.running = True
+        self.last_finished = 0.0
+        self.stats = {"triggered": 0, "launched": 0, "coalesced": 0, "dropped": 0, "cancelled": 0}
+
+    def trigger(self, source="手動", span=None):
+        """
+        非阻塞、任何執行緒都能呼叫：回傳 True 代表已排入啟動流程。
+        span 是觸發端已開始的追蹤紀錄（語音喚醒從音訊區塊算起），沒有就從這裡開始。
+        """
+        if span is None:
+            span = tracer.start(source)
+        span.mark("trigger")
+        with self.lock:
+            self.stats["triggered"] += 1
+            if not self.running or time.monotonic() - self.last_finished < self.cooldown:
+                self.stats["dropped"] += 1
+                outcome = "dropped"
+            elif self.state != "idle":
+                self.stats["coalesced"] += 1
+                log.debug("啟動流程進行中（%s），合併來自「%s」的觸發", self.state, source)
+                outcome = "coalesced"
+            else:
+                self.state = "queued"
+                outcome = None
+        if outcome:
+            tracer.finish(span, outcome)
+            return False
+        if not runtime.submit(self._launch, source, time.perf_counter(), span, name="啟動流程"):
+            with self.lock:
+                self.state = "idle"
+                self.stats["dropped"] += 1
+            tracer.finish(span, "dropped")
+            return False
+        update_tray_menu()
+        return True
+
+    def cancel(self):
+        runtime.call(self._cancel_task)
+
+    def _set_state(self, state):
+        # trigger() 在熱鍵 / 語音執行緒上依 state 決定合併或排入，每次轉換都要持有同一把鎖
+        with self.lock:
+            self.state = state
+
+    def _cancel_task(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+    def stop(self):
+        with self.lock:
+            self.running = False
+        self._cancel_task()
+
+    async def _step(self, fn, *args):
+        # shield：取消時不打斷執行緒池裡的步驟，讓 finally 能等它做完
+        self.pending = runtime.blocking(fn, *args)
+        try:
+            return await asyncio.shield(self.pending)
+        finally:
+            if self.pending.done():
+                self.pending = None
+
+    async def _launch(self, source, t0, span):
+        self.task = asyncio.current_task()
+        outcome = None
+        try:
+            await self._run(source, t0, span)
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            outcome = "cancelled"
+            log.info("啟動流程已取消")
+        except Exception as e:
+            outcome = "failed"
+            log.warning("啟動流程失敗：%s", e)
+        finally:
+            if self.pending is not None:
+                await asyncio.wait([self.pending], timeout=CLICK_READY_TIMEOUT)
+                self.pending = None
+            if cursor_lock is not None:
+                cursor_lock.release()
+            with self.lock:
+                self.state = "idle"
+                self.last_finished = time.monotonic()
+            self.task = None
+            tracer.finish(span, outcome or span.outcome or "done")
+            update_tray_menu()
+
+    async def _run(self, source, launch_t0, span):
+        self._set_state("launching")
+        subprocess.Popen(f'explorer.exe shell:appsFolder\\{self.APP_ID}', shell=True)
+        span.mark("popen")
+        self.stats["launched"] += 1
+        log.info("已嘗試啟動小愛同學（來源：%s）", source)
+        if not AUTO_CLICK_ENABLED:
+            return
+
+        # 不再固定等待，等視窗與按鈕就緒
+        self._set_state("activating")
+        handle = await self._step(activate_xiaoai_window, WINDOW_TIMEOUT, span)
+        if not handle:
+            span.outcome = "no-window"
+            return
+        span.mark("activated")
+
+        x, y, reason = await self._step(wait_until_clickable, handle)
+        span.mark("ready")
+        if reason is None:
+            log.warning("等待小愛同學就緒逾時（%s 秒），仍嘗試點擊", CLICK_READY_TIMEOUT)
+        if not get_window_watcher().backend.is_foreground(handle):
+            await self._step(activate_xiaoai_window, 1.0)
+            span.mark("reactivated")
+
+        self._set_state("clicking")
+        lock = await self._step(self._click, x, y)
+        span.mark("click")
+        log.info("已點擊語音按鈕（啟動到點擊 %.0f ms，就緒判斷：%s）",
+                 (time.perf_counter() - launch_t0) * 1000, reason or "逾時")
+
+        self._set_state("locked")
+        await asyncio.sleep(LOCK_SECONDS)
+        suppressed = lock.release()
+        span.mark("released")
+        log.info("滑鼠鎖定結束，擋掉 %s 個移動事件", suppressed)
+
+    @staticmethod
+    def _click(x, y):
+        import pyautogui
+        lock = get_cursor_lock()
+        lock.engage(x, y)
+        pyautogui.moveTo(x, y, duration=0.1)
+        pyautogui.click()
+        return lock
+
+    def status_text(self, item=None):
+        s = self.stats
+        return f"啟動 {s['launched']} 次｜合併 {s['coalesced']}｜丟棄 {s['dropped']}｜取消 {s['cancelled']}"
+
+
+launcher = LaunchCoordinator()
+
+
+def open_xiaoai():
+    return launcher.trigger("手動")
+
+# ───────────────────────────────────────────────
+#  音訊來源：麥克風 / WAV / 原始 PCM / 合成噪音
+# ───────────────────────────────────────────────
+
+class AudioSource:
+    """
+    音訊來源共同介面：open() → read(frames) → close()。
+    read() 回傳 16-bit 單聲道 PCM bytes，來源結束時回傳 b""。
+    realtime=True 時依取樣率節流，模擬麥克風的到達時間。
+    """
+
+    def __init__(self, sample_rate=16000, realtime=False):
+        self.sample_rate = sample_rate
+        self.realtime = realtime
+        self.frames_read = 0
+        self._start = None
+
+    @property
+    def position(self):
+        """目前已讀取的音訊長度（秒）"""
+        return self.frames_read / self.sample_rate
+
+    def open(self):
+        self._start = time.monotonic()
+        return self
+
+    def read(self, frames):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _advance(self, data):
+        self.frames_read += len(data) // 2
+        if self.realtime and self._start is not None:
+            delay = self._start + self.position - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return data
+
+    def _to_target_rate(self, samples, src_rate):
+        load_numpy()
+        if src_rate == self.sample_rate or len(samples) == 0:
+            return samples.astype(np.int16)
+        n = int(round(len(samples) * self.sample_rate / src_rate))
+        src_t = np.arange(len(samples)) / src_rate
+        dst_t = np.arange(n) / self.sample_rate
+        return np.interp(dst_t, src_t, samples).astype(np.int16)
+
+
+class MicrophoneSource(AudioSource):
+    def __init__(self, sample_rate=16000, block_size=8000, device_index=None):
+        super().__init__(sample_rate)
+        self.block_size = block_size
+        self.device_index = device_index
+        self.pa = None
+        self.stream = None
+
+    def open(self):
+        import pyaudio
+        self.pa = pyaudio.PyAudio()
+        try:
+            self.stream = self.pa.open(
+                format=pyaudio.paInt16,
+                channels=1,
+                rate=self.sample_rate,
+                input=True,
+                frames_per_buffer=self.block_size,
+                input_device_index=self.device_index
+            )
+            self.stream.start_stream()
+        except Exception:
+            self.pa.terminate()
+            self.pa = None
+            raise
+        return super().open()
+
+    def read(self, frames):
+        return self._advance(self.stream.read(frames, exception_on_overflow=False))
+
+    def close(self):
+        if self.stream is not None:
+            try:
+                self.stream.stop_stream()
+                self.stream.close()
+            except Exception:
+                pass
+            self.stream = None
+        if self.pa is not None:
+            self.pa.terminate()
+            self.pa = None
+
+
+class WavFileSource(AudioSource):
+    """讀取 16-bit WAV；多聲道會混成單聲道，取樣率不同時線性重取樣"""
+
+    def __init__(self, path, sample_rate=16000, realtime=False):
+        super().__init__(sample_rate, realtime)
+        self.path = Path(path)
+        self.samples = None
+        self.offset = 0
+
+    def open(self):
+        load_numpy()
+        with wave.open(str(self.path), "rb") as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError(f"{self.path} 不是 16-bit WAV")
+            channels = wf.getnchannels()
+            rate = wf.getframerate()
+            raw = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        if channels > 1:
+            raw = raw.reshape(-1, channels).mean(axis=1)
+        self.samples = self._to_target_rate(raw, rate)
+        self.offset = 0
+        return super().open()
+
+    def read(self, frames):
+        chunk = self.samples[self.offset:self.offset + frames]
+        self.offset += len(chunk)
+        return self._advance(chunk.tobytes())
+
+
+class RawPcmSource(WavFileSource):
+    """讀取無標頭的 16-bit little-endian 單聲道 PCM"""
+
+    def __init__(self, path, sample_rate=16000, source_rate=None, realtime=False):
+        super().__init__(path, sample_rate, realtime)
+        self.source_rate = source_rate or sample_rate
+
+    def open(self):
+        load_numpy()
+        raw = np.fromfile(str(self.path), dtype="<i2")
+        self.samples = self._to_target_rate(raw, self.source_rate)
+        self.offset = 0
+        return AudioSource.open(self)
+
+
+class SyntheticNoiseSource(AudioSource):
+    """產生固定長度的白噪音或粉紅噪音，用來量測誤觸發與待機 CPU"""
+
+    def __init__(self, seconds=60.0, sample_rate=16000, color="white", amplitude=200.0, seed=0, realtime=False):
+        super().__init__(sample_rate, realtime)
+        self.total_frames = int(seconds * sample_rate)
+        self.color = color
+        self.amplitude = amplitude
+        self.seed = seed
+        self.rng = None
+
+    def open(self):
+        load_numpy()
+        self.rng = np.random.default_rng(self.seed)
+        return super().open()
+
+    def read(self, frames):
+        frames = min(frames, self.total_frames - self.frames_read)
+        if frames <= 0:
+            return b""
+        noise = self.rng.standard_normal(frames)
+        if self.color == "pink":
+            # 在頻域以 1/sqrt(f) 塑形
+            spectrum = np.fft.rfft(noise)
+            spectrum /= np.sqrt(np.maximum(np.arange(len(spectrum)), 1))
+            noise = np.fft.irfft(spectrum, frames)
+            noise /= max(np.std(noise), 1e-9)
+        samples = np.clip(noise * self.amplitude, -32768, 32767).astype(np.int16)
+        return self._advance(samples.tobytes())
+
 
 # ───────────────────────────────────────────────
-#  視窗激活與自動點擊（保持原樣）
+#  麥克風裝置：列舉、偵測、自動挑選、多支同時監聽
 # ───────────────────────────────────────────────
 
-def activate_xiaoai_window():
-    for attempt in range(8):
-        try:
-            possible_titles = ["小爱", "小愛同學", "XiaoAi", "xiaoi", "小愛", "小愛同學"]
-            win = None
-            for title in possible_titles:
-                wins = gw.getWindowsWithTitle(title)
-                if wins:
-                    win = wins[0]
-                    break
-
-            if not win:
-                time.sleep(0.4)
-                continue
-
-            if win.isMinimized:
-                win.restore()
+PROBE_SECONDS = 0.6           # 每支麥克風錄多久來估計噪音底線
+PROBE_DEAD_RMS = 2.0          # 低於這個 RMS 視為沒接上或被靜音
+MIC_RETRY_FIRST = 0.3         # 麥克風開不起來（沒插、被占用）時的重試間隔，逐次加倍
+MIC_RETRY_MAX = 5.0
 
-            win.activate()
-            time.sleep(0.35)
 
-            active_title = gw.getActiveWindowTitle() or ""
-            if any(t in active_title for t in ["小爱", "小愛", "XiaoAi", "xiaoi"]):
-                print("成功激活小愛同學視窗")
-                return True
+def list_input_devices():
+    """
+    列出預設 host API 底下的輸入裝置。Windows 同一支麥克風會在 MME / DirectSound / WASAPI
+    各出現一次，只取預設 API 才不會重複；設定檔以名稱記錄，索引在插拔後會變。
+    """
+    import pyaudio
+    pa = pyaudio.PyAudio()
+    try:
+        host_api = pa.get_default_host_api_info()["index"]
+        try:
+            default_index = pa.get_default_input_device_info()["index"]
+        except IOError:
+            default_index = None
+        devices = []
+        for i in range(pa.get_device_count()):
+            info = pa.get_device_info_by_index(i)
+            if info.get("maxInputChannels", 0) < 1 or info.get("hostApi") != host_api:
+                continue
+            devices.append({
+                "index": i,
+                "name": info["name"],
+                "native_rate": int(info.get("defaultSampleRate", 0)),
+                "default": i == default_index,
+            })
+        return devices
+    finally:
+        pa.terminate()
+
+
+def probe_device(device, sample_rate=16000, seconds=PROBE_SECONDS):
+    """開啟一支麥克風錄一小段，量測開啟延遲、第一個區塊到手的時間與噪音底線（RMS / dBFS）"""
+    load_numpy()
+    result = {"name": device["name"], "native_rate": device["native_rate"], "default": device["default"]}
+    block = sample_rate // 10
+    source = MicrophoneSource(sample_rate, block, device["index"])
+    t0 = time.perf_counter()
+    try:
+        source.open()
+        result["open_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        levels = []
+        while source.position < seconds:
+            samples = np.frombuffer(source.read(block), dtype=np.int16).astype(np.float64)
+            if not levels:
+                result["first_block_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            levels.append(float(np.sqrt(np.mean(samples ** 2))) if len(samples) else 0.0)
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+    finally:
+        source.close()
+    # 取中位數：偵測時剛好有人講話或敲鍵盤，也不會把噪音底線拉高
+    rms = float(np.median(levels[1:] or levels))
+    result["noise_rms"] = round(rms, 1)
+    result["noise_dbfs"] = round(20 * np.log10(max(rms, 1e-3) / 32768), 1)
+    return result
+
+
+def rank_probes(results):
+    """
+    可用的裝置由好到壞排序：不必重取樣（原生 16kHz）優先，其次噪音底線低（以 3dB 分級），
+    再來開啟延遲短，最後偏好系統預設裝置。開不起來或完全沒聲音的排除。
+    """
+    usable = [r for r in results if "error" not in r and r.get("noise_rms", 0) >= PROBE_DEAD_RMS]
+    return sorted(usable, key=lambda r: (
+        r["native_rate"] != 16000,
+        round(r["noise_dbfs"] / 3),
+        r.get("first_block_ms", r["open_ms"]),
+        not r["default"],
+    ))
+
+
+class MicrophoneManager:
+    """
+    決定要聽哪幾支麥克風，並讓每支各跑一條辨識管線（共用同一個 Vosk Model）。
+    任一支先偵測到就觸發，其他支在 wake_debounce_ms 內的同一次喚醒會被略過。
+    """
 
+    def __init__(self):
+        self.selected = []         # [(名稱, 裝置索引)]
+        self.extra = []            # 第二支以後的 VoskWake
+        self.last_wake = None
+        self.duplicates = 0
+        self.lock = threading.Lock()
+
+    def probe(self, save=True):
+        """偵測所有輸入裝置，結果與挑選的裝置寫回設定檔"""
+        results = []
+        for device in list_input_devices():
+            result = probe_device(device, voice_waker.sample_rate)
+            results.append(result)
+            if "error" in result:
+                log.info("  麥克風「%s」無法開啟：%s", result["name"], result["error"])
+            else:
+                log.info("  麥克風「%s」開啟 %.0f ms、原生 %s Hz、噪音底線 %.1f dBFS",
+                         result["name"], result["open_ms"], result["native_rate"], result["noise_dbfs"])
+        ranked = rank_probes(results)
+        best = ranked[0]["name"] if ranked else None
+        if save:
+            config["microphone_probe"] = {
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "selected": best,
+                "devices": results,
+            }
+            save_config(config)
+        return best
+
+    def resolve(self):
+        """
+        依設定挑出要監聽的裝置：有指定名稱就照名稱找；沒有就沿用上次自動挑選的結果，
+        那支裝置不在了（或從沒偵測過）才重新偵測，避免每次啟動都多花一秒開麥克風。
+        """
+        try:
+            devices = {d["name"]: d for d in list_input_devices()}
         except Exception as e:
-            print(f"激活嘗試 {attempt+1} 失敗: {e}")
-
-        time.sleep(0.5)
+            log.error("無法列舉麥克風，使用系統預設：%s", e)
+            self.selected = [("系統預設", None)]
+            return self.selected
+
+        wanted = [n for n in config.get("microphones", []) if n]
+        for name in wanted:
+            if name not in devices:
+                log.warning("找不到設定的麥克風「%s」", name)
+        names = [n for n in wanted if n in devices]
+        if not names:
+            best = (config.get("microphone_probe") or {}).get("selected")
+            if best not in devices:
+                log.info("偵測麥克風中...")
+                best = self.probe()
+            if best:
+                names = [best]
+
+        self.selected = [(n, devices[n]["index"]) for n in names] or [("系統預設", None)]
+        log.info("使用麥克風：%s", "、".join(n for n, _ in self.selected))
+        return self.selected
+
+    def build_pipelines(self):
+        """第一支由 voice_waker 負責（含模型載入），其餘各建一個共用 Model 的 VoskWake"""
+        (name, index), rest = self.selected[0], self.selected[1:]
+        voice_waker.device_index, voice_waker.label = index, name
+        if rest and voice_waker.decoder is not None:
+            log.warning("解碼子行程模式只支援一支麥克風，其餘裝置略過")
+            rest = []
+        self.extra = []
+        for name, index in rest:
+            waker = VoskWake(device_index=index, label=name)
+            waker.share_model(voice_waker)
+            self.extra.append(waker)
+        return self.extra
+
+    def wakers(self):
+        return [voice_waker] + self.extra
+
+    def accept(self, waker):
+        """多支麥克風聽到同一次喚醒時只讓第一個過（各錄音執行緒都會呼叫）"""
+        with self.lock:
+            now = time.perf_counter()
+            window = config.get("wake_debounce_ms", 1500) / 1000
+            if self.last_wake is not None and now - self.last_wake < window:
+                self.duplicates += 1
+                log.debug("麥克風「%s」重複偵測，略過", waker.label)
+                return False
+            self.last_wake = now
+            return True
 
-    print("多次嘗試後仍無法將小愛同學視窗置頂，請手動點擊")
-    return False
+    def status_text(self, item=None):
+        names = [n for n, _ in self.selected]
+        if not names:
+            return "麥克風：尚未選擇"
+        text = f"麥克風：{'、'.join(names)}"
+        if self.duplicates:
+            text += f"（略過重複 {self.duplicates} 次）"
+        return text
 
 
-def lock_mouse_at(x, y):
-    global lock_active
-    while lock_active:
-        try:
-            cx, cy = mouse_controller.position
-            if abs(cx - x) > 10 or abs(cy - y) > 10:
-                mouse_controller.position = (x, y)
-            time.sleep(0.008)
-        except:
-            time.sleep(0.03)
+microphones = MicrophoneManager()
 
 
-def auto_click_voice_button():
-    global VOICE_BUTTON_POS, lock_active
+# ───────────────────────────────────────────────
+#  語音活動偵測（VAD）：靜音區塊不送進辨識器
+# ───────────────────────────────────────────────
 
-    if not AUTO_CLICK_ENABLED:
-        return
+class VoiceActivityGate:
+    """
+    以 20ms 小框計算能量與過零率，搭配自適應噪音底線判斷是否有人說話。
+    - 說話開始時，把前一段保留的 pre-roll 一起送出，避免吃掉字頭
+    - 說話結束後再放行 hangover 時間，讓 Vosk 收到句尾
+    - hangover 結束時回傳 flush=True，呼叫端應取 FinalResult()
+    - 噪音底線用最小值統計：被判成說話的框也會讓底線慢慢追上最近的最小能量，不會凍結
+    """
+
+    def __init__(self, sample_rate, frame_ms=20, onset_ratio=3.0, min_energy=120.0,
+                 max_zcr=0.45, hangover_ms=600, preroll_ms=300, min_speech_frames=2,
+                 min_window_ms=1500):
+        self.sample_rate = sample_rate
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.frame_ms = frame_ms
+        self.onset_ratio = onset_ratio      # 能量需高於噪音底線幾倍
+        self.min_energy = min_energy        # 絕對下限（RMS），避免安靜房間內的小雜音觸發
+        self.max_zcr = max_zcr              # 過零率過高且能量不夠大時視為嘶聲/風扇
+        self.hangover_ms = hangover_ms
+        self.preroll_bytes = int(sample_rate * preroll_ms / 1000) * 2
+        self.min_speech_frames = min_speech_frames
+
+        self.noise_floor = None
+        self.recent = deque(maxlen=max(1, min_window_ms // frame_ms))   # 最近的框能量，取最小值當噪音估計
+        self.in_speech = False
+        self.since_speech_ms = 0
+        self.preroll = b""
+        load_numpy()
+
+        self.gated_blocks = 0
+        self.passed_blocks = 0
+
+    def _update_floor(self, energies, speech):
+        # 說話時字與字之間仍有停頓，最近 min_window_ms 內最安靜的框就是噪音的估計；
+        # 噪音突然變大、每一框都被判成說話時，底線靠它慢慢往上追
+        self.recent.extend(energies.tolist())
+        recent_min = min(self.recent) if self.recent else None
+        for e, is_speech in zip(energies, speech):
+            if self.noise_floor is None:
+                self.noise_floor = float(e)
+            elif is_speech:
+                if recent_min > self.noise_floor:
+                    self.noise_floor = 0.99 * self.noise_floor + 0.01 * recent_min
+            elif e < self.noise_floor:
+                self.noise_floor = 0.7 * self.noise_floor + 0.3 * float(e)   # 往下快速跟上
+            else:
+                self.noise_floor = 0.98 * self.noise_floor + 0.02 * float(e)  # 往上緩慢爬升
+
+    def _speech_frames(self, audio):
+        n = len(audio) // self.frame_len
+        if n == 0:
+            return np.zeros(0, dtype=bool), np.zeros(0)
+        frames = audio[:n * self.frame_len].reshape(n, self.frame_len).astype(np.float32)
+        energy = np.sqrt(np.mean(frames * frames, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        if self.noise_floor is None:
+            self.noise_floor = float(np.median(energy))
+        threshold = max(self.noise_floor * self.onset_ratio, self.min_energy)
+        loud = energy > threshold
+        speech = loud & ((zcr < self.max_zcr) | (energy > threshold * 2))
+        self._update_floor(energy, speech)
+        return speech, energy
+
+    def process(self, data, audio):
+        """回傳 (要送進辨識器的資料片段清單, 是否應 flush 取最終結果)"""
+        speech, _ = self._speech_frames(audio)
+        block_ms = len(audio) * 1000 / self.sample_rate
+        idx = np.flatnonzero(speech)
+
+        if len(idx) >= self.min_speech_frames:
+            self.since_speech_ms = (len(speech) - 1 - idx[-1]) * self.frame_ms
+            if not self.in_speech:
+                self.in_speech = True
+                chunks = [self.preroll, data] if self.preroll else [data]
+                self.preroll = b""
+                self.passed_blocks += 1
+                return chunks, False
+            self.passed_blocks += 1
+            return [data], False
+
+        if self.in_speech:
+            self.since_speech_ms += block_ms
+            if self.since_speech_ms <= self.hangover_ms:
+                self.passed_blocks += 1
+                return [data], False
+            self.in_speech = False
+            self.gated_blocks += 1
+            self._keep_preroll(data)
+            return [], True
+
+        self.gated_blocks += 1
+        self._keep_preroll(data)
+        return [], False
+
+    def _keep_preroll(self, data):
+        # 區塊可能比 pre-roll 短（低延遲模式），所以跨區塊累積
+        if self.preroll_bytes:
+            self.preroll = (self.preroll + data)[-self.preroll_bytes:]
 
-    try:
-        if not activate_xiaoai_window():
-            return
+# ───────────────────────────────────────────────
+#  解碼子行程（選用）：共享記憶體環形緩衝區 + pipe
+# ───────────────────────────────────────────────
 
-        time.sleep(0.6)
-        activate_xiaoai_window()
+DECODER_RING_SECONDS = 10     # 環形緩衝區長度；子行程落後超過這麼久就視為卡住並重啟
+DECODER_MAX_BACKOFF = 30.0
+DECODER_START_TIMEOUT = 120.0  # 第一次載入模型最多等這麼久，逾時視為失敗
+SPAWN_LOCK = threading.Lock()  # 啟動子行程時會暫時替換 sys.modules["__main__"]
+
+
+class DecoderProcess:
+    """
+    主行程這一端：麥克風與 VAD 留在主行程，音訊寫進 AudioRing，
+    子行程只負責 KaldiRecognizer，結果由一條接收執行緒交給 VoskWake.on_decoder_result()。
+    子行程結束或落後超過 DECODER_RING_SECONDS 時自動重啟（退避最長 DECODER_MAX_BACKOFF 秒），
+    麥克風串流完全不受影響。
+    """
+
+    def __init__(self, waker):
+        self.waker = waker
+        self.ring = AudioRing(waker.sample_rate * 2 * DECODER_RING_SECONDS)
+        self.lock = threading.Lock()
+        self.conn = None
+        self.process = None
+        self.ready_event = threading.Event()
+        self.settled = threading.Event()   # 第一次啟動已有結果（就緒或失敗），start_decoder() 等的是這個
+        self.error = None
+        self.acked = 0
+        self.restarts = 0
+        self.stopping = False
+
+    def start(self):
+        import multiprocessing
+        ctx = multiprocessing.get_context("spawn")
+        parent, child = ctx.Pipe()
+        process = ctx.Process(
+            target=decoder_worker,
+            args=(self.waker.model_path, self.waker.sample_rate, self.waker.recognizer_grammar(),
+                  self.ring.name, self.ring.capacity, child),
+            name="vosk-decoder", daemon=True)
+        # spawn 會在子行程重新執行 __main__，也就是整個啟動器（熱鍵、設定、托盤、全域物件）；
+        # 啟動的這一刻把 __main__ 換成沒有副作用的 xiaoi_decoder，子行程就只匯入它
+        with SPAWN_LOCK:
+            main = sys.modules["__main__"]
+            sys.modules["__main__"] = xiaoi_decoder
+            try:
+                process.start()
+            finally:
+                sys.modules["__main__"] = main
+        child.close()
+        with self.lock:
+            self.conn, self.process = parent, process
+        threading.Thread(target=self._receive, args=(parent, process), name="decoder-recv", daemon=True).start()
+
+    @property
+    def ready(self):
+        return self.ready_event.is_set()
+
+    def send(self, msg):
+        with self.lock:
+            if self.conn is None:
+                return False
+            try:
+                self.conn.send(msg)
+                return True
+            except (OSError, EOFError):
+                return False
 
-        if VOICE_BUTTON_POS is None:
-            w, h = pyautogui.size()
-            x = int(w * 0.225)
-            y = int(h * 0.388)
+    def write(self, data):
+        """錄音執行緒呼叫：寫進環形緩衝區並通知子行程，回傳這段的結束位置"""
+        start, end = self.ring.write(data)
+        if not self.ready:
+            return end
+        if end - self.acked > self.ring.capacity:
+            # 子行程卡住（例如解碼尖峰或當掉但 pipe 還沒斷），強制重啟
+            log.warning("解碼子行程落後超過 %s 秒，強制重啟", DECODER_RING_SECONDS)
+            self.acked = end
+            self.kill()
         else:
-            x, y = VOICE_BUTTON_POS
-
-        lock_active = True
-        threading.Thread(target=lock_mouse_at, args=(x, y), daemon=True).start()
+            self.send(("data", start, end))
+        return end
 
-        pyautogui.moveTo(x, y, duration=0.1)
-        pyautogui.click()
-        print("已點擊語音按鈕")
+    def kill(self):
+        process = self.process
+        if process is not None and process.is_alive():
+            process.terminate()
 
-        time.sleep(1.2)
-        lock_active = False
-
-    except Exception as e:
-        print(f"自動點擊失敗：{e}")
-        lock_active = False
+    def _receive(self, conn, process):
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = msg[0]
+            if kind == "ready":
+                self.acked = self.ring.position
+                self.restarts = 0
+                self.ready_event.set()
+                self.settled.set()
+                log.info("解碼子行程已就緒（PID %s）", msg[1])
+            elif kind == "error":
+                self.error = msg[1]
+            else:
+                self.acked = msg[2]
+                try:
+                    self.waker.on_decoder_result(kind, msg[1], msg[2])
+                except Exception as e:
+                    # 單一結果處理失敗不能讓接收執行緒結束，否則 pipe 沒人讀、重啟邏輯也不會跑
+                    log.error("處理解碼結果失敗：%s", e)
+
+        process.join(1.0)
+        self.ready_event.clear()
+        with self.lock:
+            if self.conn is conn:
+                self.conn = None
+        conn.close()
+        if self.stopping:
+            return
+        if not self.settled.is_set():
+            # 第一次就沒能就緒（模型路徑錯誤等），重啟也沒用，交給 start_decoder() 回報失敗
+            self.error = self.error or f"子行程在就緒前結束（exit code {process.exitcode}）"
+            self.settled.set()
+            return
+        self.restarts += 1
+        delay = min(DECODER_MAX_BACKOFF, 2 ** (self.restarts - 1))
+        log.warning("解碼子行程已結束（exit code %s），%g 秒後重啟；麥克風持續開啟", process.exitcode, delay)
+        time.sleep(delay)
+        if not self.stopping:
+            self.start()
 
+    def stop(self):
+        self.stopping = True
+        self.send(("stop",))
+        process = self.process
+        if process is not None:
+            process.join(1.0)
+            if process.is_alive():
+                process.terminate()
+        self.ring.close()
 
-def open_xiaoai():
-    try:
-        app_id = "8497DDF3.639A2791C9AB_kf545nqv09rxe!App"
-        subprocess.Popen(f'explorer.exe shell:appsFolder\\{app_id}', shell=True)
-        print("已嘗試啟動小愛同學")
-        time.sleep(0.8)
-        if AUTO_CLICK_ENABLED:
-            threading.Thread(target=auto_click_voice_button, daemon=True).start()
-    except Exception as e:
-        print(f"啟動失敗：{e}")
 
 # ───────────────────────────────────────────────
 #  Vosk 喚醒類（已修正 stop_event 初始化問題）
 # ───────────────────────────────────────────────
 
 class VoskWake:
-    def __init__(self):
+    def __init__(self, device_index=None, label=None):
         # 使用你測試成功的模型路徑
         self.model_path = r".\vosk-model-cn"
         self.sample_rate = 16000
-        self.block_size = 8000  # 與測試腳本一致
-        self.device_index = None   # 你測試成功的索引
+        self.vad = None
+        self.apply_settings()
+        self.device_index = device_index   # 由 MicrophoneManager 依偵測結果或設定指定
+        self.label = label                 # 麥克風名稱，多支同時監聽時用來區分追蹤紀錄
         self.stop_event = threading.Event()  # 初始化 stop_event
-
+        self.rebuild_event = threading.Event()  # 喚醒詞或辨識模式變更時重建辨識器
+        self.last_text = ""
+        self.samples_seen = 0          # 以音訊時間計算防抖，基準測試快轉時也一致
+        self.last_fire_sample = None
+        self.partial_word = None
+        self.partial_hits = 0
+        self.frame_t = None            # 最近一個音訊區塊送進來的時間（延遲追蹤的起點）
+        self.wake_marks = []
+        self.decoder = None            # 解碼子行程模式時的 DecoderProcess
+        self.frame_times = deque(maxlen=64)   # (環形緩衝區結束位置, 區塊時間)，對回子行程的結果
+        self.frame_lock = threading.Lock()    # 錄音執行緒寫、接收執行緒讀
+        self.on_wake = None
+
+        # 模型改在背景執行緒載入（load_model_async），熱鍵與托盤不必等它
+        self.model = None
+        self.recognizer = None
+        self.state = "idle"        # idle / loading / ready / failed
+        self.load_error = None
+        self.ready_event = threading.Event()
+
+
+    def apply_settings(self):
+        """
+        從 config 讀取延遲、防抖與 VAD 設定。監聽中也可以呼叫：
+        listen() 每個區塊都重新讀取這些屬性，Model 與音訊串流不受影響。
+        """
+        self.latency_mode = config.get("latency_mode", False)
+        block_ms = config.get("latency_block_ms", 100) if self.latency_mode else 500
+        self.block_size = int(self.sample_rate * block_ms / 1000)  # 一般模式 8000，與測試腳本一致
+        self.partial_stable_count = max(1, int(config.get("partial_stable_count", 2)))
+        self.debounce_samples = int(self.sample_rate * config.get("wake_debounce_ms", 1500) / 1000)
+        if not config.get("vad_enabled", True):
+            self.vad = None
+        elif self.vad is None:
+            self.vad = VoiceActivityGate(self.sample_rate)
+
+    def load_model(self, in_process=False):
+        load_numpy()
+        if config.get("decoder_process", False) and not in_process:
+            return self.start_decoder()
+        self.state = "loading"
+        update_tray_menu()
         try:
+            from vosk import Model
             self.model = Model(self.model_path)
-            self.recognizer = KaldiRecognizer(self.model, self.sample_rate)
-            print("[DEBUG] Vosk 模型載入成功")
+            self.recognizer = self.build_recognizer()
+            self.state = "ready"
+            log.info("Vosk 模型載入成功")
+            mark_startup("Vosk 模型載入完成")
         except Exception as e:
-            print(f"[ERROR] Vosk 模型載入失敗：{e}")
-            sys.exit(1)
-
-        print(f"[DEBUG] 使用麥克風索引：{self.device_index}")
-
-    def listen(self):
-        print("[DEBUG] listen() 開始執行")
-
-        p = pyaudio.PyAudio()
-
+            self.state = "failed"
+            self.load_error = e
+            log.error("Vosk 模型載入失敗：%s（熱鍵仍可使用）", e)
+            mark_startup("Vosk 模型載入失敗")
+        self.ready_event.set()
+        update_tray_menu()
+        return self.state == "ready"
+
+    def start_decoder(self):
+        """解碼子行程模式：Model 只在子行程載入，主行程等它回報就緒"""
+        self.state = "loading"
+        update_tray_menu()
         try:
-            stream = p.open(
-                format=pyaudio.paInt16,
-                channels=1,
-                rate=self.sample_rate,
-                input=True,
-                frames_per_buffer=self.block_size,
-                input_device_index=self.device_index  # 強制使用測試成功的索引
-            )
-            print("[DEBUG] PyAudio 麥克風開啟成功，使用索引:", self.device_index)
+            self.decoder = DecoderProcess(self)
+            self.decoder.start()
+            if not self.decoder.settled.wait(DECODER_START_TIMEOUT):
+                self.decoder.error = f"等待 {DECODER_START_TIMEOUT:g} 秒仍未就緒"
+        except Exception as e:
+            self.decoder = None
+            self.load_error = e
+        if self.decoder is not None and self.decoder.ready:
+            self.state = "ready"
+            mark_startup("解碼子行程就緒")
+        else:
+            self.state = "failed"
+            self.load_error = self.load_error or (self.decoder and self.decoder.error)
+            log.error("解碼子行程啟動失敗：%s（熱鍵仍可使用）", self.load_error)
+            if self.decoder is not None:
+                self.decoder.stop()
+                self.decoder = None
+        self.ready_event.set()
+        update_tray_menu()
+        return self.state == "ready"
+
+    def share_model(self, primary):
+        """第二支以後的麥克風：沿用主要管線已載入的 Model，只建自己的辨識器與 VAD"""
+        primary.ready_event.wait()
+        self.model = primary.model
+        if primary.state == "ready" and self.model is not None:
+            self.recognizer = self.build_recognizer()
+        self.state = primary.state if self.recognizer is not None else "failed"
+        self.ready_event.set()
+
+    async def load_model_async(self, on_done=None):
+        """在專屬執行緒載入模型（C 呼叫無法中斷，不佔用執行緒池），回傳是否成功"""
+        self.state = "loading"
+        ok = await runtime.bridge(self.load_model, name="vosk-load")
+        if on_done:
+            on_done()
+        return ok
+
+    def recognizer_grammar(self):
+        """目前設定對應的 KaldiRecognizer 語法 JSON；完整詞彙模式回傳 None"""
+        if config.get("recognizer_mode", "grammar") == "full":
+            log.debug("辨識模式：完整詞彙（診斷用）")
+            return None
+        grammar = build_wake_grammar(wake_matcher.words)
+        log.debug("辨識模式：喚醒詞語法（%s 項）", len(grammar))
+        return json.dumps(grammar, ensure_ascii=False)
+
+    def build_recognizer(self):
+        from vosk import KaldiRecognizer
+        grammar = self.recognizer_grammar()
+        if grammar is None:
+            return KaldiRecognizer(self.model, self.sample_rate)
+        return KaldiRecognizer(self.model, self.sample_rate, grammar)
+
+    def request_rebuild(self):
+        self.rebuild_event.set()
+
+    def rebuild_if_requested(self):
+        if not self.rebuild_event.is_set():
+            return
+        self.rebuild_event.clear()
+        try:
+            if self.decoder is not None:
+                self.decoder.send(("grammar", self.recognizer_grammar()))
+                return
+            self.recognizer = self.build_recognizer()
         except Exception as e:
-            print(f"[ERROR] 無法開啟麥克風：{e}")
+            log.error("重建辨識器失敗，沿用原辨識器：%s", e)
+
+    def listen(self, on_wake, source=None):
+        """
+        開啟音訊來源後持續監聽，直到 stop() 為止。
+        偵測到喚醒詞時呼叫 on_wake(text, span)，辨識器 Reset() 後繼續聽，
+        串流與辨識器在整個程式生命週期內都不重建，連續喚醒沒有空窗。
+        """
+        log.debug("listen() 開始執行")
+        self.on_wake = on_wake
+
+        while not self.ready_event.wait(0.5):
+            if self.stop_event.is_set():
+                return False
+        if self.state != "ready":
+            log.error("Vosk 模型無法使用，語音喚醒停用")
+            return False
+
+        if source is None:
+            source = MicrophoneSource(self.sample_rate, self.block_size, self.device_index)
+
+        if not self.open_source(source):
             return False
 
-        print("[DEBUG] 進入監聽循環...")
+        log.debug("進入監聽循環...")
 
         last_heart_time = time.time()
+        read_errors = 0
 
         try:
-            stream.start_stream()
-
             while not self.stop_event.is_set() and voice_listener_active:
                 try:
-                    data = stream.read(self.block_size, exception_on_overflow=False)
-                    audio_data = np.frombuffer(data, dtype=np.int16)
-
-                    # 可選：只在有明顯聲音時印（減少輸出噪音）
-                    if audio_data.max() > 300:
-                        print(f"[有聲音] 振幅 max: {audio_data.max()}")
-
-                    if self.recognizer.AcceptWaveform(data):
-                        result = json.loads(self.recognizer.Result())
-                        text = result.get("text", "").strip().replace(" ", "")  # ← 加這行！去除空格，提高匹配率
-                        if text:
-                            print(f"[Vosk] 聽到：{text}")
-
-                            if self.is_wake_word(text):
-                                print("[DEBUG] 喚醒詞觸發！")
-                                return True
-                    else:
-                        partial = json.loads(self.recognizer.PartialResult())
-                        partial_text = partial.get("partial", "").strip().replace(" ", "")  # 也去除空格
-                        if partial_text:
-                            print(f"[Vosk Partial]: {partial_text}")
+                    self.rebuild_if_requested()
+                    data = source.read(self.block_size)
+                    if not data:
+                        log.debug("音訊來源已結束")
+                        break
+                    read_errors = 0
+                    if voice_paused:
+                        continue
+
+                    if self.feed(data):
+                        self.recognizer.Reset()
+                        on_wake(self.last_text, self.take_span())
 
                     # 每 10 秒心跳一次，證明還在跑
                     if time.time() - last_heart_time > 10:
-                        print("[心跳] 語音監聽仍在運行中... (說 '小愛同學' 測試)")
+                        log.debug("語音監聽仍在運行中... (說 '小愛同學' 測試)")
+                        if self.vad:
+                            log.debug("VAD：已略過 %s 個靜音區塊，送出 %s 個",
+                                      self.vad.gated_blocks, self.vad.passed_blocks)
                         last_heart_time = time.time()
+                        update_tray_menu()
 
                 except Exception as e:
-                    print(f"[ERROR] 監聽循環異常：{e}")
+                    log.error("監聽循環異常：%s", e)
+                    read_errors += 1
                     time.sleep(0.5)
+                    if read_errors >= 3:
+                        # 連續讀取失敗（例如 USB 麥克風被拔掉），重新開啟同一個來源
+                        log.debug("重新開啟音訊來源...")
+                        source.close()
+                        try:
+                            source.open()
+                            read_errors = 0
+                        except Exception as e2:
+                            log.error("重新開啟失敗：%s", e2)
 
         except Exception as e:
-            print(f"[ERROR] 監聽異常：{e}")
+            log.error("監聽異常：%s", e)
         finally:
-            print("[DEBUG] 結束監聽，關閉資源")
-            stream.stop_stream()
-            stream.close()
-            p.terminate()
+            log.debug("結束監聽，關閉資源")
+            source.close()
 
         return False
 
-    def is_wake_word(self, text):
-        text = text.lower().strip()
-        for word in config.get("wake_words", []):
-            ratio = SequenceMatcher(None, text, word.lower()).ratio()
-            if word.lower() in text or ratio > config.get("similarity_threshold", 0.58):
-                print(f"[DEBUG] 偵測到喚醒詞：{word} (相似度: {ratio:.3f})")
+    def open_source(self, source):
+        """
+        開啟音訊來源。麥克風開機時還沒插上或被其他程式占用時，以退避間隔持續重試直到 stop()；
+        檔案類來源（基準測試）開不起來就直接放棄。
+        """
+        delay = MIC_RETRY_FIRST
+        while True:
+            try:
+                source.open()
+                log.debug("音訊來源開啟成功：%s", type(source).__name__)
+                return True
+            except Exception as e:
+                if not isinstance(source, MicrophoneSource):
+                    log.error("無法開啟音訊來源：%s", e)
+                    return False
+                if delay == MIC_RETRY_FIRST:
+                    log.error("無法開啟麥克風：%s（會持續重試）", e)
+                else:
+                    log.debug("麥克風仍無法開啟：%s，%.1f 秒後重試", e, delay)
+            if self.stop_event.wait(delay) or not voice_listener_active:
+                return False
+            delay = min(delay * 2, MIC_RETRY_MAX)
+
+    def feed(self, data):
+        """把一個音訊區塊送進 VAD 與辨識器，偵測到喚醒詞時回傳 True"""
+        self.frame_t = time.perf_counter()
+        audio_data = np.frombuffer(data, dtype=np.int16)
+        self.samples_seen += len(audio_data)
+
+        # 可選：只在有明顯聲音時印（減少輸出噪音）
+        peak = audio_data.max()
+        if peak > 300:
+            log.debug("[有聲音] 振幅 max: %d", peak)
+
+        if self.vad is None:
+            chunks, flush = [data], False
+        else:
+            chunks, flush = self.vad.process(data, audio_data)
+
+        if self.decoder is not None:
+            # 子行程模式：只寫進環形緩衝區，結果由接收執行緒非同步回報
+            for chunk in chunks:
+                end = self.decoder.write(chunk)
+                with self.frame_lock:
+                    self.frame_times.append((end, self.frame_t))
+            if flush and self.decoder.ready:
+                self.decoder.send(("flush", self.decoder.ring.position))
+            return False
+
+        for chunk in chunks:
+            if self.recognizer.AcceptWaveform(chunk):
+                self.partial_word, self.partial_hits = None, 0
+                if self.check_result(self.recognizer.Result()):
+                    return self.fire()
+            else:
+                partial = json.loads(self.recognizer.PartialResult())
+                partial_text = partial.get("partial", "").replace("[unk]", "").strip().replace(" ", "")  # 也去除空格
+                if partial_text:
+                    log.debug("[Vosk Partial]: %s", partial_text)
+                    if self.latency_mode and self.check_partial(partial_text):
+                        return self.fire()
+
+        if flush:
+            # 說話結束且 hangover 已過，不再送靜音進去，直接取這句的最終結果
+            self.partial_word, self.partial_hits = None, 0
+            if self.check_result(self.recognizer.FinalResult()):
+                return self.fire()
+        return False
+
+    def on_decoder_result(self, kind, result_json, end):
+        """解碼子行程回報的結果（在接收執行緒上），判斷邏輯與 feed() 相同"""
+        with self.frame_lock:
+            frame_times = list(self.frame_times)
+        for pos, t in frame_times:
+            if pos >= end:
+                self.frame_t = t
+                break
+        if kind == "partial":
+            partial = json.loads(result_json)
+            partial_text = partial.get("partial", "").replace("[unk]", "").strip().replace(" ", "")
+            if partial_text:
+                log.debug("[Vosk Partial]: %s", partial_text)
+                if self.latency_mode and self.check_partial(partial_text):
+                    self.remote_wake()
+            return
+        self.partial_word, self.partial_hits = None, 0
+        if self.check_result(result_json):
+            self.remote_wake()
+
+    def remote_wake(self):
+        if not self.fire():
+            return
+        self.decoder.send(("reset",))
+        if self.on_wake:
+            self.on_wake(self.last_text, self.take_span())
+
+    def check_partial(self, partial_text):
+        """
+        部分結果的穩定規則：同一個喚醒詞要連續出現在 partial_stable_count 次
+        部分結果中才算數，避免一閃而過的錯誤假設觸發。
+        """
+        result_t = time.perf_counter()
+        hit = wake_matcher.match_partial(partial_text)
+        if not hit:
+            self.partial_word, self.partial_hits = None, 0
+            return False
+        word, ratio = hit
+        if word == self.partial_word:
+            self.partial_hits += 1
+        else:
+            self.partial_word, self.partial_hits = word, 1
+        if self.partial_hits < self.partial_stable_count:
+            return False
+        self.wake_marks = [("partial", result_t), ("matcher", time.perf_counter())]
+        log.debug("部分結果穩定命中：%s (相似度: %.3f，連續 %s 次)", word, ratio, self.partial_hits)
+        self.last_text = partial_text
+        return True
+
+    def fire(self):
+        self.partial_word, self.partial_hits = None, 0
+        if self.last_fire_sample is not None and self.samples_seen - self.last_fire_sample < self.debounce_samples:
+            log.debug("防抖：忽略重複觸發")
+            return False
+        self.last_fire_sample = self.samples_seen
+        return True
+
+    def check_result(self, result_json):
+        result = json.loads(result_json)
+        text = result.get("text", "").replace("[unk]", "").strip().replace(" ", "")  # ← 加這行！去除空格，提高匹配率
+        if text:
+            result_t = time.perf_counter()
+            log.debug("[Vosk] 聽到：%s", text)
+
+            if self.is_wake_word(text):
+                self.wake_marks = [("final", result_t), ("matcher", time.perf_counter())]
+                log.debug("喚醒詞觸發！")
+                self.last_text = text
                 return True
         return False
 
+    def is_wake_word(self, text):
+        hit = wake_matcher.match(text)
+        if hit:
+            word, ratio = hit
+            log.debug("偵測到喚醒詞：%s (相似度: %.3f)", word, ratio)
+            return True
+        return False
+
+    def take_span(self):
+        """把這次喚醒的時間點（音訊區塊到手、辨識結果、比對決定）做成追蹤紀錄"""
+        source = f"語音（{self.label}）" if len(microphones.selected) > 1 else "語音"
+        span = tracer.start(source, self.frame_t)
+        for stage, t in self.wake_marks:
+            span.mark(stage, t)
+        self.wake_marks = []
+        return span
+
     def stop(self):
-        print("[DEBUG] VoskWake stop() 被呼叫")
+        log.debug("VoskWake stop() 被呼叫")
         self.stop_event.set()
+        if self.decoder is not None:
+            self.decoder.stop()
 
 
 voice_waker = VoskWake()
 
 # ───────────────────────────────────────────────
-#  熱鍵管理（保持原樣）
+#  喚醒偵測基準測試（用錄音語料跑完整 V3 流程）
 # ───────────────────────────────────────────────
 
-def register_hotkey(hotkey_str):
-    global current_hotkey
-    if current_hotkey:
-        try:
-            keyboard.remove_hotkey(current_hotkey)
-        except:
-            pass
+def load_benchmark_manifest(corpus):
+    """
+    語料格式：資料夾內的 manifest.json（或直接指定該檔），例如
+    {"items": [
+        {"audio": "wake_01.wav", "wake_ends": [1.82, 6.40]},
+        {"audio": "tv_30min.pcm", "sample_rate": 16000, "wake_ends": []},
+        {"synthetic": "pink", "seconds": 1800, "amplitude": 300}
+    ]}
+    wake_ends 為每次喚醒詞說完的時間點（秒），負樣本留空。
+    """
+    path = Path(corpus)
+    manifest = path / "manifest.json" if path.is_dir() else path
+    with open(manifest, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    items = data["items"] if isinstance(data, dict) else data
+    return manifest.parent, items
+
+
+def make_benchmark_source(item, base, sample_rate):
+    if "synthetic" in item:
+        return SyntheticNoiseSource(
+            seconds=item.get("seconds", 60),
+            sample_rate=sample_rate,
+            color=item["synthetic"],
+            amplitude=item.get("amplitude", 200.0),
+            seed=item.get("seed", 0)
+        )
+    audio = base / item["audio"]
+    if audio.suffix.lower() == ".wav":
+        return WavFileSource(audio, sample_rate)
+    return RawPcmSource(audio, sample_rate, item.get("sample_rate", sample_rate))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def run_wake_benchmark(waker, corpus, out_path=None, max_latency=3.0):
+    """
+    逐一播放語料，回報：
+    - 從喚醒詞說完到偵測觸發的延遲（以音訊時間計）
+    - 漏接數、每小時誤觸發次數
+    - 每小時音訊耗用的 CPU 秒數
+    """
+    base, items = load_benchmark_manifest(corpus)
+    latencies = []
+    total_audio = 0.0
+    total_cpu = 0.0
+    total_wakes = 0
+    misses = 0
+    false_accepts = 0
+    per_item = []
+
+    for item in items:
+        waker.recognizer = waker.build_recognizer()
+        if waker.vad is not None:
+            waker.vad = VoiceActivityGate(waker.sample_rate)
+        waker.samples_seen = 0
+        waker.last_fire_sample = None
+        source = make_benchmark_source(item, base, waker.sample_rate)
+        detections = []
+
+        cpu_start = time.process_time()
+        with source:
+            while True:
+                data = source.read(waker.block_size)
+                if not data:
+                    break
+                if waker.feed(data):
+                    detections.append(source.position)
+                    waker.recognizer.Reset()
+            if waker.check_result(waker.recognizer.FinalResult()):
+                detections.append(source.position)
+        cpu = time.process_time() - cpu_start
+
+        wake_ends = sorted(item.get("wake_ends", []))
+        unmatched = list(wake_ends)
+        item_fa = 0
+        item_lat = []
+        for d in detections:
+            hit = next((w for w in unmatched if w - 0.5 <= d <= w + max_latency), None)
+            if hit is None:
+                item_fa += 1
+            else:
+                unmatched.remove(hit)
+                item_lat.append(round((d - hit) * 1000, 1))
+
+        total_audio += source.position
+        total_cpu += cpu
+        total_wakes += len(wake_ends)
+        misses += len(unmatched)
+        false_accepts += item_fa
+        latencies.extend(item_lat)
+        per_item.append({
+            "item": item.get("audio") or f"synthetic:{item.get('synthetic')}",
+            "audio_seconds": round(source.position, 2),
+            "wake_words": len(wake_ends),
+            "detected": len(item_lat),
+            "misses": len(unmatched),
+            "false_accepts": item_fa,
+            "cpu_seconds": round(cpu, 3)
+        })
+        log.info("[基準測試] %s", per_item[-1])
+
+    hours = total_audio / 3600 if total_audio else 0.0
+    summary = {
+        "model": waker.model_path,
+        "recognizer_mode": config.get("recognizer_mode", "grammar"),
+        "vad_enabled": waker.vad is not None,
+        "latency_mode": waker.latency_mode,
+        "block_size": waker.block_size,
+        "similarity_threshold": config.get("similarity_threshold", 0.58),
+        "audio_seconds": round(total_audio, 2),
+        "wake_words": total_wakes,
+        "detected": total_wakes - misses,
+        "misses": misses,
+        "false_accepts": false_accepts,
+        "false_accepts_per_hour": round(false_accepts / hours, 3) if hours else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "max": max(latencies) if latencies else None
+        },
+        "cpu_seconds_per_audio_hour": round(total_cpu / hours, 2) if hours else None,
+        "items": per_item
+    }
+
+    log.info("=" * 60)
+    log.info("喚醒偵測基準測試結果")
+    log.info("音訊總長：%s 秒，喚醒詞 %s 次", summary["audio_seconds"], total_wakes)
+    log.info("偵測成功：%s，漏接：%s，誤觸發：%s（每小時 %s）",
+             summary["detected"], misses, false_accepts, summary["false_accepts_per_hour"])
+    log.info("延遲（ms）：%s", summary["latency_ms"])
+    log.info("CPU：每小時音訊 %s 秒", summary["cpu_seconds_per_audio_hour"])
+    log.info("=" * 60)
+
+    if out_path:
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        log.info("結果已寫入 %s", out_path)
+    return summary
+
+# ───────────────────────────────────────────────
+#  熱鍵管理：按住 / 組合鍵手勢
+# ───────────────────────────────────────────────
+
+def key_state_probe():
+    """Windows 上以 GetAsyncKeyState 讀取實際按鍵狀態；其他平台回傳 None（不校正）"""
+    if sys.platform != "win32":
+        return None
+    import ctypes
+    user32 = ctypes.windll.user32
+
+    def probe(scan_code):
+        vk = user32.MapVirtualKeyW(scan_code, 1)   # MAPVK_VSC_TO_VK；對不到的掃描碼當作按下，不去動它
+        return not vk or bool(user32.GetAsyncKeyState(vk) & 0x8000)
+
+    return probe
+
+
+class HoldGestureEngine:
+    """
+    組合鍵 / 按住手勢：只靠 keyboard 的按下、放開事件，加上一個可重複使用的計時器。
+    - bind("ctrl + 1", callback, hold=0)：組合鍵全部按下就觸發；hold > 0 時要持續按住 hold 秒
+    - 每次按下只觸發一次：系統自動重複的按下事件直接忽略，組合中任一鍵放開後才重新計算
+    - 沒有輪詢執行緒，計時器是事件迴圈上的 call_later，到期才醒來
+    """
+
+    MODIFIER_KEYS = ("ctrl", "shift", "alt", "windows")
+
+    def __init__(self, resolve=None, probe=None):
+        self.resolve = resolve          # 鍵名 → 掃描碼，預設用 keyboard.key_to_scan_codes
+        self.lock = threading.Lock()
+        self.bindings = {}
+        self.next_id = 0
+        self.down = set()
+        self.hook = None
+        self.timer = None
+        self.armed = None               # 計時器目前排定的到期時間（monotonic）
+        if probe is None and resolve is None:
+            probe = key_state_probe()
+        self.probe = probe              # 掃描碼 → 系統上是否真的按著，用來清掉漏接放開事件的鍵
+        self.modifiers = None
+        self.stats = {"fired": 0, "repeats_ignored": 0, "stuck_cleared": 0}
+
+    def parse(self, chord):
+        resolve = self.resolve or keyboard.key_to_scan_codes
+        names = [k.strip().lower() for k in chord.split("+")]
+        if not all(names):
+            raise ValueError(f"無法解析熱鍵：{chord}")
+        return [frozenset(resolve(name)) for name in names]
+
+    def bind(self, chord, callback, hold=0.0):
+        keys = self.parse(chord)
+        with self.lock:
+            self.next_id += 1
+            self.bindings[self.next_id] = {"keys": keys, "callback": callback, "hold": float(hold),
+                                           "deadline": None, "fired": False}
+        if self.hook is None and self.resolve is None:
+            self.hook = keyboard.hook(self._on_event)
+        return self.next_id
+
+    def unbind(self, binding_id):
+        with self.lock:
+            self.bindings.pop(binding_id, None)
+            deadline = self._next_deadline()
+        self._schedule(deadline)
+
+    def stop(self):
+        with self.lock:
+            self.bindings.clear()
+            self.down.clear()
+        self._schedule(None)
+        if self.hook is not None:
+            try:
+                keyboard.unhook(self.hook)
+            except Exception:
+                pass
+            self.hook = None
+
+    def _on_event(self, event):
+        self.feed(event.scan_code, event.event_type == keyboard.KEY_DOWN)
+
+    def _modifier_codes(self):
+        if self.modifiers is None:
+            resolve = self.resolve or keyboard.key_to_scan_codes
+            codes = set()
+            for name in self.MODIFIER_KEYS:
+                try:
+                    codes.update(resolve(name))
+                except (ValueError, KeyError):
+                    pass
+            self.modifiers = frozenset(codes)
+        return self.modifiers
+
+    def _held(self, b):
+        # 修飾鍵要完全相符：按著 ctrl+shift+1 不會觸發 ctrl+1
+        if not all(codes & self.down for codes in b["keys"]):
+            return False
+        chord = frozenset().union(*b["keys"])
+        return not (self.down & self._modifier_codes()) - chord
+
+    def _resync(self, scan_code):
+        """漏接放開事件（鎖定畫面、UAC、切換桌面）會讓鍵永遠留在 down 裡：有新事件時以系統狀態校正"""
+        if self.probe is None:
+            return
+        for code in list(self.down):
+            if code != scan_code and not self.probe(code):
+                self.down.discard(code)
+                self.stats["stuck_cleared"] += 1
+
+    def _next_deadline(self):
+        return min((b["deadline"] for b in self.bindings.values() if b["deadline"] is not None), default=None)
+
+    def feed(self, scan_code, pressed, now=None):
+        now = time.monotonic() if now is None else now
+        due = []
+        with self.lock:
+            self._resync(scan_code)
+            if pressed:
+                if scan_code in self.down:
+                    self.stats["repeats_ignored"] += 1
+                    return
+                self.down.add(scan_code)
+                for b in self.bindings.values():
+                    if not self._held(b):
+                        b["deadline"] = None    # 多按了修飾鍵：取消計時
+                        if not any(codes & self.down for codes in b["keys"]):
+                            b["fired"] = False
+                        continue
+                    if b["fired"] or b["deadline"] is not None:
+                        continue
+                    if b["hold"] <= 0:
+                        b["fired"] = True
+                        due.append(b["callback"])
+                    else:
+                        b["deadline"] = now + b["hold"]
+            else:
+                self.down.discard(scan_code)
+                for b in self.bindings.values():
+                    if not self._held(b):
+                        b["deadline"] = None
+                        b["fired"] = False
+            deadline = self._next_deadline()
+        self._schedule(deadline)
+        self._fire(due)
+
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        due = []
+        with self.lock:
+            for b in self.bindings.values():
+                if b["deadline"] is not None and b["deadline"] <= now:
+                    b["deadline"] = None
+                    if self._held(b):
+                        b["fired"] = True
+                        due.append(b["callback"])
+            deadline = self._next_deadline()
+        self._schedule(deadline)
+        self._fire(due)
+
+    def _fire(self, callbacks):
+        for callback in callbacks:
+            self.stats["fired"] += 1
+            try:
+                callback()
+            except Exception as e:
+                log.error("熱鍵動作失敗：%s", e)
+
+    def _schedule(self, deadline):
+        # 只有一個計時器：到期時間變了才重新排程
+        with self.lock:
+            if deadline == self.armed:
+                return
+            self.armed = deadline
+        if not runtime.call(self._rearm):
+            with self.lock:
+                self.armed = None
+
+    def _rearm(self):
+        # 在事件迴圈上執行
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        deadline = self.armed
+        if deadline is not None:
+            self.timer = runtime.loop.call_later(max(0.0, deadline - time.monotonic()), self.expire)
+
+
+gestures = HoldGestureEngine()
+
+
+def register_hotkey(hotkey_str, notify=True):
+    """
+    先註冊新熱鍵、成功後才移除舊的，切換過程中熱鍵不會有空窗；
+    新熱鍵無效時保留舊的。notify=False 時只寫日誌不跳對話框（熱重載用）。
+    """
+    global current_hotkey, hotkey_binding
+    old_binding = hotkey_binding
 
     if not hotkey_str or hotkey_str.strip() == "":
-        print("熱鍵已移除")
+        if old_binding is not None:
+            gestures.unbind(old_binding)
+        hotkey_binding = None
         current_hotkey = None
-        return
+        log.info("熱鍵已移除")
+        return True
 
     try:
-        keyboard.add_hotkey(hotkey_str, open_xiaoai)
-        current_hotkey = hotkey_str
-        print(f"熱鍵已註冊：{hotkey_str}")
+        hold = float(config.get("hotkey_hold_seconds", 0))
+        new_binding = gestures.bind(hotkey_str, lambda: launcher.trigger("熱鍵"), hold=hold)
     except Exception as e:
-        print(f"熱鍵註冊失敗：{e}")
-        messagebox.showerror("熱鍵錯誤", str(e))
+        log.warning("熱鍵註冊失敗：%s%s", e, "，保留原熱鍵" if old_binding is not None else "")
+        if notify:
+            from tkinter import messagebox
+            messagebox.showerror("熱鍵錯誤", str(e))
+        return False
+
+    hotkey_binding = new_binding
+    current_hotkey = hotkey_str
+    if old_binding is not None:
+        gestures.unbind(old_binding)
+    if hold > 0:
+        log.info("熱鍵已註冊：%s（按住 %g 秒）", hotkey_str, hold)
+    else:
+        log.info("熱鍵已註冊：%s", hotkey_str)
+    return True
 
 # ───────────────────────────────────────────────
-#  設定視窗（保持原樣）
+#  設定熱重載：監看 xiaoi_config.json，只套用有變動的項目
 # ───────────────────────────────────────────────
 
-def open_settings_and_restart(icon=None, item=None):
+CONFIG_POLL_SECONDS = 0.5
+applied_config = copy.deepcopy(config)   # 上次套用的設定，用來判斷哪些項目變了
+
+
+def apply_config(new):
+    """
+    依變動項目做最小的更新，Vosk Model 與音訊串流都保留：
+    - 熱鍵：先註冊新的再移除舊的
+    - 喚醒詞 / 門檻：重新編譯比對引擎（換參考，辨識中的區塊不受影響）
+    - 喚醒詞 / 辨識模式：下一個音訊區塊前重建 KaldiRecognizer
+    - 延遲、防抖、VAD：直接改 VoskWake 的屬性
+    """
+    global applied_config
+    changed = {k for k in new if new[k] != applied_config.get(k)}
+    changed.discard("microphone_probe")   # 程式自己寫入的偵測結果，不是使用者的設定變更
+    if not changed:
+        return changed
+    config.update(new)
+    hotkey_keys = {"hotkey", "hotkey_hold_seconds"}
+    if changed & hotkey_keys and (config.get("hotkey", "") != (current_hotkey or "")
+                                  or "hotkey_hold_seconds" in changed):
+        if not register_hotkey(config.get("hotkey", ""), notify=False):
+            # 註冊失敗時原熱鍵仍有效：設定還原成生效中的值，不算已套用，設定檔下次變動時再試
+            for key in hotkey_keys:
+                config[key] = applied_config.get(key)
+            changed -= hotkey_keys
+    if changed & {"wake_words", "similarity_threshold"}:
+        rebuild_wake_matcher()
+    if changed & {"wake_words", "recognizer_mode"}:
+        for waker in microphones.wakers():
+            waker.request_rebuild()
+    if changed & {"latency_mode", "latency_block_ms", "partial_stable_count", "wake_debounce_ms", "vad_enabled"}:
+        for waker in microphones.wakers():
+            waker.apply_settings()
+    if "decoder_process" in changed:
+        log.info("解碼子行程設定需重新啟動程式才會生效")
+    if "microphones" in changed:
+        log.info("麥克風設定需重新啟動程式才會生效")
+    applied_config = copy.deepcopy(config)
+    if not changed:
+        return changed
+    log.info("設定已即時套用：%s", "、".join(sorted(changed)))
+    update_tray_menu()
+    return changed
+
+
+def reload_config():
     try:
-        voice_waker.stop()
-    except:
-        pass
+        new = load_config(strict=True)
+    except Exception as e:
+        # 編輯器存檔到一半或格式錯誤：沿用目前設定，下次變動再試
+        log.warning("設定檔讀取失敗，沿用目前設定：%s", e)
+        return set()
+    return apply_config(new)
 
-    global voice_listener_active, current_hotkey
-    voice_listener_active = False
-    keyboard.unhook_all()
-    if current_hotkey:
-        try:
-            keyboard.remove_hotkey(current_hotkey)
-        except:
-            pass
-    if icon_instance:
-        try:
-            icon_instance.stop()
-        except:
-            pass
+
+def config_signature():
+    try:
+        st = CONFIG_FILE.stat()
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+async def watch_config():
+    """每 CONFIG_POLL_SECONDS 秒比對設定檔的修改時間與大小，變動就重新載入（外部編輯器修改也會生效）"""
+    last = config_signature()
+    while True:
+        await asyncio.sleep(CONFIG_POLL_SECONDS)
+        signature = config_signature()
+        if signature != last:
+            last = signature
+            reload_config()
+
+# ───────────────────────────────────────────────
+#  設定視窗（保持原樣）
+# ───────────────────────────────────────────────
+
+def open_settings(icon=None, item=None):
+    import tkinter as tk
+    from tkinter import messagebox, ttk, scrolledtext
+
+    # 設定視窗開著時熱鍵與語音喚醒照常運作；每次儲存都寫入設定檔並立即熱重載
+    def commit():
+        save_config(config)
+        runtime.call(reload_config)
 
     win = tk.Tk()
     win.title("小愛同學啟動器 - 設定")
@@ -427,8 +3192,11 @@ def open_settings_and_restart(icon=None, item=None):
 
     def apply_hotkey():
         new_key = entry_hotkey.get().strip()
+        # 先註冊，成功才寫進設定檔；失敗時 register_hotkey 保留原熱鍵並跳出錯誤訊息
+        if not register_hotkey(new_key):
+            return
         config["hotkey"] = new_key
-        save_config(config)
+        commit()
         messagebox.showinfo("完成", f"熱鍵已更新為：\n{new_key or '無（已移除）'}", parent=win)
 
     tk.Button(tab_hotkey, text="儲存熱鍵", command=apply_hotkey, width=15).pack(pady=20)
@@ -448,7 +3216,7 @@ def open_settings_and_restart(icon=None, item=None):
         lines = text_wake.get("1.0", "end").strip().split("\n")
         new_list = [w.strip() for w in lines if w.strip()]
         config["wake_words"] = new_list
-        save_config(config)
+        commit()
         messagebox.showinfo("完成", f"已更新 {len(new_list)} 個喚醒詞", parent=win)
 
     tk.Button(tab_wake, text="儲存喚醒詞", command=apply_wake_words, width=15).pack(pady=15)
@@ -464,90 +3232,434 @@ def open_settings_and_restart(icon=None, item=None):
 
     def save_threshold():
         config["similarity_threshold"] = round(scale_thresh.get(), 2)
-        save_config(config)
+        commit()
         messagebox.showinfo("完成", f"相似度門檻已設為 {config['similarity_threshold']}", parent=win)
 
     tk.Button(tab_adv, text="儲存門檻", command=save_threshold).pack(pady=20)
 
-    tk.Label(tab_adv, text="（已使用 Vosk 離線模型）", fg="gray").pack(pady=30)
+    tk.Label(tab_adv, text="辨識模式", font=("Microsoft YaHei", 10)).pack(pady=(10, 0))
 
-    def on_closing():
-        messagebox.showinfo(
-            "設定完成",
-            "所有變更已儲存。\n\n請手動關閉目前程式（右鍵托盤 → 結束程式），\n然後重新執行。",
-            parent=win
-        )
-        win.destroy()
+    mode_var = tk.StringVar(value=config.get("recognizer_mode", "grammar"))
+    tk.Radiobutton(tab_adv, text="喚醒詞語法（省電、較準確，推薦）", variable=mode_var, value="grammar").pack(anchor="w", padx=110)
+    tk.Radiobutton(tab_adv, text="完整詞彙（診斷用，會印出所有聽到的句子）", variable=mode_var, value="full").pack(anchor="w", padx=110)
+
+    def save_mode():
+        config["recognizer_mode"] = mode_var.get()
+        commit()
+        messagebox.showinfo("完成", "辨識模式已更新", parent=win)
+
+    tk.Button(tab_adv, text="儲存模式", command=save_mode).pack(pady=10)
 
-    win.protocol("WM_DELETE_WINDOW", on_closing)
+    latency_var = tk.BooleanVar(value=config.get("latency_mode", False))
+
+    def save_latency_mode():
+        config["latency_mode"] = latency_var.get()
+        commit()
+        messagebox.showinfo("完成", "低延遲模式設定已更新", parent=win)
+
+    tk.Checkbutton(tab_adv, text="低延遲模式（聽到喚醒詞就觸發，不等句尾）", variable=latency_var,
+                   command=save_latency_mode).pack(pady=5)
+
+    tk.Label(tab_adv, text="（已使用 Vosk 離線模型）", fg="gray").pack(pady=20)
+
+    win.protocol("WM_DELETE_WINDOW", win.destroy)
     win.mainloop()
 
+# ───────────────────────────────────────────────
+#  單一執行個體與命令通道：第二次執行只轉送命令
+# ───────────────────────────────────────────────
+
+INSTANCE_NAME = "XiaoiLauncher"
+IPC_REPLY_TIMEOUT = 3.0
+
+
+def ipc_address():
+    """Windows 用具名管道，其他平台用暫存目錄下的 Unix socket；都以使用者區分"""
+    import getpass
+    user = getpass.getuser()
+    if sys.platform == "win32":
+        return rf"\\.\pipe\{INSTANCE_NAME}-{user}"
+    import tempfile
+    return str(Path(tempfile.gettempdir()) / f"{INSTANCE_NAME}-{user}.sock")
+
+
+def ipc_authkey():
+    # 通道只在本機、只對同一使用者開放；authkey 只是擋掉誤連的其他程式
+    import getpass
+    return f"{INSTANCE_NAME}:{getpass.getuser()}".encode("utf-8")
+
+
+class InstanceGuard:
+    """Windows 用具名 mutex，其他平台用 flock；程式結束時作業系統會自動釋放"""
+
+    def __init__(self):
+        self.handle = None
+        self.lock_file = None
+
+    def acquire(self):
+        if sys.platform == "win32":
+            import ctypes
+            kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+            handle = kernel32.CreateMutexW(None, False, f"Local\\{INSTANCE_NAME}")
+            if not handle:
+                raise ctypes.WinError(ctypes.get_last_error())
+            if ctypes.get_last_error() == 183:   # ERROR_ALREADY_EXISTS
+                kernel32.CloseHandle(handle)
+                return False
+            self.handle = (kernel32, handle)
+            return True
+
+        import fcntl
+        path = ipc_address() + ".lock"
+        self.lock_file = open(path, "w")
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.lock_file.close()
+            self.lock_file = None
+            return False
+        return True
+
+    def release(self):
+        if self.handle is not None:
+            kernel32, handle = self.handle
+            kernel32.CloseHandle(handle)
+            self.handle = None
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+
+class CommandServer:
+    """
+    接收第二次執行轉送過來的命令（"trigger"、"reload-config"…），在事件迴圈上執行後回覆。
+    一個連線一個命令；accept() 跑在專屬執行緒，stop() 時自己連一次把它叫醒。
+    """
+
+    def __init__(self, commands):
+        self.commands = commands
+        self.listener = None
+        self.stopping = False
+
+    def serve(self):
+        from multiprocessing.connection import Listener
+        address = ipc_address()
+        if sys.platform != "win32":
+            # 已經拿到 flock，留下的 socket 檔一定是上次異常結束的殘留
+            Path(address).unlink(missing_ok=True)
+        self.listener = Listener(address, authkey=ipc_authkey())
+        if sys.platform != "win32":
+            import os
+            os.chmod(address, 0o600)
+        log.debug("命令通道已開啟：%s", address)
+        while not self.stopping:
+            try:
+                conn = self.listener.accept()
+            except Exception as e:
+                if not self.stopping:
+                    log.debug("命令通道連線失敗：%s", e)
+                continue
+            with conn:
+                try:
+                    if conn.poll(IPC_REPLY_TIMEOUT):
+                        conn.send(self.dispatch(conn.recv()))
+                except (EOFError, OSError):
+                    pass
+        self.listener.close()
+
+    def dispatch(self, command):
+        handler = self.commands.get(command)
+        if handler is None:
+            return ("error", f"未知的命令：{command}")
+        import concurrent.futures
+        done = concurrent.futures.Future()
+
+        def run():
+            try:
+                done.set_result(handler())
+            except Exception as e:
+                done.set_exception(e)
+
+        if not runtime.call(run):
+            return ("error", "啟動器正在結束")
+        try:
+            result = done.result(IPC_REPLY_TIMEOUT)
+        except Exception as e:
+            return ("error", str(e) or type(e).__name__)
+        log.info("收到命令：%s", command)
+        return ("ok", result)
+
+    def stop(self):
+        self.stopping = True
+        if self.listener is None:
+            return
+        try:
+            # 叫醒卡在 accept() 的執行緒
+            from multiprocessing.connection import Client
+            Client(ipc_address(), authkey=ipc_authkey()).close()
+        except Exception:
+            pass
+
+
+def send_command(command):
+    """第二次執行：把命令交給執行中的啟動器，回傳 (狀態, 內容)；沒有執行中的啟動器時回傳 None"""
+    from multiprocessing.connection import Client
+    try:
+        conn = Client(ipc_address(), authkey=ipc_authkey())
+    except (OSError, EOFError):
+        return None
+    with conn:
+        conn.send(command)
+        if not conn.poll(IPC_REPLY_TIMEOUT):
+            return ("error", "等待回覆逾時")
+        return conn.recv()
+
+
 # ───────────────────────────────────────────────
 #  托盤與主程式
 # ───────────────────────────────────────────────
 
 def create_icon():
+    from PIL import Image, ImageDraw
     img = Image.new('RGB', (32, 32), (0, 120, 215))
     draw = ImageDraw.Draw(img)
     draw.text((8, 8), "AI", fill='white')
     return img
 
 
-def stop_program(icon=None, item=None):
-    global voice_listener_active
-    voice_listener_active = False
-    try:
-        voice_waker.stop()
-    except:
-        pass
-    keyboard.unhook_all()
-    if icon_instance:
-        icon_instance.stop()
-    sys.exit(0)
+def model_status_text(item=None):
+    return {
+        "idle": "語音模型：尚未載入",
+        "loading": "語音模型：載入中…",
+        "ready": "語音模型：已就緒",
+        "failed": "語音模型：載入失敗（僅熱鍵可用）",
+    }.get(getattr(voice_waker, "state", "idle"), "語音模型：未知") + decoder_status_suffix()
 
 
-if __name__ == "__main__":
-    if not load_cached_position():
-        print("未找到按鈕位置快取，建議第一次執行時校準")
-        calibrate_voice_button()
+def decoder_status_suffix():
+    decoder = getattr(voice_waker, "decoder", None)
+    if decoder is None:
+        return ""
+    if not decoder.ready:
+        return "（解碼子行程重啟中）"
+    return f"（子行程解碼，已重啟 {decoder.restarts} 次）" if decoder.restarts else "（子行程解碼）"
+
+
+def vad_status_text(item=None):
+    vad = getattr(voice_waker, "vad", None)
+    if vad is None:
+        return "靜音略過：未啟用"
+    return f"靜音略過：{vad.gated_blocks} / {vad.gated_blocks + vad.passed_blocks} 區塊"
+
+
+def voice_status_text(item=None):
+    return "暫停語音喚醒" if not voice_paused else "暫停語音喚醒（已暫停）"
 
-    register_hotkey(config.get("hotkey", "ctrl + 1"))
 
-    icon = Icon(
+def toggle_voice(icon=None, item=None):
+    """暫停 / 恢復語音喚醒；模型與麥克風串流都保留，恢復時不必重新載入"""
+    global voice_paused
+    voice_paused = not voice_paused
+    log.info("語音喚醒已暫停" if voice_paused else "語音喚醒已恢復")
+    update_tray_menu()
+    return "paused" if voice_paused else "listening"
+
+
+def build_tray_icon():
+    from pystray import Icon, Menu, MenuItem
+
+    return Icon(
         "XiaoiLauncher",
         create_icon(),
         menu=Menu(
             MenuItem("小愛同學啟動器", lambda: None, enabled=False),
+            MenuItem(model_status_text, lambda: None, enabled=False),
+            MenuItem(microphones.status_text, lambda: None, enabled=False),
+            MenuItem(vad_status_text, lambda: None, enabled=False),
+            MenuItem(launcher.status_text, lambda: None, enabled=False),
+            MenuItem(tracer.summary_text, lambda: None, enabled=False),
+            MenuItem(runtime.stats_text, lambda: None, enabled=False),
+            MenuItem("取消目前的啟動", lambda: launcher.cancel()),
+            MenuItem("暫停語音喚醒", toggle_voice, checked=lambda item: voice_paused),
+            MenuItem("顯示除錯訊息", toggle_debug_logging, checked=lambda item: log.isEnabledFor(logging.DEBUG)),
             MenuItem("設定熱鍵與喚醒詞", 
-                     lambda: threading.Thread(target=open_settings_and_restart, daemon=True).start()),
-            MenuItem("重新校準語音按鈕", lambda i=None: calibrate_voice_button() or print("校準完成")),
+                     lambda: runtime.submit(runtime.bridge, open_settings, name="settings")),
+            MenuItem("重新校準語音按鈕", lambda: runtime.submit(runtime.bridge, calibrate_voice_button, name="calibrate")),
+            MenuItem("重新啟動介面", lambda: runtime.call(restart_tray)),
             MenuItem("結束程式", stop_program)
         )
     )
-    icon_instance = icon
 
-    print("="*60)
-    print("小愛同學快速啟動器（Vosk 離線版） 已啟動")
-    print(f"目前熱鍵：{config.get('hotkey', '未設定')}")
-    print(f"喚醒詞數量：{len(config.get('wake_words', []))}")
-    print("右鍵托盤圖示 → 設定熱鍵與喚醒詞")
-    print("="*60)
 
-    def voice_loop():
-        while voice_listener_active:
-            try:
-                if voice_waker.listen():
-                    print("語音喚醒成功 → 開啟小愛")
-                    open_xiaoai()
-            except Exception as e:
-                print(f"[語音循環錯誤] {e}")
-            time.sleep(0.3)
+def on_tray_ready(tray):
+    tray.visible = True
+    mark_startup("托盤顯示")
 
-    threading.Thread(target=voice_loop, daemon=True).start()
 
-    threading.Thread(target=icon.run, daemon=True).start()
+def start_tray():
+    """建立托盤圖示並在專屬執行緒跑它的訊息迴圈（需在事件迴圈上呼叫）"""
+    global icon_instance
+    icon_instance = build_tray_icon()
+    runtime.spawn(runtime.bridge(icon_instance.run, setup=on_tray_ready, name="tray"), "托盤")
 
-    try:
-        keyboard.wait()
-    except KeyboardInterrupt:
-        stop_program()
\ No newline at end of file
+
+def restart_tray():
+    """
+    只重建托盤介面（圖示卡住、檔案總管重新啟動後圖示消失時用），
+    語音模型、麥克風串流、熱鍵與命令通道都在常駐的主行程裡，完全不受影響。
+    """
+    old = icon_instance
+    start_tray()
+    if old is not None:
+        try:
+            old.stop()
+        except Exception:
+            pass
+    log.info("托盤介面已重新啟動")
+    return "restarted"
+
+
+def update_tray_menu():
+    if icon_instance:
+        try:
+            icon_instance.update_menu()
+        except Exception:
+            pass
+
+
+def shutdown_components():
+    # 在事件迴圈上執行：先通知所有元件停止，runtime 再取消並等待剩下的 task
+    global voice_listener_active
+    voice_listener_active = False
+    for waker in microphones.wakers():
+        try:
+            waker.stop()
+        except:
+            pass
+    launcher.stop()
+    command_server.stop()
+    gestures.stop()
+    keyboard.unhook_all()
+    if window_watcher is not None:
+        # 從沒點擊過就沒有監看器，不要為了關閉而建立（會裝上 hook 再拆掉）
+        window_watcher.backend.stop()
+    if icon_instance:
+        icon_instance.stop()
+
+
+command_server = CommandServer({
+    "trigger": lambda: launcher.trigger("命令列"),
+    "reload-config": lambda: sorted(reload_config()),
+    "toggle-voice": toggle_voice,
+    "restart-ui": restart_tray,
+})
+
+
+def stop_program(icon=None, item=None):
+    # 托盤執行緒呼叫時只送出停止要求，主執行緒的事件迴圈會收尾後正常返回
+    log.info("正在結束程式...")
+    runtime.request_stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="小愛同學快速啟動器（Vosk 離線版）")
+    parser.add_argument("--benchmark", metavar="CORPUS", help="用錄音語料跑喚醒偵測基準測試後結束（資料夾或 manifest.json）")
+    parser.add_argument("--benchmark-out", metavar="FILE", help="基準測試結果另存為 JSON")
+    parser.add_argument("--startup-profile", action="store_true", help="印出各啟動階段耗時")
+    parser.add_argument("--list-mics", action="store_true", help="偵測所有麥克風（開啟延遲、原生取樣率、噪音底線），結果寫入設定檔後結束")
+    parser.add_argument("--debug", action="store_true", help="顯示除錯訊息（也可從托盤切換）")
+    commands = parser.add_mutually_exclusive_group()
+    commands.add_argument("--trigger", dest="command", action="store_const", const="trigger",
+                          help="通知執行中的啟動器立刻開啟小愛")
+    commands.add_argument("--reload-config", dest="command", action="store_const", const="reload-config",
+                          help="通知執行中的啟動器重新載入設定檔")
+    commands.add_argument("--toggle-voice", dest="command", action="store_const", const="toggle-voice",
+                          help="通知執行中的啟動器暫停 / 恢復語音喚醒")
+    commands.add_argument("--restart-ui", dest="command", action="store_const", const="restart-ui",
+                          help="通知執行中的啟動器重建托盤介面（語音模型保留）")
+    args = parser.parse_args()
+    setup_logging(args.debug)
+    mark_startup("模組匯入與設定載入")
+
+    if args.command:
+        # 只轉送命令：不載入模型、不註冊熱鍵，幾毫秒內結束
+        reply = send_command(args.command)
+        if reply is None:
+            log.error("沒有執行中的啟動器")
+        elif reply[0] == "ok":
+            log.info("%s：%s", args.command, reply[1] if reply[1] is not None else "完成")
+        else:
+            log.error("%s 失敗：%s", args.command, reply[1])
+        stop_logging()
+        sys.exit(0 if reply and reply[0] == "ok" else 1)
+
+    if args.list_mics:
+        best = microphones.probe()
+        log.info("自動挑選：%s", best or "沒有可用的麥克風")
+        stop_logging()
+        sys.exit(0 if best else 1)
+
+    if args.benchmark:
+        if not voice_waker.load_model(in_process=True):
+            sys.exit(1)
+        run_wake_benchmark(voice_waker, args.benchmark, args.benchmark_out)
+        sys.exit(0)
+
+    instance_guard = InstanceGuard()
+    if not instance_guard.acquire():
+        log.info("啟動器已在執行中；可用 --trigger、--reload-config、--toggle-voice、--restart-ui 對它下命令")
+        stop_logging()
+        sys.exit(0)
+
+    # 熱鍵最先註冊：開機後就算模型還在載入，熱鍵也能立刻用
+    register_hotkey(config.get("hotkey", "ctrl + 1"))
+    mark_startup("熱鍵註冊")
+
+    log.info("="*60)
+    log.info("小愛同學快速啟動器（Vosk 離線版） 已啟動")
+    log.info("目前熱鍵：%s", config.get("hotkey", "未設定"))
+    log.info("喚醒詞數量：%s", len(config.get("wake_words", [])))
+    log.info("右鍵托盤圖示 → 設定熱鍵與喚醒詞")
+    log.info("="*60)
+
+    def on_voice_wake(waker):
+        def on_wake(text, span=None):
+            # 多支麥克風同時聽到時只有第一個觸發
+            if not microphones.accept(waker):
+                tracer.finish(span, "duplicate")
+                return
+            # trigger() 不會阻塞，錄音執行緒不會被啟動流程卡住
+            log.info("語音喚醒成功（%s）→ 開啟小愛", text)
+            launcher.trigger("語音", span)
+        return on_wake
+
+    async def voice_loop(rt):
+        # 列舉 / 偵測麥克風與模型載入同時進行；模型載入完成才開始聽，listen() 不用再輪詢 ready_event
+        resolving = rt.blocking(microphones.resolve)
+        loaded = await voice_waker.load_model_async(on_done=print_startup_profile if args.startup_profile else None)
+        await resolving
+        if not loaded:
+            return
+        for waker in microphones.build_pipelines():
+            # 第二支以後的麥克風各用一條專屬執行緒，不佔執行緒池
+            rt.spawn(rt.bridge(waker.listen, on_voice_wake(waker), name=f"mic-{waker.label}"),
+                     f"語音監聽（{waker.label}）")
+        try:
+            # 主麥克風也一樣：listen() 會一直跑到結束，不能長期佔住執行緒池的工作執行緒
+            await rt.bridge(voice_waker.listen, on_voice_wake(voice_waker), name="mic-main")
+        except Exception as e:
+            log.error("語音循環錯誤：%s", e)
+
+    async def startup(rt):
+        rt.on_shutdown(shutdown_components)
+        start_tray()
+        rt.spawn(rt.bridge(command_server.serve, name="ipc"), "命令通道")
+        rt.spawn(voice_loop(rt), "語音監聽")
+        rt.spawn(rt.blocking(preload_modules), "預載模組")
+        rt.spawn(watch_config(), "設定檔監看")
+        if not load_cached_position():
+            log.info("未找到按鈕位置快取，建議第一次執行時校準")
+            rt.spawn(rt.bridge(calibrate_voice_button, name="calibrate"), "校準")
+
+    # 主執行緒跑事件迴圈；Ctrl+C 或托盤「結束程式」都會走同一條收尾流程
+    runtime.run(startup)
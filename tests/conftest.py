@@ -0,0 +1,28 @@
+"""
+V3 的單元測試共用設定。
+V3 匯入時會讀寫工作目錄下的設定檔，所以在暫存資料夾裡匯入；
+keyboard 等相依套件沒裝時整組跳過。
+"""
+
+import importlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def v3():
+    pytest.importorskip("keyboard")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            module = importlib.import_module("V3_xiaoi_launcher")
+        finally:
+            os.chdir(cwd)
+        yield module
@@ -0,0 +1,25 @@
+"""CursorLock 用 FakeMouseBackend 模擬使用者與程式送出的滑鼠移動"""
+
+
+def test_blocks_user_moves_only_while_engaged(v3):
+    backend = v3.FakeMouseBackend()
+    lock = v3.CursorLock(backend)
+
+    assert not backend.emit_move(10, 10)
+    lock.engage(100, 100)
+    assert backend.emit_move(120, 90)
+    assert backend.emit_move(130, 80)
+    assert not backend.emit_move(100, 100, injected=True)
+    assert lock.release() == 2
+    assert not backend.emit_move(10, 10)
+    assert lock.total_suppressed == 2
+
+
+def test_engage_and_release_are_idempotent(v3):
+    backend = v3.FakeMouseBackend()
+    lock = v3.CursorLock(backend)
+    lock.engage(0, 0)
+    lock.engage(5, 5)
+    assert backend.emit_move(1, 1)
+    assert lock.release() == 1
+    assert lock.release() == 0
@@ -0,0 +1,38 @@
+"""WakeMatcher 必須與原本逐詞 SequenceMatcher 迴圈的判斷完全相同"""
+
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+
+def reference_match(words, threshold, text):
+    """原本 VoskWake.is_wake_word 的寫法"""
+    text = text.lower().strip()
+    for word in words:
+        ratio = SequenceMatcher(None, text, word.lower()).ratio()
+        if word.lower() in text or ratio > threshold:
+            return True
+    return False
+
+
+def random_texts(words, count, seed):
+    rng = random.Random(seed)
+    alphabet = sorted(set("".join(words).lower()) | set("你好的嗎打開音樂 abc"))
+    for _ in range(count):
+        if rng.random() < 0.2:
+            # 喚醒詞前後加雜字，涵蓋子字串命中
+            word = rng.choice(words)
+            yield "".join(rng.choices(alphabet, k=rng.randint(0, 3))) + word + \
+                "".join(rng.choices(alphabet, k=rng.randint(0, 3)))
+        else:
+            yield "".join(rng.choices(alphabet, k=rng.randint(0, 10)))
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.58, 0.75])
+def test_matches_sequence_matcher_loop(v3, threshold):
+    words = v3.DEFAULT_WAKE_WORDS
+    matcher = v3.WakeMatcher(words, threshold)
+    for text in random_texts(words, 4000, seed=int(threshold * 100)):
+        assert (matcher.match(text) is not None) == reference_match(words, threshold, text), text
+
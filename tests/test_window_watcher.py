@@ -0,0 +1,30 @@
+"""WindowWatcher 用 FakeWindowBackend 模擬視窗出現與激活延遲"""
+
+
+def make_watcher(v3, activate_delay=0.0):
+    backend = v3.FakeWindowBackend(activate_delay=activate_delay)
+    return v3.WindowWatcher(backend), backend
+
+
+def test_activate_waits_for_window_event(v3):
+    watcher, backend = make_watcher(v3, activate_delay=0.05)
+    backend.open_window("小愛同學", delay=0.1)
+    handle = watcher.activate(timeout=2.0)
+    assert handle is not None
+    assert backend.is_foreground(handle)
+    assert backend.activate_calls == 1
+
+
+def test_activate_skips_when_already_foreground(v3):
+    watcher, backend = make_watcher(v3)
+    handle = backend.open_window("XiaoAi")
+    backend.set_foreground(handle)
+    assert watcher.activate(timeout=1.0) == handle
+    assert backend.activate_calls == 0
+
+
+def test_activate_times_out_without_window(v3):
+    watcher, backend = make_watcher(v3)
+    backend.open_window("記事本")
+    assert watcher.activate(timeout=0.3) is None
+    assert backend.activate_calls == 0
@@ -0,0 +1,120 @@
+"""
+小愛同學 V3 的解碼子行程入口（設定檔 decoder_process 為 true 時使用）
+- 刻意與主程式分開：spawn 出來的子行程只匯入這個檔案，
+  不會重新執行啟動器的頂層（熱鍵、設定檔、logging、托盤與各種全域物件）
+- 本檔沒有任何匯入時的副作用，重量級模組（vosk）在子行程裡才匯入
+"""
+
+import struct
+
+
+class AudioRing:
+    """
+    單一寫入者 / 單一讀取者的共享記憶體環形緩衝區，存 16-bit PCM。
+    開頭 8 bytes 是累計寫入位置（只增不減），讀取端依主行程告知的 [start, end) 區間複製；
+    被覆寫掉的部分直接跳過，不會讀到錯位的資料。
+    """
+
+    HEADER = 8
+
+    def __init__(self, capacity, name=None):
+        from multiprocessing import shared_memory
+        self.capacity = capacity
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.HEADER + capacity)
+            struct.pack_into("<Q", self.shm.buf, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.position = self.written()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def written(self):
+        return struct.unpack_from("<Q", self.shm.buf, 0)[0]
+
+    def write(self, data):
+        """寫入一段音訊，回傳 (start, end) 累計位置"""
+        start = self.position
+        if len(data) > self.capacity:
+            start += len(data) - self.capacity
+            data = data[-self.capacity:]
+        n = len(data)
+        offset = start % self.capacity
+        first = min(n, self.capacity - offset)
+        base = self.HEADER
+        self.shm.buf[base + offset:base + offset + first] = data[:first]
+        if first < n:
+            self.shm.buf[base:base + n - first] = data[first:]
+        self.position = start + n
+        struct.pack_into("<Q", self.shm.buf, 0, self.position)
+        return start, self.position
+
+    def read(self, start, end):
+        """讀出 [start, end)；已被覆寫的開頭會被略過，回傳 (data, 略過的 bytes)"""
+        skipped = max(0, self.written() - self.capacity - start)
+        start += skipped
+        if end <= start:
+            return b"", skipped
+        offset = start % self.capacity
+        first = min(end - start, self.capacity - offset)
+        base = self.HEADER
+        data = bytes(self.shm.buf[base + offset:base + offset + first])
+        if first < end - start:
+            data += bytes(self.shm.buf[base:base + end - start - first])
+        return data, skipped
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def decoder_worker(model_path, sample_rate, grammar, ring_name, capacity, conn):
+    """
+    子行程入口：載入 Model、從共享記憶體讀音訊跑 KaldiRecognizer，每個區塊回報一次結果。
+    主行程傳來：("data", start, end) / ("flush", end) / ("reset",) / ("grammar", json 或 None) / ("stop",)
+    回傳主行程：("ready", pid) / ("error", 訊息) / ("partial" 或 "final", json, end)
+    """
+    try:
+        from vosk import Model, KaldiRecognizer
+        model = Model(model_path)
+
+        def make_recognizer(g):
+            return KaldiRecognizer(model, sample_rate, g) if g else KaldiRecognizer(model, sample_rate)
+
+        recognizer = make_recognizer(grammar)
+        ring = AudioRing(capacity, name=ring_name)
+    except Exception as e:
+        conn.send(("error", str(e)))
+        return
+
+    import os
+    conn.send(("ready", os.getpid()))
+    try:
+        while True:
+            msg = conn.recv()
+            kind = msg[0]
+            if kind == "data":
+                data, _ = ring.read(msg[1], msg[2])
+                if recognizer.AcceptWaveform(data):
+                    conn.send(("final", recognizer.Result(), msg[2]))
+                else:
+                    conn.send(("partial", recognizer.PartialResult(), msg[2]))
+            elif kind == "flush":
+                conn.send(("final", recognizer.FinalResult(), msg[1]))
+            elif kind == "reset":
+                recognizer.Reset()
+            elif kind == "grammar":
+                recognizer = make_recognizer(msg[1])
+            elif kind == "stop":
+                break
+    except (EOFError, OSError):
+        pass   # 主行程已結束
+    finally:
+        ring.close()